@@ -0,0 +1,147 @@
+# chooser_engine 热点路径的基准测试，不需要图形界面：
+#   python benchmarks/bench_engine.py [选项数量 ...]
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionStore, Chooser, save_options_file, load_options_file
+from chooser_weights import AliasTable
+from chooser_stream import StreamingLoader
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex
+from chooser_history import History
+from chooser_audit import DrawAuditor
+
+
+def timed(func, repeat=1):
+    # 返回每次调用的平均耗时（秒）
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_import():
+    # 在新进程中导入引擎，确认不会连带导入 tkinter 或 PyQt5
+    code = ("import sys, time; t = time.perf_counter(); import chooser_engine; "
+            "print(time.perf_counter() - t, 'tkinter' in sys.modules or 'PyQt5' in sys.modules)")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=root, text=True).split()
+    return float(output[0]), output[1] == "True"
+
+
+def bench_cli(filename, count=1, repeat=5):
+    # 命令行模式（random_chooser.py --headless）的总耗时，包括解释器启动，取最快的一次
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, os.path.join(root, "random_chooser.py"), "--headless", filename,
+               "-n", str(count)]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_stream(filename):
+    # 流式加载：第一批选项到达的时间和全部加载完的时间
+    start = time.perf_counter()
+    loader = StreamingLoader(filename).start()
+    first = None
+    while not loader.finished:
+        for event in loader.poll():
+            if event[0] == "options" and first is None:
+                first = time.perf_counter() - start
+        time.sleep(0.001)
+    return first or 0.0, time.perf_counter() - start
+
+
+def bench_size(size):
+    options = [f"选项{i}" for i in range(size)]
+    results = {}
+
+    store = OptionStore()
+    results["add"] = timed(lambda: [store.add(option) for option in options]) / size
+    results["extend"] = timed(lambda: OptionStore().extend(options))
+
+    chooser = Chooser(store)
+    draws = 100000
+    results["choose"] = timed(lambda: [chooser.choose() for _ in range(draws)]) / draws
+
+    # 按权重抽取：别名表（权重稳定）和树状数组（权重频繁修改）
+    weighted = OptionStore(options, [1 + i % 7 for i in range(size)])
+    weighted_chooser = Chooser(weighted)
+    results["alias_build"] = timed(lambda: AliasTable(weighted.weights()))
+    results["choose_w"] = timed(lambda: [weighted_chooser.choose() for _ in range(draws)]) / draws
+    results["set_weight"] = timed(lambda: [(weighted.set_weight(i % size, 3), weighted_chooser.choose())
+                                           for i in range(1000)]) / 1000
+
+    # 审计抽取（界面的最终结果）：按权重抽取，以及修改一个权重后重新计算选项集哈希再抽取
+    auditor = DrawAuditor(weighted)
+    auditor.choose_index()
+    results["audit_w"] = timed(auditor.choose_index, repeat=1000)
+    results["audit_edit"] = timed(lambda: [(weighted.set_weight(i % size, 2), auditor.set_hash(),
+                                            auditor.choose_index()) for i in range(100)]) / 100
+
+    # 批量抽取（安装了 NumPy 时走向量化路径）
+    results["batch_1e6"] = timed(lambda: chooser.batch.draw_indices(1000000))
+    results["batch_w_1e6"] = timed(lambda: weighted_chooser.batch.draw_indices(1000000))
+    results["draw_1e6"] = timed(lambda: chooser.choose_many(1000000))
+    results["sample_k"] = timed(lambda: chooser.batch.draw_indices(min(size, 1000), replace=False))
+    results["shuffle"] = timed(lambda: chooser.batch.shuffled_indices())
+
+    # 轮换抽取：抽完整整一轮，再在轮换进行中删除选项
+    rotation = Rotation(store)
+    results["rotation"] = timed(lambda: [rotation.choose_index() for _ in range(size)]) / size
+
+    results["remove_at"] = timed(lambda: store.remove_at(len(store) // 2), repeat=min(size, 1000))
+
+    # 标签：30 个标签（每隔 2、10、100 个选项一个），按「两个标签 AND NOT 两个标签」查询并抽取
+    tagged = OptionStore(options)
+    tags = TagIndex(tagged)
+    results["tag_update"] = timed(lambda: [tags.update(range(k % 7, size, (2, 10, 100)[k % 3]), [f"tag{k}"])
+                                           for k in range(30)]) / 30
+    results["tag_query"] = timed(lambda: tags.query(["tag0", "tag4"], ["tag1", "tag29"]), repeat=100)
+    tagged_chooser = Chooser(tagged)
+    results["tag_choose"] = timed(lambda: tagged_chooser.choose(tags.select("tag0 tag4 -tag1 -tag29")),
+                                  repeat=100)
+    results["tag_remove"] = timed(lambda: tagged.remove_at(len(tagged) // 2), repeat=min(size, 1000))
+
+    # 撤销：删除后撤销（放回原位）、清空后撤销（整体换回，与选项数无关），选项带有标签和轮换进度
+    undo_store = OptionStore(options)
+    undo_tags = TagIndex(undo_store)
+    undo_tags.update(range(0, size, 3), ["tag0"])
+    history = History(undo_store, undo_tags, Rotation(undo_store))
+    results["undo_remove"] = timed(lambda: (history.remove_at(len(undo_store) // 2), history.undo()),
+                                   repeat=min(size, 1000))
+    results["undo_clear"] = timed(lambda: (history.clear(), history.undo()), repeat=100)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "options.json")
+        results["save"] = timed(lambda: save_options_file(filename, options))
+        results["load"] = timed(lambda: load_options_file(filename))
+        results["stream_first"], results["stream_all"] = bench_stream(filename)
+        binary = os.path.join(tmp, "options.rcb")
+        results["save_rcb"] = timed(lambda: save_options_file(binary, options))
+        results["open_rcb"] = timed(lambda: OptionStore().extend(load_options_file(binary)[0]))
+        results["cli_start"] = bench_cli(binary)
+        results["cli_1e6"] = bench_cli(binary, 1000000, repeat=1)
+    return results
+
+
+def main(sizes):
+    seconds, gui_loaded = bench_import()
+    print(f"import chooser_engine: {seconds * 1000:.2f} ms (GUI 模块被导入: {gui_loaded})")
+    for size in sizes:
+        print(f"\n选项数量: {size}")
+        for name, seconds in bench_size(size).items():
+            print(f"  {name:<10} {seconds * 1e6:12.3f} us")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 100000])
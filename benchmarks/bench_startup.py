@@ -0,0 +1,169 @@
+# 界面启动时间的基准测试：从启动进程到窗口第一次画出来、到上次的选项恢复完成各用了多少时间
+#   python benchmarks/bench_startup.py [qt|tk ...] [--repeat 次数] [--options 自动保存的选项数]
+# 每次都在新进程中启动（包括解释器启动和所有导入），自动保存放在临时目录中，不影响 saved_options/。
+# 没有显示器时 PyQt5 版本使用 offscreen 平台；Tkinter 版本需要 X 服务器，
+# 有 xvfb-run 时自动在 Xvfb 中运行，否则跳过
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 第一次画出窗口的目标时间（秒）
+TARGET_PAINT = 0.150
+# 等待子进程的最长时间（秒）
+TIMEOUT = 60
+
+
+def parse_args(argv):
+    targets = []
+    repeat = 10
+    options = 0
+    while argv:
+        arg = argv.pop(0)
+        if arg in ("qt", "tk"):
+            targets.append(arg)
+        elif arg in ("--repeat", "--options") and argv:
+            value = int(argv.pop(0))
+            if arg == "--repeat":
+                repeat = max(1, value)
+            else:
+                options = value
+        else:
+            raise SystemExit("用法: python benchmarks/bench_startup.py [qt|tk ...] [--repeat 次数] [--options 选项数]")
+    return targets or ["qt", "tk"], repeat, options
+
+
+def prepare_autosave(path, count):
+    # 在 path 中写一份有 count 个选项的自动保存，和开启自动保存后添加选项得到的文件相同
+    from chooser_engine import OptionStore
+    from chooser_journal import Journal
+    journal = Journal(path)
+    store = OptionStore()
+    journal.start(store)
+    store.extend([f"选项 {i}" for i in range(count)])
+    journal.stop(discard=False)
+    journal.wait()
+
+
+def child(target, path, started):
+    # 在子进程中运行：started 是父进程启动子进程前的 time.time()，输出各个时刻距它的秒数
+    marks = {}
+
+    def mark(name):
+        if name not in marks:
+            marks[name] = time.time() - started
+
+    if target == "qt":
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import QObject, QEvent, QTimer
+        import random_chooser_qt as module
+        mark("import")
+        module.ensure_save_path = lambda: path
+        app = QApplication(sys.argv[:1])
+
+        class PaintWatcher(QObject):
+            def eventFilter(self, obj, event):
+                if event.type() == QEvent.Paint:
+                    # 第一次绘制处理完之后再记录
+                    QTimer.singleShot(0, lambda: mark("paint"))
+                return False
+
+        watcher = PaintWatcher()
+        app.installEventFilter(watcher)
+        window = module.RandomChooserQt()
+        window.show()
+
+        def check():
+            # 自动保存复选框可用时自动保存已经准备好（上次的选项已经恢复）
+            if "paint" in marks and window.autosave_check.isEnabled():
+                mark("restored")
+                marks["count"] = len(window.options)
+                app.quit()
+
+        timer = QTimer()
+        timer.timeout.connect(check)
+        timer.start(1)
+        app.exec_()
+    else:
+        import random_chooser as module
+        mark("import")
+        module.ensure_save_path = lambda: path
+        window = module.RandomChooser()
+        window.bind("<Expose>", lambda event: window.after_idle(mark, "paint"), add="+")
+
+        def check():
+            if "paint" in marks and str(window.autosave_check["state"]) == "normal":
+                mark("restored")
+                marks["count"] = len(window.options)
+                window.destroy()
+            else:
+                window.after(1, check)
+
+        window.after(1, check)
+        window.mainloop()
+    print(json.dumps(marks))
+
+
+def run_target(target, path, repeat):
+    env = dict(os.environ)
+    command = [sys.executable, os.path.abspath(__file__), "--child", target, path]
+    if not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        if target == "qt":
+            env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        elif shutil.which("xvfb-run"):
+            command = ["xvfb-run", "-a"] + command
+        else:
+            print("tk: 没有显示器，也找不到 xvfb-run，跳过")
+            return None
+    results = []
+    for _ in range(repeat):
+        started = time.time()
+        command_line = command + [repr(started)]
+        output = subprocess.run(command_line, cwd=ROOT, env=env, capture_output=True, text=True,
+                                timeout=TIMEOUT)
+        lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+        if output.returncode != 0 or not lines:
+            print(f"{target}: 启动失败\n{output.stderr}")
+            return None
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+def report(target, results):
+    def median(name):
+        values = sorted(result[name] for result in results)
+        return values[len(values) // 2]
+
+    paint = median("paint")
+    print(f"{target}: 导入 {median('import') * 1000:.0f} ms，第一次画出窗口 {paint * 1000:.0f} ms，"
+          f"恢复 {results[0]['count']} 个选项完成 {median('restored') * 1000:.0f} ms"
+          f"（{len(results)} 次的中位数，最快画出 {min(r['paint'] for r in results) * 1000:.0f} ms）")
+    if paint > TARGET_PAINT:
+        print(f"  超过目标 {TARGET_PAINT * 1000:.0f} ms")
+
+
+def main(argv):
+    if argv[:1] == ["--child"]:
+        child(argv[1], argv[2], float(argv[3]))
+        return
+    targets, repeat, options = parse_args(list(argv))
+    path = tempfile.mkdtemp()
+    try:
+        if options:
+            prepare_autosave(path, options)
+        for target in targets:
+            results = run_target(target, path, repeat)
+            if results:
+                report(target, results)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
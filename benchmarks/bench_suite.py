@@ -0,0 +1,399 @@
+# 基准测试套件：按选项数量分档测量添加、删除、清空、抽取、保存和加载的吞吐量（每秒处理的选项数或操作数）
+# 和峰值内存，并与保存的基线比较：
+#   python benchmarks/bench_suite.py [--tiers 1000,100000,1000000] [--targets engine,qt,tk] [--runs 次数]
+#                                    [--threshold 倍数] [--baseline 文件] [--save-baseline]
+# engine 只测核心逻辑（chooser_engine 等）；qt 和 tk 通过窗口的方法走完整的界面路径（包括列表刷新、
+# 状态栏和审计日志），对话框都替换为直接返回。没有显示器时 Qt 使用 offscreen 平台，Tk 需要 xvfb-run，否则跳过。
+# 每个目标的每一档都在新进程中运行 --runs 次（默认 3），每项取最好的一次，减少机器负载造成的波动；
+# 峰值内存是该进程的最大常驻内存（包括解释器和界面库本身）。
+# 每个进程先运行一段固定的校准代码（calibration），与基线比较时吞吐量按校准速度换算，
+# 抵消机器本身快慢的变化（频率调节、其他负载）。
+# 吞吐量比基线低、或峰值内存比基线高出 --threshold 倍（默认 1.5）时报告退步，退出码为 1；
+# 基线与机器有关，换一台机器先用 --save-baseline 重新保存
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+TIERS = (1000, 100000, 1000000)
+TARGETS = ("engine", "qt", "tk")
+THRESHOLD = 1.5
+RUNS = 3
+# 逐个执行的界面操作（添加、删除、抽取）的次数；核心逻辑的抽取次数
+GUI_OPS = 500
+DRAWS = 100000
+TIMEOUT = 1800
+
+USAGE = ("用法: python benchmarks/bench_suite.py [--tiers 1000,100000] [--targets engine,qt,tk] [--runs 次数]"
+         " [--threshold 倍数] [--baseline 文件] [--save-baseline]")
+
+
+def elapsed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def rate(count, func):
+    # func 处理 count 个选项（或操作）的吞吐量，每秒多少个
+    return count / max(elapsed(func), 1e-9)
+
+
+def rounds_for(size):
+    # 很快就能完成的操作（清空、界面的保存和加载）在小的档位上重复多次，每档至少处理约 10 万个选项
+    return max(1, 100000 // size)
+
+
+def peak_memory_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位是 KB，macOS 上是字节
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def calibrate():
+    # 固定的纯 Python 工作量（字典写入和排序）每秒能完成几次，取 5 次中最快的
+    best = 0.0
+    for _ in range(5):
+        start = time.perf_counter()
+        table = {}
+        for i in range(100000):
+            table[i] = str(i)
+        sorted(table.values())
+        best = max(best, 1 / (time.perf_counter() - start))
+    return best
+
+
+def make_options(size):
+    return [f"选项 {i}" for i in range(size)]
+
+
+def bench_engine(size, path):
+    from chooser_engine import OptionStore, Chooser, save_options_file, load_options_file
+    from chooser_animation import FRAME_COUNT
+    options = make_options(size)
+    results = {}
+
+    # 小的档位用多个存储重复，每项至少处理约 10 万个选项
+    rounds = rounds_for(size)
+    stores = [OptionStore() for _ in range(rounds)]
+    results["add"] = rate(size * rounds, lambda: [s.add(option) for s in stores for option in options])
+    results["extend"] = rate(size * rounds, lambda: [OptionStore().extend(options) for _ in range(rounds)])
+    # 每个存储删除一半（最多 1 万个）
+    deletes = min(size // 2, 10000)
+    results["delete"] = rate(deletes * rounds, lambda: [s.remove_at(len(s) // 2) for s in stores
+                                                        for _ in range(deletes)])
+    stores = [OptionStore(options) for _ in range(rounds)]
+    results["clear"] = rate(size * rounds, lambda: [s.clear() for s in stores])
+    del stores
+
+    chooser = Chooser(OptionStore(options))
+    results["draw"] = rate(DRAWS, lambda: [chooser.choose() for _ in range(DRAWS)])
+    weighted = Chooser(OptionStore(options, [1 + i % 7 for i in range(size)]))
+    results["draw_weighted"] = rate(DRAWS, lambda: [weighted.choose() for _ in range(DRAWS)])
+    spins = DRAWS // FRAME_COUNT
+    results["animation_frames"] = rate(spins, lambda: [chooser.animation_frames(FRAME_COUNT)
+                                                       for _ in range(spins)])
+
+    for ext in (".json", ".rcb"):
+        filename = os.path.join(path, "engine" + ext)
+        results["save" + ext.replace(".", "_")] = rate(
+            size * rounds, lambda: [save_options_file(filename, options) for _ in range(rounds)])
+        results["load" + ext.replace(".", "_")] = rate(
+            size * rounds, lambda: [OptionStore().extend(load_options_file(filename)[0]) for _ in range(rounds)])
+    return results
+
+
+def bench_qt(size, path):
+    from PyQt5.QtWidgets import QApplication, QMessageBox, QFileDialog
+    import random_chooser_qt as module
+    module.ensure_save_path = lambda: path
+    filename = os.path.join(path, "qt.json")
+    # 对话框直接返回：提示框不显示，清空时选择「是」，保存到临时目录
+    for name in ("information", "warning", "critical"):
+        setattr(QMessageBox, name, lambda *args, **kwargs: None)
+    QMessageBox.exec_ = lambda box: next(button for button in box.buttons()
+                                         if box.buttonRole(button) == QMessageBox.YesRole).click()
+    QFileDialog.getSaveFileName = lambda *args, **kwargs: (filename, "")
+    app = QApplication(sys.argv[:1])
+    window = module.RandomChooserQt()
+    window.show()
+    app.processEvents()
+    options = make_options(size)
+    results = {}
+
+    results["extend"] = rate(size, lambda: window.options_model.append_options(options))
+    app.processEvents()
+
+    def add():
+        for i in range(GUI_OPS):
+            window.option_entry.setText(f"新选项 {i}")
+            window.add_option()
+            app.processEvents()
+
+    def delete():
+        model = window.options_model
+        for _ in range(GUI_OPS):
+            window.options_list.setCurrentIndex(model.index(model.rowCount() // 2))
+            window.delete_option()
+            app.processEvents()
+
+    def draw():
+        window.no_animation_check.setChecked(True)
+        for _ in range(GUI_OPS):
+            window.choose_random()
+            app.processEvents()
+
+    def wait(condition):
+        while not condition():
+            app.processEvents()
+            time.sleep(0.001)
+
+    results["add"] = rate(GUI_OPS, add)
+    results["delete"] = rate(GUI_OPS, delete)
+    results["draw"] = rate(GUI_OPS, draw)
+    count = len(window.options)
+    rounds = rounds_for(count)
+    times = dict.fromkeys(("save_json", "clear", "load_json"), 0.0)
+    for _ in range(rounds):
+        times["save_json"] += elapsed(lambda: (window.save_options(), wait(lambda: not window.save_tasks)))
+        times["clear"] += elapsed(lambda: (window.clear_options(), app.processEvents()))
+        times["load_json"] += elapsed(lambda: (window.start_loading(filename),
+                                               wait(lambda: window.loader is None)))
+        assert len(window.options) == count
+    for name, seconds in times.items():
+        results[name] = count * rounds / max(seconds, 1e-9)
+    window.close()
+    return results
+
+
+def bench_tk(size, path):
+    import random_chooser as module
+    module.ensure_save_path = lambda: path
+    filename = os.path.join(path, "tk.json")
+    for name in ("showinfo", "showwarning", "showerror"):
+        setattr(module.messagebox, name, lambda *args, **kwargs: None)
+    module.messagebox.askyesno = lambda *args, **kwargs: True
+    module.filedialog.asksaveasfilename = lambda *args, **kwargs: filename
+    window = module.RandomChooser()
+    window.update()
+    options = make_options(size)
+    results = {}
+
+    results["extend"] = rate(size, lambda: window.options.extend(options))
+    window.update()
+
+    def add():
+        for i in range(GUI_OPS):
+            window.option_entry.delete(0, "end")
+            window.option_entry.insert(0, f"新选项 {i}")
+            window.add_option()
+            window.update()
+
+    def delete():
+        for _ in range(GUI_OPS):
+            window._delete_option_card(len(window.option_filter) // 2)
+            window.update()
+
+    def draw():
+        window.no_animation_var.set(True)
+        for _ in range(GUI_OPS):
+            window.choose_random()
+            window.update()
+
+    def load():
+        window.start_loading(filename)
+        while window.loader is not None:
+            window.update()
+            time.sleep(0.001)
+
+    results["add"] = rate(GUI_OPS, add)
+    results["delete"] = rate(GUI_OPS, delete)
+    results["draw"] = rate(GUI_OPS, draw)
+    count = len(window.options)
+    rounds = rounds_for(count)
+    times = dict.fromkeys(("save_json", "clear", "load_json"), 0.0)
+    for _ in range(rounds):
+        times["save_json"] += elapsed(lambda: (window.save_options(), window.update()))
+        times["clear"] += elapsed(lambda: (window.clear_options(), window.update()))
+        times["load_json"] += elapsed(load)
+        assert len(window.options) == count
+    for name, seconds in times.items():
+        results[name] = count * rounds / max(seconds, 1e-9)
+    window.destroy()
+    return results
+
+
+def child(target, size):
+    path = tempfile.mkdtemp()
+    calibration = calibrate()
+    try:
+        results = {"engine": bench_engine, "qt": bench_qt, "tk": bench_tk}[target](size, path)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    results["calibration"] = calibration
+    results["peak_mb"] = peak_memory_mb()
+    print(json.dumps(results))
+
+
+def run_child(target, size):
+    # 在新进程中运行一档，返回结果；不能运行（没有显示器等）时返回 None
+    env = dict(os.environ)
+    command = [sys.executable, os.path.abspath(__file__), "--child", target, str(size)]
+    if target != "engine" and not env.get("DISPLAY") and not env.get("WAYLAND_DISPLAY"):
+        if target == "qt":
+            env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        elif shutil.which("xvfb-run"):
+            command = ["xvfb-run", "-a"] + command
+        else:
+            print("tk: 没有显示器，也找不到 xvfb-run，跳过")
+            return None
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, timeout=TIMEOUT)
+    lines = [line for line in output.stdout.splitlines() if line.startswith("{")]
+    if output.returncode != 0 or not lines:
+        print(f"{target} {size}: 运行失败\n{output.stderr}")
+        return None
+    return json.loads(lines[-1])
+
+
+def best_of(target, size, runs):
+    # 运行 runs 次，吞吐量取最高的一次，峰值内存取最低的一次
+    best = None
+    for _ in range(runs):
+        result = run_child(target, size)
+        if result is None:
+            return None
+        if best is None:
+            best = result
+            continue
+        for name, value in result.items():
+            if value is not None and best.get(name) is not None:
+                best[name] = min(best[name], value) if name == "peak_mb" else max(best[name], value)
+    return best
+
+
+def machine_info():
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "machine": platform.machine(), "cpus": os.cpu_count(), "numpy": numpy_version}
+
+
+def compare(name, value, base, scale, threshold):
+    # 返回 (说明, 是否退步)；峰值内存越低越好，其余越高越好，吞吐量先除以机器快慢的比例 scale
+    if value is None or not base:
+        return "", False
+    ratio = value / base
+    if name == "peak_mb":
+        return f"{ratio:6.2f}x", ratio > threshold
+    if name == "calibration":
+        return f"{ratio:6.2f}x", False
+    ratio /= scale
+    return f"{ratio:6.2f}x", ratio < 1 / threshold
+
+
+def format_value(name, value):
+    if value is None:
+        return "-"
+    if name == "peak_mb":
+        return f"{value:.1f} MB"
+    return f"{value:,.0f}/s"
+
+
+def report(results, baseline, threshold):
+    regressions = []
+    for target, tiers in results.items():
+        for size, metrics in tiers.items():
+            base = baseline.get(target, {}).get(size, {})
+            scale = 1.0
+            if metrics.get("calibration") and base.get("calibration"):
+                scale = metrics["calibration"] / base["calibration"]
+            print(f"\n{target} - 选项数量 {int(size):,}")
+            for name, value in metrics.items():
+                change, regressed = compare(name, value, base.get(name), scale, threshold)
+                note = "  <- 退步" if regressed else ""
+                print(f"  {name:<18}{format_value(name, value):>18}  {change}{note}")
+                if regressed:
+                    regressions.append(f"{target}/{size}/{name}")
+    return regressions
+
+
+def parse_args(argv):
+    args = {"tiers": list(TIERS), "targets": list(TARGETS), "runs": RUNS, "threshold": THRESHOLD,
+            "baseline": BASELINE, "save": False}
+    while argv:
+        arg = argv.pop(0)
+        if arg == "--save-baseline":
+            args["save"] = True
+        elif arg in ("--tiers", "--targets", "--runs", "--threshold", "--baseline") and argv:
+            value = argv.pop(0)
+            if arg == "--tiers":
+                args["tiers"] = [int(size) for size in value.split(",")]
+            elif arg == "--targets":
+                args["targets"] = [target for target in value.split(",") if target in TARGETS]
+            elif arg == "--runs":
+                args["runs"] = max(1, int(value))
+            elif arg == "--threshold":
+                args["threshold"] = float(value)
+            else:
+                args["baseline"] = value
+        else:
+            raise SystemExit(USAGE)
+    return args
+
+
+def main(argv):
+    if argv[:1] == ["--child"]:
+        child(argv[1], int(argv[2]))
+        return 0
+    args = parse_args(list(argv))
+    results = {}
+    for target in args["targets"]:
+        for size in args["tiers"]:
+            result = best_of(target, size, args["runs"])
+            if result is None:
+                break
+            results.setdefault(target, {})[str(size)] = result
+
+    baseline = {}
+    if os.path.exists(args["baseline"]):
+        with open(args["baseline"], "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        baseline = saved.get("results", {})
+        print(f"基线: {args['baseline']}（{saved.get('machine', {}).get('platform', '未知平台')}，"
+              f"Python {saved.get('machine', {}).get('python', '?')}）")
+    else:
+        print("还没有基线，使用 --save-baseline 保存这次的结果")
+    regressions = report(results, baseline, args["threshold"])
+
+    if args["save"]:
+        # 只替换这次测过的目标和档位，其余保留
+        saved = {"machine": machine_info(), "results": baseline}
+        for target, tiers in results.items():
+            saved["results"].setdefault(target, {}).update(tiers)
+        with open(args["baseline"], "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=2)
+        print(f"\n已保存基线: {args['baseline']}")
+        return 0
+    if regressions:
+        print(f"\n有 {len(regressions)} 项比基线退步超过 {args['threshold']} 倍: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,102 @@
+# 本地 HTTP 抽取服务（chooser_server.py）的压力测试：
+#   python benchmarks/load_test.py [--url http://127.0.0.1:端口] [--clients 并发数] [--seconds 秒数]
+# 不指定 --url 时在临时目录中准备一个选项集，启动一个本地服务进程并在结束后关闭。
+# 每个客户端使用一个 keep-alive 连接连续发送请求，最后报告每秒请求数和延迟分位数
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chooser_engine import save_options_file
+
+SET_NAME = "load_test.json"
+SET_SIZE = 100000
+
+
+def parse_args(argv):
+    args = {"--url": None, "--clients": "100", "--seconds": "5"}
+    while argv:
+        key = argv.pop(0)
+        if key not in args or not argv:
+            raise SystemExit("用法: python benchmarks/load_test.py [--url 地址] [--clients 并发数] [--seconds 秒数]")
+        args[key] = argv.pop(0)
+    return args["--url"], int(args["--clients"]), float(args["--seconds"])
+
+
+def start_server(path):
+    # 在新进程中启动服务，端口由系统分配，从输出的第一行读取
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "chooser_server.py"),
+                                "--port", "0", "--dir", path], stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    return process, line.split()[-1]
+
+
+async def client(host, port, paths, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        if not head.startswith(b"HTTP/1.1 200"):
+            errors.append(head.split(b"\r\n")[0])
+    writer.close()
+
+
+async def run(url, clients, seconds):
+    parts = urlsplit(url)
+    paths = [f"/sets/{SET_NAME}/draw", f"/sets/{SET_NAME}/draw?n=10", "/draw"]
+    # 先加载一次，让选项集进入缓存，也给当前选项列表准备一些选项
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+    body = f'{{"name": "{SET_NAME}"}}'.encode("utf-8")
+    writer.write(f"POST /options/load HTTP/1.1\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + body)
+    await reader.read()
+    writer.close()
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    await asyncio.gather(*(client(parts.hostname, parts.port, paths, deadline, latencies, errors)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"并发连接: {clients}，持续 {elapsed:.1f} 秒")
+    print(f"请求数: {len(latencies)}，每秒 {len(latencies) / elapsed:.0f} 个，错误 {len(errors)} 个")
+    for q in (0.5, 0.9, 0.99):
+        print(f"  p{int(q * 100)} 延迟: {latencies[int(q * (len(latencies) - 1))] * 1000:.2f} ms")
+
+
+def main(argv):
+    url, clients, seconds = parse_args(argv)
+    if url is not None:
+        asyncio.run(run(url, clients, seconds))
+        return
+    with tempfile.TemporaryDirectory() as path:
+        save_options_file(os.path.join(path, SET_NAME), [f"选项 {i}" for i in range(SET_SIZE)])
+        process, url = start_server(path)
+        try:
+            asyncio.run(run(url, clients, seconds))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
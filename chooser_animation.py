@@ -0,0 +1,71 @@
+# 结果动画的控制器，与界面库无关：两个版本都只有一个控制器和一个计时器。
+#
+# 动画开始时一次性生成要闪过的所有选项，每一帧在时间轴上有固定的显示时刻（越来越慢）。
+# 计时器触发时按真实经过的时间找到此刻应该显示的那一帧：界面繁忙、计时器来迟时
+# 直接跳到最新的一帧，中间的帧丢弃，动画总时长不会被拖长；整段都来迟时直接结束。
+# 动画进行中再次开始会先取消当前的动画，不会出现两串交替触发的计时器。
+#
+# 界面提供 schedule(毫秒) / unschedule() 来启动和停止自己的计时器，计时器触发时调用 tick()
+import time
+from bisect import bisect_right
+
+# 默认闪过的帧数
+FRAME_COUNT = 10
+
+
+def spin_timeline(count=FRAME_COUNT):
+    # 第 i 帧开始显示的时刻（秒），最后一项是动画结束、显示最终结果的时刻；
+    # 第 i 帧显示 0.1 * (1 + i / 5) 秒，与原来逐帧减速的效果相同
+    times = [0.0]
+    for i in range(count):
+        times.append(times[-1] + 0.1 * (1 + i / 5))
+    return times
+
+
+class SpinAnimation:
+    def __init__(self, schedule, unschedule, on_frame, on_finish, clock=time.monotonic):
+        self.schedule = schedule
+        self.unschedule = unschedule
+        self.on_frame = on_frame
+        self.on_finish = on_finish
+        self.clock = clock
+        self.frames = []
+        self.times = [0.0]
+        self.started = 0.0
+        self.shown = -1
+        # 因为来迟而没有显示的帧数
+        self.dropped = 0
+        self.running = False
+
+    def start(self, frames, times=None):
+        # 从头播放 frames；times 为每一帧的显示时刻加上结束时刻，默认用 spin_timeline()
+        self.cancel()
+        self.frames = list(frames)
+        self.times = times if times is not None else spin_timeline(len(self.frames))
+        self.started = self.clock()
+        self.shown = -1
+        self.dropped = 0
+        self.running = True
+        self.tick()
+
+    def cancel(self):
+        if self.running:
+            self.running = False
+            self.unschedule()
+
+    def tick(self):
+        if not self.running:
+            return
+        elapsed = self.clock() - self.started
+        due = bisect_right(self.times, elapsed) - 1
+        if due >= len(self.frames):
+            self.dropped += len(self.frames) - 1 - self.shown
+            self.running = False
+            self.on_finish()
+            return
+        if due > self.shown:
+            self.dropped += due - self.shown - 1
+            self.shown = due
+            self.on_frame(self.frames[due])
+        # 下一帧的显示时刻再触发，至少等 1 毫秒
+        self.schedule(max(1, int((self.times[due + 1] - elapsed) * 1000) + 1))
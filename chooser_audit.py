@@ -0,0 +1,406 @@
+# 可复现的随机流和抽取审计日志。
+#
+# RandomStream 由一个种子和一条路径（key）确定，第 position 个生成器由 (种子, 路径, position)
+# 经哈希得到，与之前抽取过多少次、在哪个线程或进程中抽取都无关；spawn() 分出互相独立的子流，
+# 可以交给 multiprocessing 的多个进程并行使用（对象本身可以 pickle）。
+#
+# 每次最终结果都追加一行到审计日志（saved_options/.audit.log），记录种子、路径、位置、
+# 选项集哈希和结果，之后用同一个选项集调用 rederive() 即可重新得到完全相同的结果：
+#   python chooser_audit.py 选项文件 [日志文件]
+#
+# 按权重抽取和选项集哈希使用分块索引（AuditIndex），修改选项后只重算涉及的块。
+# 记录中 "v" 为 2 的是这种格式；没有 "v" 的旧记录用整体哈希和 random.choices 重放。
+#
+# 轮换抽取的结果还取决于本轮之前的抽取，记录中的 "rotation" 为 {"drawn": 本轮已抽取的数量}，另外：
+#   "start": true     抽取时轮换的排列还是初始顺序，可以从这一条开始重放
+#   "follows": 位置    与同一随机流中第「位置」次抽取之间轮换没有别的修改，接着那一次重放
+# 两者都没有的（例如本轮中途增删了选项、加载了保存的轮换进度）不能重放，到本轮抽完、新的一轮开始时
+# 又可以重放。RotationReplay 按日志顺序重放。
+#
+# 日志超过 AUDIT_MAX_BYTES 时改名为 .audit.log.1（覆盖更早的那一份）再重新开始，最多占用两倍的空间
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from chooser_engine import DEFAULT_SAVE_PATH
+
+AUDIT_FILENAME = ".audit.log"
+AUDIT_VERSION = 2
+AUDIT_MAX_BYTES = 16 << 20
+
+
+def _derive(message):
+    return int.from_bytes(hashlib.blake2b(message.encode("utf-8"), digest_size=16).digest(), "little")
+
+
+def session_stream():
+    # 界面的会话随机流；设置了环境变量 CHOOSER_SEED 时使用固定的种子
+    seed = os.environ.get("CHOOSER_SEED")
+    return RandomStream(int(seed) if seed and seed.isdigit() else None)
+
+
+class RandomStream:
+    def __init__(self, seed=None, key=()):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.key = tuple(key)
+        self.position = 0
+        self._spawned = 0
+
+    @property
+    def path(self):
+        return "/".join(map(str, self.key))
+
+    def generator(self, position=None):
+        # 第 position 个生成器；不指定时取下一个并前进一位
+        if position is None:
+            position = self.position
+            self.position += 1
+        return random.Random(_derive(f"{self.seed}:{self.path}#{position}"))
+
+    def child(self, index):
+        return RandomStream(self.seed, self.key + (index,))
+
+    def spawn(self, count):
+        # 分出 count 个新的子流，每次调用得到的都不相同
+        first = self._spawned
+        self._spawned += count
+        return [self.child(i) for i in range(first, first + count)]
+
+
+def option_set_hash(options, weights=None):
+    # 旧格式（没有 "v" 的记录）的选项集哈希：选项和权重（按顺序）整体的哈希
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update("\0".join(options).encode("utf-8"))
+    if weights is not None and any(w != 1.0 for w in weights):
+        digest.update(b"\1")
+        digest.update(array("d", weights).tobytes())
+    return digest.hexdigest()
+
+
+class AuditIndex:
+    # 审计抽取和选项集哈希共用的分块索引：每 BLOCK 个选项一块，记下每块的权重和与摘要。
+    # 块的权重和用 math.fsum 计算（正确舍入），只取决于块内的权重、与修改的先后无关，
+    # 所以重放时重新构建的索引与抽取时的完全相同，同一个随机数总是落在同一个下标上。
+    # 订阅存储的修改，只把涉及的块记为需要重算；下次抽取时重算这些块，
+    # 之后按块的累积和二分找到块，再在块内累加查找：每次抽取 O(BLOCK + n / BLOCK)，
+    # 修改一个选项后的哈希也只需重算一块，不再整体重新计算
+    BLOCK = 1024
+
+    def __init__(self, store, subscribe=True):
+        self.store = store
+        self._sums = []
+        self._digests = []
+        self._dirty = set()
+        # 为 True 时所有块都需要重算（整体替换后）
+        self._rebuild = True
+        self._cumulative = None
+        self._hash = None
+        if subscribe:
+            store.subscribe(self._on_store_changed)
+
+    def _mark(self, first, last):
+        # 下标 first..last 所在的块需要重算
+        if first <= last:
+            self._dirty.update(range(first // self.BLOCK, last // self.BLOCK + 1))
+        self._cumulative = None
+        self._hash = None
+
+    def _on_store_changed(self, event, index, count):
+        length = len(self.store)
+        if event in ("insert", "update"):
+            self._mark(index, index + count - 1)
+        elif event == "swap_remove":
+            # 原来的最后一项（下标 length）移到了 index
+            self._mark(index, index)
+            self._mark(length, length)
+        elif event == "swap_insert":
+            self._mark(index, index)
+            self._mark(length - 1, length - 1)
+        elif event == "truncate":
+            self._mark(index, index)
+        else:
+            self._rebuild = True
+            self._mark(0, -1)
+
+    def _refresh(self):
+        if self._cumulative is not None:
+            return
+        store = self.store
+        block = self.BLOCK
+        length = len(store)
+        count = (length + block - 1) // block
+        if self._rebuild:
+            self._sums = [0.0] * count
+            self._digests = [b""] * count
+            dirty = range(count)
+        else:
+            del self._sums[count:]
+            del self._digests[count:]
+            self._sums.extend([0.0] * (count - len(self._sums)))
+            self._digests.extend([b""] * (count - len(self._digests)))
+            dirty = [b for b in self._dirty if b < count]
+        for b in dirty:
+            start = b * block
+            end = min(start + block, length)
+            weights = store.weights(start, end)
+            self._sums[b] = math.fsum(weights)
+            digest = hashlib.blake2b("\0".join(store[start:end]).encode("utf-8"), digest_size=16)
+            digest.update(array("d", weights).tobytes())
+            self._digests[b] = digest.digest()
+        self._rebuild = False
+        self._dirty = set()
+        self._cumulative = list(accumulate(self._sums))
+
+    def set_hash(self):
+        # 选项和权重（按顺序）的哈希，用于确认重放时使用的是同一个选项集
+        if self._hash is None:
+            self._refresh()
+            digest = hashlib.blake2b(len(self.store).to_bytes(8, "little"), digest_size=16)
+            digest.update(b"".join(self._digests))
+            self._hash = digest.hexdigest()
+        return self._hash
+
+    def sample(self, rng):
+        # 按权重抽取一个下标，只用 rng 的一个随机数；总权重必须大于 0
+        self._refresh()
+        cumulative = self._cumulative
+        sums = self._sums
+        u = rng.random() * cumulative[-1]
+        b = bisect_right(cumulative, u, 0, len(cumulative) - 1)
+        # 舍入误差可能落到末尾权重为 0 的块上，退回到前面最近的非零块
+        while not sums[b]:
+            b -= 1
+        start = b * self.BLOCK
+        weights = self.store.weights(start, start + self.BLOCK)
+        offset = u - (cumulative[b - 1] if b else 0.0)
+        i = bisect_right(list(accumulate(weights)), offset, 0, len(weights) - 1)
+        while not weights[i]:
+            i -= 1
+        return start + i
+
+
+def audited_index(store, rng, subset=None, index=None):
+    # 审计抽取只使用固定的算法（不依赖别名表等缓存状态），相同的输入总是得到相同的下标；
+    # index 为 store 的 AuditIndex，不给出时临时构建一个（O(n)）
+    weighted = store.is_weighted()
+    if subset is not None:
+        if not weighted:
+            return subset[rng.randrange(len(subset))]
+        return rng.choices(subset, weights=[store.weight(i) for i in subset])[0]
+    if not weighted:
+        return rng.randrange(len(store))
+    if index is None:
+        index = AuditIndex(store, subscribe=False)
+    return index.sample(rng)
+
+
+class AuditLog:
+    # 追加写入的审计日志，每行一个 JSON 对象；超过 max_bytes 时把当前的日志改名为「文件名.1」
+    def __init__(self, filename=os.path.join(DEFAULT_SAVE_PATH, AUDIT_FILENAME), max_bytes=AUDIT_MAX_BYTES):
+        self.filename = filename
+        self.max_bytes = max_bytes
+
+    def record(self, entry):
+        import json
+        with open(self.filename, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            size = f.tell()
+        if size > self.max_bytes:
+            os.replace(self.filename, self.filename + ".1")
+
+    def entries(self):
+        # 先读改名保存的上一份，再读当前的日志，按写入的顺序
+        import json
+        for filename in (self.filename + ".1", self.filename):
+            try:
+                with open(filename, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            yield json.loads(line)
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                continue
+
+
+class DrawAuditor:
+    # 用会话随机流抽出最终结果并写入审计日志；选项集哈希和按权重抽取都使用增量维护的 AuditIndex
+    def __init__(self, store, stream=None, log=None):
+        self.store = store
+        self.stream = stream if stream is not None else RandomStream()
+        self.log = log
+        self.index = AuditIndex(store)
+        # 上一次轮换抽取：(Rotation, 抽取后的 version, 随机流位置)
+        self._last_rotation = None
+
+    def set_hash(self):
+        return self.index.set_hash()
+
+    def choose_index(self, subset=None, query="", rotation=None, tags=""):
+        # subset 为筛选结果时需要同时给出筛选条件 query，重放时据此重新筛选；subset 中用到了
+        # 标签条件（chooser_tags.parse_query）时还要给出条件文字 tags，重放时需要同一个选项集的标签；
+        # 给出 rotation（chooser_rotation.Rotation）时按轮换抽取，同时记录本轮的进度，用 RotationReplay 重放
+        position = self.stream.position
+        if rotation is not None:
+            if not rotation.remaining and rotation.can_choose(subset):
+                # 本轮已经抽完：在记录之前开始新的一轮（抽取时也会这样做），这一条可以从头重放
+                rotation.new_round()
+            state = {"drawn": rotation.drawn_count}
+            last = self._last_rotation
+            if rotation.at_start():
+                state["start"] = True
+            elif last is not None and last[0] is rotation and last[1] == rotation.version:
+                state["follows"] = last[2]
+            index = rotation.choose_index(subset, self.stream.generator())
+            self._last_rotation = (rotation, rotation.version, position)
+        else:
+            index = audited_index(self.store, self.stream.generator(), subset, self.index)
+        if self.log is not None:
+            entry = {"v": AUDIT_VERSION, "time": round(time.time(), 3), "seed": self.stream.seed, "stream": self.stream.path,
+                     "pos": position, "set": self.set_hash(), "count": len(self.store),
+                     "index": index, "option": self.store[index]}
+            if subset is not None:
+                entry["query"] = query
+            if tags:
+                entry["tags"] = tags
+            if rotation is not None:
+                entry["rotation"] = state
+            self.log.record(entry)
+        return index
+
+
+def _entry_set_hash(entry, store, index):
+    if entry.get("v", 1) >= AUDIT_VERSION:
+        return index.set_hash()
+    return option_set_hash(store, store.weights() if store.is_weighted() else None)
+
+
+def rederive(entry, store, tags=None, index=None, rotation=None):
+    # 用审计记录中的种子和位置在 store 上重新抽取，返回下标；选项集不同时抛出 ValueError。
+    # 按标签条件抽取的记录需要给出选项集的标签 tags（chooser_tags.TagIndex）；
+    # 核对多条记录时可以给出同一个 AuditIndex，不必每次重新构建。
+    # 轮换抽取的记录需要给出处于抽取之前状态的 rotation（会在其上抽取），通常由 RotationReplay 准备
+    if entry.get("rotation"):
+        if rotation is None:
+            raise ValueError("轮换抽取的结果取决于本轮之前的抽取，需要按顺序重放")
+        if rotation.drawn_count != entry["rotation"]["drawn"]:
+            raise ValueError("轮换进度与审计记录不一致")
+    if index is None:
+        index = AuditIndex(store, subscribe=False)
+    if _entry_set_hash(entry, store, index) != entry["set"]:
+        raise ValueError("选项集与审计记录不一致")
+    stream = RandomStream(entry["seed"], [int(part) for part in entry["stream"].split("/") if part])
+    subset = None
+    if "query" in entry:
+        from chooser_filter import OptionFilter
+        option_filter = OptionFilter(store)
+        option_filter.set_query(entry["query"])
+        subset = option_filter.indices
+    if entry.get("tags"):
+        if tags is None:
+            raise ValueError("按标签条件抽取的结果需要选项集的标签才能重放")
+        subset = tags.select(entry["tags"], subset)
+        if not len(subset):
+            raise ValueError("选项集的标签与审计记录不一致")
+    rng = stream.generator(entry["pos"])
+    if entry.get("rotation"):
+        return rotation.choose_index(subset, rng)
+    if subset is None and store.is_weighted() and entry.get("v", 1) < AUDIT_VERSION:
+        return rng.choices(range(len(store)), weights=store.weights())[0]
+    return audited_index(store, rng, subset, index)
+
+
+class RotationReplay:
+    # 按日志顺序重放轮换抽取：每条随机流一个 Rotation，遇到 "start" 的记录时开始新的一轮，
+    # 之后只重放接着上一次的（"follows"）记录，中间断开后要等到下一条 "start"
+    def __init__(self, store, tags=None, index=None):
+        self.store = store
+        self.tags = tags
+        self.index = index if index is not None else AuditIndex(store, subscribe=False)
+        # (种子, 路径) -> [Rotation, 上一次重放的位置或 None]
+        self._chains = {}
+
+    def _chain(self, entry):
+        from chooser_rotation import Rotation
+        key = (entry["seed"], entry["stream"])
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = self._chains[key] = [Rotation(self.store), None]
+        return chain
+
+    def can_rederive(self, entry):
+        state = entry.get("rotation")
+        if not isinstance(state, dict):
+            # 旧格式的记录没有轮换进度
+            return False
+        if state.get("start"):
+            return True
+        chain = self._chains.get((entry["seed"], entry["stream"]))
+        return chain is not None and chain[1] is not None and state.get("follows") == chain[1]
+
+    def rederive(self, entry):
+        # 返回重放得到的下标；不能重放或与记录不一致时抛出 ValueError，这条随机流要等到下一条 "start" 才能继续
+        can_rederive = self.can_rederive(entry)
+        chain = self._chain(entry)
+        chain[1] = None
+        if not can_rederive:
+            raise ValueError("轮换抽取的结果取决于本轮之前的抽取，这条记录之前的抽取不能重放")
+        rotation = chain[0]
+        if entry["rotation"].get("start"):
+            rotation.new_round()
+        index = rederive(entry, self.store, self.tags, self.index, rotation)
+        chain[1] = entry["pos"]
+        return index
+
+
+def main(argv):
+    if len(argv) not in (1, 2):
+        print("用法: python chooser_audit.py 选项文件 [日志文件]")
+        return 2
+    from chooser_engine import OptionStore
+    from chooser_stream import read_option_file
+    from chooser_tags import TagIndex, load_tags
+    store = OptionStore(*read_option_file(argv[0]))
+    tags = TagIndex(store)
+    tags.load(load_tags(argv[0], len(store)))
+    log = AuditLog(argv[1]) if len(argv) == 2 else AuditLog()
+    index = AuditIndex(store, subscribe=False)
+    replay = RotationReplay(store, tags, index)
+    set_hashes = {}
+    checked = failed = skipped = 0
+    for entry in log.entries():
+        version = entry.get("v", 1)
+        if version not in set_hashes:
+            set_hashes[version] = _entry_set_hash(entry, store, index)
+        if entry.get("set") != set_hashes[version]:
+            continue
+        if entry.get("rotation") and not replay.can_rederive(entry):
+            skipped += 1
+            continue
+        checked += 1
+        try:
+            if entry.get("rotation"):
+                found = replay.rederive(entry)
+            else:
+                found = rederive(entry, store, tags, index)
+        except ValueError as e:
+            failed += 1
+            print(f"不一致: 第 {entry['pos']} 次抽取记录为 {entry['option']}，{e}")
+            continue
+        if found != entry["index"] or store[found] != entry["option"]:
+            failed += 1
+            print(f"不一致: 第 {entry['pos']} 次抽取记录为 {entry['option']}，重放得到 {store[found]}")
+    print(f"已核对 {checked} 条记录，不一致 {failed} 条" + (f"，跳过不能重放的轮换抽取 {skipped} 条" if skipped else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,172 @@
+# 批量抽取：一次调用抽出 k 个结果（可放回 / 不放回）或整体打乱顺序。
+# 安装了 NumPy 时对大批量使用向量化实现，否则退回纯 Python 实现；
+# NumPy 只在第一次需要时导入，不影响 chooser_engine 的导入速度。
+# 累积权重、别名表和选项的对象数组按选项存储的修改计数（OptionStore.version）缓存，
+# 连续多次批量抽取时只构建一次；不订阅存储，临时创建的 BatchChooser 用完直接丢弃即可
+import heapq
+import math
+from collections import Counter
+from itertools import accumulate
+
+# 批量或选项数量小于这个值时，NumPy 的调用开销不划算
+NUMPY_MIN_SIZE = 1000
+
+_numpy = None
+
+
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def _alias_arrays(np, weights):
+    # 向量化构建别名表，返回 (prob, alias)。按「扫描」的顺序构建：轻的槽位（缩放后的权重 p < 1）
+    # 依次从当前的重选项借 1 - p；重选项剩下的不足 1 时自己也变成轻的槽位，向下一个重选项借。
+    # 用轻槽位欠额的前缀和 D 与重选项盈余的前缀和 S 就能直接算出每个槽位的结果，不需要逐个循环：
+    #   轻槽位 i 的别名是第一个 S >= D[i-1] 的重选项；
+    #   重选项 j 在第一个 D[i] > S[j] 的轻槽位处变轻，概率为 1 + S[j] - D[i]，别名是下一个重选项
+    n = len(weights)
+    scaled = weights * (n / weights.sum())
+    prob = np.ones(n)
+    alias = np.arange(n)
+    light = np.flatnonzero(scaled < 1.0)
+    heavy = np.flatnonzero(scaled >= 1.0)
+    if not len(light) or not len(heavy):
+        return prob, alias
+    deficit = np.cumsum(1.0 - scaled[light])
+    surplus = np.cumsum(scaled[heavy] - 1.0)
+    before = np.concatenate(([0.0], deficit[:-1]))
+    prob[light] = scaled[light]
+    alias[light] = heavy[np.minimum(np.searchsorted(surplus, before, side="left"), len(heavy) - 1)]
+    # 浮点误差使最后几个重选项看起来没有变轻时，它们的概率保持 1
+    switch = np.searchsorted(deficit, surplus, side="right")
+    switched = switch < len(light)
+    prob[heavy[switched]] = np.clip(1.0 + surplus[switched] - deficit[switch[switched]], 0.0, 1.0)
+    alias[heavy[:-1]] = heavy[1:]
+    return prob, alias
+
+
+class BatchChooser:
+    # use_numpy: None 表示自动（安装了 NumPy 且数量足够大时使用），True / False 强制开关
+    def __init__(self, store, rng, use_numpy=None):
+        self.store = store
+        self.rng = rng
+        self.use_numpy = use_numpy
+        self._cache = {}
+        self._cache_version = None
+
+    def _cached(self, key, build):
+        # 选项存储修改后（version 变化）整体作废
+        if self._cache_version != self.store.version:
+            self._cache = {}
+            self._cache_version = self.store.version
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = build()
+        return value
+
+    def _numpy_for(self, size):
+        if self.use_numpy is False:
+            return None
+        np = _load_numpy()
+        if self.use_numpy and np is None:
+            raise RuntimeError("没有安装 NumPy")
+        if self.use_numpy or size >= NUMPY_MIN_SIZE:
+            return np
+        return None
+
+    def _generator(self, np):
+        # NumPy 生成器的种子取自 self.rng，固定了 rng 的种子时结果也可以复现
+        return np.random.default_rng(self.rng.getrandbits(64))
+
+    def draw_indices(self, k, replace=True):
+        # 返回 k 个被抽中的下标；NumPy 路径返回 ndarray，否则返回 list
+        n = len(self.store)
+        if k < 0:
+            raise ValueError("抽取数量不能为负数")
+        if k and not self.store.choosable_count():
+            raise IndexError("没有可选择的选项")
+        if not replace and k > self.store.choosable_count():
+            raise ValueError("不放回抽取的数量超过了可选择的选项数")
+
+        weighted = self.store.is_weighted()
+        np = self._numpy_for(max(n, k))
+        if np is not None:
+            return self._draw_numpy(np, n, k, replace, weighted)
+        return self._draw_python(n, k, replace, weighted)
+
+    def _draw_python(self, n, k, replace, weighted):
+        rng = self.rng
+        if replace:
+            if not weighted:
+                return rng.choices(range(n), k=k)
+            cum_weights = self._cached("cum_weights", lambda: list(accumulate(self.store.weights())))
+            return rng.choices(range(n), cum_weights=cum_weights, k=k)
+        if not weighted:
+            return rng.sample(range(n), k)
+        # Efraimidis–Spirakis：key = log(u) / w，取 key 最大的 k 个，O(n log k)
+        keys = [math.log(1.0 - rng.random()) / w if w > 0 else -math.inf for w in self.store.weights()]
+        return heapq.nlargest(k, range(n), key=keys.__getitem__)
+
+    def _weight_array(self, np):
+        return self._cached("weight_array", lambda: np.asarray(self.store.weights(), dtype=np.float64))
+
+    def _draw_numpy(self, np, n, k, replace, weighted):
+        gen = self._generator(np)
+        if replace:
+            if not weighted:
+                return gen.integers(0, n, size=k)
+            # 别名表：每个结果只需一次随机取槽位和一次比较，比在累积权重上二分快得多
+            prob, alias = self._cached("alias", lambda: _alias_arrays(np, self._weight_array(np)))
+            indices = gen.integers(0, n, size=k)
+            return np.where(gen.random(k) < prob[indices], indices, alias[indices])
+        if not weighted:
+            return gen.choice(n, size=k, replace=False)
+        w = self._weight_array(np)
+        with np.errstate(divide="ignore"):
+            keys = np.log(1.0 - gen.random(n)) / w
+        keys[w == 0] = -np.inf
+        if k == 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(-keys, k - 1)[:k]
+        return top[np.argsort(-keys[top])]
+
+    def _options_at(self, indices):
+        # 把下标换成选项列表；NumPy 路径上结果较多时用缓存的对象数组整体取出，不逐个索引
+        options = self.store
+        if isinstance(indices, list):
+            return [options[i] for i in indices]
+        if len(indices) * 4 < len(options):
+            return [options[i] for i in indices.tolist()]
+
+        def build():
+            objects = _numpy.empty(len(options), dtype=object)
+            objects[:] = options.to_list()
+            return objects
+        return self._cached("objects", build)[indices].tolist()
+
+    def draw(self, k, replace=True):
+        return self._options_at(self.draw_indices(k, replace))
+
+    def shuffled_indices(self):
+        # 所有可选选项的随机排列；有权重时按权重做不放回抽样排列
+        return self.draw_indices(self.store.choosable_count(), replace=False)
+
+    def shuffled(self):
+        return self._options_at(self.shuffled_indices())
+
+    def counts(self, k):
+        # 放回抽取 k 次，返回每个选项被抽中的次数（用于蒙特卡洛公平性检查）
+        n = len(self.store)
+        indices = self.draw_indices(k, replace=True)
+        np = self._numpy_for(max(n, k))
+        if np is not None:
+            return np.bincount(indices, minlength=n).tolist()
+        counter = Counter(indices)
+        return [counter.get(i, 0) for i in range(n)]
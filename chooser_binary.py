@@ -0,0 +1,339 @@
+# 二进制选项文件（.rcb）：字符串表 + 偏移索引，可以直接内存映射。
+# 打开文件只读取文件头，单个选项在显示或被抽中时才解码，百万级选项也能瞬间打开。
+#
+# 文件布局（小端序）：
+#   文件头   magic "RCHS" | 版本 u16 | 保留 u16 | 选项数 n u64 | 权重偏移 u64（0 表示没有权重）| 数据偏移 u64
+#   偏移表   (n + 1) 个 u64，第 i 个选项是数据区中 [offsets[i], offsets[i + 1]) 的 UTF-8 字节
+#   权重表   n 个 float64（可选）
+#   数据区   所有选项的 UTF-8 字节依次拼接
+#   轮换记录 （可选）本轮已抽中的 m 个选项下标 u64 | magic "RCDR" | m u64
+#   标签记录 （可选）每个标签依次为 名称字节数 u32 | 名称 UTF-8 | 位图字节数 u64 | 位图（见 chooser_tags.py），
+#            之后是 magic "RCTG" | 以上内容的总字节数 u64
+#            附加记录依次写在数据区之后，读取时从文件末尾向前逐段找出；旧版本程序不会读取这一部分
+#            （旧版本只认末尾紧接着数据区或数据区之后只有轮换记录的文件，有标签时会忽略轮换记录）
+#
+# 也可以在命令行中和 JSON 互相转换（无损）：
+#   python chooser_binary.py 输入文件 输出文件
+import mmap
+import os
+import struct
+import sys
+import weakref
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate
+
+from chooser_engine import OptionFormatError, check_weights, load_json_data, options_from_json, save_options_file
+
+BINARY_EXT = ".rcb"
+MAGIC = b"RCHS"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQQ")
+DRAWN_MAGIC = b"RCDR"
+TAGS_MAGIC = b"RCTG"
+# 附加记录的结尾：magic 和条目数；每个条目的字节数由 magic 决定
+TRAILER_FOOTER = struct.Struct("<4sQ")
+TRAILER_ITEM_SIZES = {DRAWN_MAGIC: 8, TAGS_MAGIC: 1}
+
+
+# 文件路径 -> 正在映射这个文件的 MappedOptions（弱引用），替换文件之前用 release_mappings() 关闭映射
+_mappings = {}
+
+
+def _mapping_key(filename):
+    return os.path.normcase(os.path.abspath(filename))
+
+
+def release_mappings(filename):
+    # 把映射着 filename 的选项全部读入内存并关闭映射。Windows 上正被映射的文件不能被替换，
+    # 覆盖保存之前调用；这些选项对象之后照常可用（存储、撤销历史等仍然持有它们）
+    for options in list(_mappings.pop(_mapping_key(filename), ())):
+        options.release()
+
+
+def is_binary_file(filename):
+    return os.path.splitext(filename)[1].lower() == BINARY_EXT
+
+
+def _little_endian_array(typecode, data):
+    # 在小端机器上直接把内存映射区转换成只读视图，不复制；大端机器上才复制并转换字节序
+    if sys.byteorder == "little":
+        return memoryview(data).cast(typecode)
+    values = array(typecode)
+    values.frombytes(data)
+    values.byteswap()
+    return values
+
+
+class MappedOptions(Sequence):
+    # 内存映射的选项序列：支持 len、下标和迭代，读取时才解码对应的字符串；
+    # release() 之后改为从读入内存的列表中读取。
+    # 打开时不检查每个选项（那样就要读完整个文件），读到偏移不对或不是 UTF-8 的选项时抛出 OptionFormatError，
+    # check() 可以在后台线程中一次检查全部选项
+    def __init__(self, mm, count, offsets, data_offset):
+        self._mm = mm
+        self._count = count
+        self._offsets = offsets
+        self._data_offset = data_offset
+        # 数据区的长度，选项的偏移都不能超过它
+        self._data_size = len(mm) - data_offset
+        self._items = None
+
+    def release(self):
+        # 全部解码到列表中再关闭映射；其他线程正在读取时，映射关闭后改从列表中读取
+        if self._items is not None:
+            return
+        self._items = list(self)
+        offsets = self._offsets
+        if isinstance(offsets, memoryview):
+            # 偏移表是映射区的视图，不释放就关不掉映射
+            offsets.release()
+        self._mm.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("选项下标超出范围")
+        if self._items is not None:
+            return self._items[index]
+        base = self._data_offset
+        try:
+            start = self._offsets[index]
+            end = self._offsets[index + 1]
+            data = self._mm[base + start:base + end]
+        except ValueError:
+            # 读取的同时映射被 release() 关闭了
+            if self._items is None:
+                raise
+            return self._items[index]
+        if not start <= end <= self._data_size:
+            raise OptionFormatError("文件格式不正确!")
+        try:
+            return str(data, "utf-8")
+        except UnicodeDecodeError:
+            raise OptionFormatError("文件格式不正确!")
+
+    def __iter__(self):
+        if self._items is not None:
+            yield from self._items
+            return
+        mm = self._mm
+        base = self._data_offset
+        offsets = self._offsets
+        size = self._data_size
+        for i in range(self._count):
+            try:
+                start = offsets[i]
+                end = offsets[i + 1]
+                data = mm[base + start:base + end]
+            except ValueError:
+                if self._items is None:
+                    raise
+                yield from self._items[i:]
+                return
+            if not start <= end <= size:
+                raise OptionFormatError("文件格式不正确!")
+            try:
+                yield str(data, "utf-8")
+            except UnicodeDecodeError:
+                raise OptionFormatError("文件格式不正确!")
+
+    def check(self, cancelled=None):
+        # 逐个解码一遍，文件损坏时抛出 OptionFormatError；耗时与文件大小成正比，应在后台线程中调用。
+        # cancelled() 返回 True 时提前结束，返回 False
+        for i, _ in enumerate(self):
+            if not i & 0xffff and cancelled is not None and cancelled():
+                return False
+        return True
+
+
+def save_binary_file(filename, options, weights=None, drawn=None, tags=None):
+    try:
+        encoded = [option.encode("utf-8") for option in options]
+    except (AttributeError, UnicodeEncodeError):
+        # 选项不是字符串，或含有不能编码为 UTF-8 的字符（单独的代理项）
+        raise OptionFormatError("选项必须是字符串!")
+    count = len(encoded)
+    offsets = array("Q", [0])
+    offsets.extend(accumulate(len(data) for data in encoded))
+    if weights is not None and any(w != 1.0 for w in weights):
+        weights = array("d", check_weights(weights))
+        if len(weights) != count:
+            raise ValueError("权重数量与选项数量不一致")
+    else:
+        weights = None
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        if weights is not None:
+            weights.byteswap()
+
+    offsets_size = (count + 1) * offsets.itemsize
+    weights_offset = HEADER.size + offsets_size if weights is not None else 0
+    data_offset = HEADER.size + offsets_size + (count * 8 if weights is not None else 0)
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, count, weights_offset, data_offset))
+        offsets.tofile(f)
+        if weights is not None:
+            weights.tofile(f)
+        f.writelines(encoded)
+        if drawn:
+            drawn = array("Q", drawn)
+            if sys.byteorder != "little":
+                drawn.byteswap()
+            drawn.tofile(f)
+            f.write(TRAILER_FOOTER.pack(DRAWN_MAGIC, len(drawn)))
+        if tags:
+            # tags 为 {标签: 位图 bytes}
+            size = 0
+            for name, bits in tags.items():
+                encoded = name.encode("utf-8")
+                f.write(struct.pack("<I", len(encoded)) + encoded + struct.pack("<Q", len(bits)))
+                f.write(bits)
+                size += 12 + len(encoded) + len(bits)
+            f.write(TRAILER_FOOTER.pack(TAGS_MAGIC, size))
+
+
+def load_binary_file(filename):
+    # 返回 (MappedOptions, 权重列表或 None)，选项本身不会被读入内存
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise OptionFormatError("文件格式不正确!")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, _, count, weights_offset, data_offset = HEADER.unpack_from(mm, 0)
+    offsets_end = HEADER.size + (count + 1) * 8
+    if magic != MAGIC or version != VERSION or offsets_end > len(mm) or data_offset > len(mm):
+        raise OptionFormatError("文件格式不正确!")
+    offsets = _little_endian_array("Q", memoryview(mm)[HEADER.size:offsets_end])
+    if count and data_offset + offsets[count] > len(mm):
+        raise OptionFormatError("文件格式不正确!")
+
+    weights = None
+    if weights_offset:
+        if weights_offset + count * 8 > len(mm):
+            raise OptionFormatError("文件格式不正确!")
+        try:
+            weights = check_weights(_little_endian_array(
+                "d", memoryview(mm)[weights_offset:weights_offset + count * 8]))
+        except ValueError:
+            raise OptionFormatError("文件格式不正确!")
+    options = MappedOptions(mm, count, offsets, data_offset)
+    _mappings.setdefault(_mapping_key(filename), weakref.WeakSet()).add(options)
+    return options, weights
+
+
+def _read_trailers(filename):
+    # 读取数据区之后的附加记录，返回 {magic: 记录内容 bytes}；只读取文件头和末尾，不会读入选项。
+    # 从文件末尾向前逐段读取，遇到不认识或长度不对的结尾就停下
+    trailers = {}
+    with open(filename, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size + TRAILER_FOOTER.size:
+            return trailers
+        magic, version, _, count, _, data_offset = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise OptionFormatError("文件格式不正确!")
+        if HEADER.size + (count + 1) * 8 > size:
+            return trailers
+        f.seek(HEADER.size + count * 8)
+        data_end = data_offset + struct.unpack("<Q", f.read(8))[0]
+        end = size
+        while end - data_end >= TRAILER_FOOTER.size:
+            f.seek(end - TRAILER_FOOTER.size)
+            magic, length = TRAILER_FOOTER.unpack(f.read(TRAILER_FOOTER.size))
+            item_size = TRAILER_ITEM_SIZES.get(magic)
+            if item_size is None or magic in trailers:
+                break
+            start = end - TRAILER_FOOTER.size - length * item_size
+            if start < data_end:
+                break
+            f.seek(start)
+            trailers[magic] = f.read(length * item_size)
+            end = start
+    return trailers
+
+
+def load_binary_drawn(filename):
+    # 读取文件末尾的轮换记录，没有时返回空列表
+    data = _read_trailers(filename).get(DRAWN_MAGIC)
+    if not data:
+        return []
+    drawn = array("Q")
+    drawn.frombytes(data)
+    if sys.byteorder != "little":
+        drawn.byteswap()
+    return drawn.tolist()
+
+
+def load_binary_tags(filename):
+    # 读取文件末尾的标签记录，返回 {标签: 位图 bytes}，没有时返回空字典
+    data = _read_trailers(filename).get(TAGS_MAGIC)
+    tags = {}
+    pos = 0
+    try:
+        while data and pos < len(data):
+            name_size, = struct.unpack_from("<I", data, pos)
+            name = str(data[pos + 4:pos + 4 + name_size], "utf-8")
+            pos += 4 + name_size
+            bits_size, = struct.unpack_from("<Q", data, pos)
+            pos += 8
+            if pos + bits_size > len(data):
+                raise OptionFormatError("文件格式不正确!")
+            tags[name] = data[pos:pos + bits_size]
+            pos += bits_size
+    except (struct.error, UnicodeDecodeError):
+        raise OptionFormatError("文件格式不正确!")
+    return tags
+
+
+def load_drawn(filename):
+    # 读取选项文件中保存的轮换记录（本轮已抽中的下标），没有时返回空列表；
+    # 只有 JSON 和 .rcb 格式有轮换记录，其他格式返回空列表
+    if is_binary_file(filename):
+        return load_binary_drawn(filename)
+    if os.path.splitext(filename)[1].lower() != ".json":
+        return []
+    return drawn_from_json(load_json_data(filename))
+
+
+def drawn_from_json(data):
+    # 从 load_json_data() 读入的内容中取出轮换记录
+    drawn = data.get("drawn") if isinstance(data, dict) else None
+    if drawn is None:
+        return []
+    if not isinstance(drawn, list) or not all(isinstance(i, int) and 0 <= i for i in drawn):
+        raise OptionFormatError("文件格式不正确!")
+    return drawn
+
+
+def convert_options_file(source, target):
+    # 在 JSON 和二进制格式之间无损转换（选项、权重、轮换记录和标签），格式由扩展名决定；
+    # 源文件只解析一次
+    from chooser_tags import tags_from_json
+    if is_binary_file(source):
+        options, weights = load_binary_file(source)
+        drawn = load_binary_drawn(source)
+        tags = load_binary_tags(source)
+    else:
+        data = load_json_data(source)
+        options, weights = options_from_json(data)
+        if os.path.splitext(source)[1].lower() == ".json":
+            drawn = drawn_from_json(data)
+            tags = tags_from_json(data, len(options))
+        else:
+            drawn, tags = [], {}
+    save_options_file(target, options, weights, drawn, tags=tags)
+    return len(options)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("用法: python chooser_binary.py 输入文件 输出文件")
+        sys.exit(2)
+    print(f"已转换 {convert_options_file(sys.argv[1], sys.argv[2])} 个选项")
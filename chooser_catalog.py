@@ -0,0 +1,219 @@
+# saved_options 目录的目录索引：记录每个选项集的文件名、选项数、修改时间，
+# 并建立「选项词 -> 选项集」的倒排索引，用于边输入边查找包含某个选项的选项集。
+# 索引保存在目录下的 .catalog.json 中；refresh() 只重新读取修改时间或大小变化了的文件。
+# 读取索引文件和刷新都可能比较慢，界面中应通过 refresh_async() 在后台完成，
+# 在此之前 search() 返回空结果
+import os
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from chooser_engine import DEFAULT_SAVE_PATH
+from chooser_stream import read_option_file
+
+CATALOG_FILENAME = ".catalog.json"
+CATALOG_VERSION = 1
+OPTION_FILE_EXTS = (".json", ".rcb", ".ndjson", ".jsonl", ".txt")
+
+# 很短的查询可能匹配大量的词，最多扫描这么多个词，保证每次查找都足够快
+MAX_SCAN_TERMS = 5000
+
+CatalogMatch = namedtuple("CatalogMatch", "name count matches")
+
+
+def option_terms(option):
+    # 整个选项和其中以空白分隔的每个词都作为索引词（不区分大小写）
+    text = " ".join(option.casefold().split())
+    terms = set(text.split())
+    if text:
+        terms.add(text)
+    return terms
+
+
+def read_option_set(filename):
+    # 读取任意支持格式的选项集，返回选项列表
+    return list(read_option_file(filename)[0])
+
+
+class Catalog:
+    # 索引文件中保存按字典序排列的索引词及每个词对应的选项集编号列表，
+    # 加载时直接得到倒排索引，不需要重新读取选项集或重新排序
+    def __init__(self, path=DEFAULT_SAVE_PATH):
+        self.path = path
+        self.index_file = os.path.join(path, CATALOG_FILENAME)
+        # 文件名 -> {"id": 编号, "mtime": 纳秒, "size": 字节数, "count": 选项数}
+        self.files = {}
+        self._names = {}
+        self._next_id = 0
+        self._postings = {}
+        self._sorted_terms = []
+        self._lock = threading.Lock()
+        # 同一时间只有一个刷新在进行：后来的等前一个结束后再增量刷新，只会重新读取这期间变化的文件
+        self._refresh_lock = threading.Lock()
+        self.loaded = False
+
+    def _load(self):
+        import json
+        self.loaded = True
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != CATALOG_VERSION:
+                return
+            files = data["files"]
+            terms = data["terms"]
+            postings = data["postings"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            # 索引不存在或已损坏时从头建立
+            return
+        names = {entry["id"]: name for name, entry in files.items()}
+        postings = dict(zip(terms, postings))
+        with self._lock:
+            self.files = files
+            self._names = names
+            self._next_id = max(names, default=-1) + 1
+            self._postings = postings
+            self._sorted_terms = terms
+
+    def save(self):
+        # 每次保存使用不同的临时文件，同时有多个刷新在保存时不会互相覆盖写了一半的文件
+        import json
+        tmp = f"{self.index_file}.{os.urandom(4).hex()}.tmp"
+        try:
+            with self._lock:
+                data = {"version": CATALOG_VERSION, "files": self.files,
+                        "terms": self._sorted_terms,
+                        "postings": [self._postings[term] for term in self._sorted_terms]}
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.index_file)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _scan(self):
+        result = {}
+        try:
+            entries = os.scandir(self.path)
+        except OSError:
+            return result
+        with entries:
+            for entry in entries:
+                # 跳过索引文件本身等隐藏文件
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in OPTION_FILE_EXTS:
+                    stat = entry.stat()
+                    result[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return result
+
+    def refresh(self):
+        # 按修改时间和大小增量更新索引，返回 (重新索引的文件数, 移除的文件数)
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        if not self.loaded:
+            self._load()
+        current = self._scan()
+        changed = {}
+        for name, (mtime, size) in current.items():
+            old = self.files.get(name)
+            if old and old["mtime"] == mtime and old["size"] == size:
+                continue
+            try:
+                options = read_option_set(os.path.join(self.path, name))
+                terms = set()
+                for option in options:
+                    terms |= option_terms(option)
+            except Exception:
+                # 无法读取或内容不正确（例如选项不是字符串）的文件也记录下来，避免每次都重试
+                options, terms = [], set()
+            changed[name] = (mtime, size, len(options), terms)
+        removed = [name for name in self.files if name not in current]
+
+        if changed or removed:
+            with self._lock:
+                self._update(changed, removed)
+            self.save()
+        return len(changed), len(removed)
+
+    def _update(self, changed, removed):
+        # 先从倒排索引中去掉变化和删除的文件，再加入变化文件的新索引词
+        stale = {self.files[name]["id"] for name in removed}
+        stale.update(self.files[name]["id"] for name in changed if name in self.files)
+        postings = self._postings
+        if stale:
+            for term, ids in postings.items():
+                if not stale.isdisjoint(ids):
+                    ids[:] = [i for i in ids if i not in stale]
+        for name in removed:
+            del self._names[self.files.pop(name)["id"]]
+
+        new_terms = []
+        for name, (mtime, size, count, terms) in changed.items():
+            entry = self.files.get(name)
+            if entry is None:
+                entry = self.files[name] = {"id": self._next_id}
+                self._names[self._next_id] = name
+                self._next_id += 1
+            entry.update(mtime=mtime, size=size, count=count)
+            for term in terms:
+                ids = postings.get(term)
+                if ids is None:
+                    postings[term] = [entry["id"]]
+                    new_terms.append(term)
+                else:
+                    ids.append(entry["id"])
+
+        terms = self._sorted_terms
+        if stale:
+            terms = [term for term in terms if postings[term]]
+            for term in set(postings).difference(terms).difference(new_terms):
+                del postings[term]
+        # 两段各自有序的列表拼接后排序，Timsort 只需线性时间合并
+        new_terms.sort()
+        self._sorted_terms = sorted(terms + new_terms)
+
+    def refresh_async(self, on_done=None):
+        # 在后台线程中刷新，完成后调用 on_done（在后台线程中调用）
+        def run():
+            try:
+                self.refresh()
+            finally:
+                if on_done:
+                    on_done()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def search(self, query, limit=50):
+        # 查找文件名包含 query、或含有以 query 开头的选项词的选项集。
+        # 文件名匹配的排在前面，其余按匹配到的选项词数排序
+        query = " ".join(query.casefold().split())
+        if not query:
+            return []
+        with self._lock:
+            terms = self._sorted_terms
+            postings = self._postings
+            hits = {}
+            i = bisect_left(terms, query)
+            end = min(len(terms), i + MAX_SCAN_TERMS)
+            while i < end and terms[i].startswith(query):
+                for file_id in postings[terms[i]]:
+                    hits.setdefault(file_id, []).append(terms[i])
+                i += 1
+
+            results = []
+            for name, entry in self.files.items():
+                name_hit = query in name.casefold()
+                matches = hits.get(entry["id"])
+                if name_hit or matches:
+                    matches = matches or []
+                    results.append((not name_hit, -len(matches), name,
+                                    CatalogMatch(name, entry["count"], matches[:3])))
+        results.sort(key=lambda item: item[:3])
+        return [item[3] for item in results[:limit]]
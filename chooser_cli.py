@@ -0,0 +1,226 @@
+# 命令行批量抽取，不打开窗口，也不导入 tkinter 或 PyQt5：
+#   python random_chooser.py --headless 选项集... [-n 次数] [--seed 种子] [--no-replacement]
+#                                       [--ignore-weights] [--format text|jsonl|csv] [--workers 进程数]
+# 选项集可以是文件路径，也可以是 saved_options/ 下的文件名；多个选项集合并后一起抽取。
+# 结果分批写到标准输出，抽取次数再多内存占用也不变。
+# 第 i 批结果使用随机流（见 chooser_audit.py）的第 i 个生成器，所以指定种子时
+# 无论用几个进程并行抽取，得到的结果都完全相同
+import os
+import sys
+from itertools import accumulate
+
+from chooser_engine import DEFAULT_SAVE_PATH, OptionStore, Chooser, load_options_file
+from chooser_audit import RandomStream
+
+# 每批生成并输出的结果数
+CHUNK_SIZE = 8192
+
+FORMATS = ("text", "jsonl", "csv")
+
+
+USAGE = """用法: python random_chooser.py --headless 选项集... [选项]
+从保存的选项集中批量随机抽取，选项集可以是文件路径或 saved_options/ 下的文件名
+
+  -n, --count 次数      抽取次数（默认 1）
+  --seed 种子           随机种子，相同的种子得到相同的结果
+  --no-replacement      不放回抽取，结果不会重复
+  --ignore-weights      忽略权重，所有选项机会相同
+  --format 格式         输出格式：text（默认）、jsonl 或 csv
+  --workers 进程数      用多个进程并行抽取（放回抽取时有效）
+"""
+
+
+class Args:
+    def __init__(self):
+        self.sets = []
+        self.count = 1
+        self.seed = None
+        self.no_replacement = False
+        self.ignore_weights = False
+        self.format = "text"
+        self.workers = 1
+
+
+def parse_args(argv):
+    # 参数很少，直接解析；argparse 的导入和初始化就要十几毫秒
+    args = Args()
+    argv = list(argv)
+    while argv:
+        arg = argv.pop(0)
+        if arg in ("-h", "--help"):
+            print(USAGE)
+            sys.exit(0)
+        elif arg in ("--no-replacement", "--ignore-weights"):
+            setattr(args, arg[2:].replace("-", "_"), True)
+        elif arg in ("-n", "--count", "--seed", "--format", "--workers"):
+            if not argv:
+                raise ValueError(f"{arg} 后面缺少参数")
+            value = argv.pop(0)
+            if arg == "--format":
+                if value not in FORMATS:
+                    raise ValueError(f"不支持的输出格式: {value}")
+                args.format = value
+                continue
+            if not value.lstrip("-").isdigit():
+                raise ValueError(f"{arg} 后面需要一个整数")
+            if arg == "--seed":
+                args.seed = int(value)
+            elif arg == "--workers":
+                args.workers = max(1, int(value))
+            else:
+                args.count = int(value)
+                if args.count < 0:
+                    raise ValueError("抽取次数不能为负数")
+        elif arg.startswith("-") and arg != "-":
+            raise ValueError(f"未知的参数: {arg}")
+        else:
+            args.sets.append(arg)
+    if not args.sets:
+        raise ValueError("至少需要一个选项集")
+    return args
+
+
+def resolve_set(name):
+    if os.path.exists(name):
+        return name
+    saved = os.path.join(DEFAULT_SAVE_PATH, name)
+    return saved if os.path.exists(saved) else name
+
+
+def load_sets(names, ignore_weights=False):
+    # 合并多个选项集，返回 (选项存储, [(起始下标, 选项集名称)])
+    store = OptionStore()
+    sources = []
+    for name in names:
+        filename = resolve_set(name)
+        if os.path.splitext(filename)[1].lower() in (".json", ".rcb"):
+            options, weights = load_options_file(filename)
+        else:
+            # 其他格式需要 chooser_stream（会导入 threading 等模块），用到时才导入
+            from chooser_stream import read_option_file
+            options, weights = read_option_file(filename)
+        sources.append((len(store), os.path.basename(name)))
+        store.extend(options, None if ignore_weights else weights)
+    return store, sources
+
+
+def cumulative_weights(store):
+    return list(accumulate(store.weights())) if store.is_weighted() else None
+
+
+def draw_chunk(store, cum_weights, stream, chunk, k):
+    # 第 chunk 批的 k 个放回抽取结果（下标）
+    return stream.generator(chunk).choices(range(len(store)), cum_weights=cum_weights, k=k)
+
+
+def chunks(count):
+    # 依次产生 (批号, 这一批的数量)
+    for chunk, start in enumerate(range(0, count, CHUNK_SIZE)):
+        yield chunk, min(CHUNK_SIZE, count - start)
+
+
+def draw_indices(store, stream, count, replace=True):
+    # 分批产生被抽中的下标
+    if not replace:
+        chooser = Chooser(store, stream.generator(0))
+        indices = chooser.batch.draw_indices(count, replace=False)
+        for start in range(0, count, CHUNK_SIZE):
+            yield [int(i) for i in indices[start:start + CHUNK_SIZE]]
+        return
+    cum_weights = cumulative_weights(store)
+    for chunk, k in chunks(count):
+        yield draw_chunk(store, cum_weights, stream, chunk, k)
+
+
+# 并行抽取时每个工作进程自己读取选项集，只有批号和格式化好的结果在进程间传递
+_worker = None
+
+
+def _init_worker(sets, ignore_weights, fmt, stream):
+    global _worker
+    store, sources = load_sets(sets, ignore_weights)
+    _worker = (store, sources, cumulative_weights(store), fmt, stream)
+
+
+def _draw_formatted(task):
+    chunk, k = task
+    store, sources, cum_weights, fmt, stream = _worker
+    indices = draw_chunk(store, cum_weights, stream, chunk, k)
+    return format_chunk(fmt, store, sources, indices, chunk * CHUNK_SIZE + 1)
+
+
+def write_parallel(out, args, stream):
+    import multiprocessing
+    with multiprocessing.Pool(args.workers, _init_worker,
+                              (args.sets, args.ignore_weights, args.format, stream)) as pool:
+        for text in pool.imap(_draw_formatted, chunks(args.count)):
+            out.write(text)
+
+
+def format_chunk(fmt, store, sources, indices, first):
+    # 把一批下标格式化为输出文本；first 是这一批第一个结果的序号
+    if fmt == "text":
+        return "".join([store[i] + "\n" for i in indices])
+    if len(sources) == 1:
+        names = [sources[0][1]] * len(indices)
+    else:
+        from bisect import bisect_right
+        starts = [start for start, _ in sources]
+        names = [sources[bisect_right(starts, i) - 1][1] for i in indices]
+    if fmt == "jsonl":
+        # 直接拼接 JSON 文本，比每行调用一次 json.dumps 快得多
+        from json.encoder import encode_basestring as quote
+        return "".join([f'{{"draw": {n}, "option": {quote(store[i])}, "set": {quote(name)}}}\n'
+                        for n, i, name in zip(range(first, first + len(indices)), indices, names)])
+    import csv
+    import io
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(
+        zip(range(first, first + len(indices)), [store[i] for i in indices], names))
+    return buffer.getvalue()
+
+
+def main(argv=None):
+    try:
+        args = parse_args(sys.argv[1:] if argv is None else argv)
+    except ValueError as e:
+        print(f"错误: {e}\n\n{USAGE}", file=sys.stderr)
+        return 2
+    try:
+        store, sources = load_sets(args.sets, args.ignore_weights)
+    except ValueError:
+        # OptionFormatError，以及文本文件不是 UTF-8 编码时的 UnicodeDecodeError
+        print("错误: 文件格式不正确!", file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f"错误: 加载文件时出错: {e}", file=sys.stderr)
+        return 1
+
+    stream = RandomStream(args.seed)
+    if args.count and not store.choosable_count():
+        print("错误: 没有可以抽取的选项", file=sys.stderr)
+        return 1
+    if args.no_replacement and args.count > store.choosable_count():
+        print(f"错误: 不放回抽取最多只能抽取 {store.choosable_count()} 次", file=sys.stderr)
+        return 1
+
+    out = sys.stdout
+    if args.format == "csv":
+        out.write("draw,option,set\n")
+    try:
+        if args.workers > 1 and not args.no_replacement:
+            write_parallel(out, args, stream)
+        else:
+            first = 1
+            for indices in draw_indices(store, stream, args.count, not args.no_replacement):
+                out.write(format_chunk(args.format, store, sources, indices, first))
+                first += len(indices)
+        out.flush()
+    except BrokenPipeError:
+        # 输出被提前关闭（例如接到 head 后面）时安静退出
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
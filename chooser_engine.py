@@ -0,0 +1,573 @@
+# 随机选择工具的核心逻辑（选项存储、随机选择、保存和加载），
+# 不依赖 tkinter 或 PyQt5，可以在脚本和测试中直接使用
+import random
+import math
+import os
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+from chooser_weights import WeightedSampler
+from chooser_batch import BatchChooser
+
+DEFAULT_SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_options")
+
+
+class OptionFormatError(ValueError):
+    # 选项文件格式不正确
+    pass
+
+
+def check_weight(weight):
+    weight = float(weight)
+    if not weight >= 0 or weight == float("inf"):
+        raise ValueError(f"无效的权重: {weight}")
+    return weight
+
+
+def check_weights(weights):
+    # 批量检查权重，全部用内置函数完成，百万级权重也只需要几十毫秒
+    try:
+        weights = list(map(float, weights))
+        if weights and not (min(weights) >= 0 and math.isfinite(math.fsum(weights))):
+            raise ValueError("无效的权重")
+    except (OverflowError, TypeError):
+        raise ValueError("无效的权重")
+    return weights
+
+
+def option_label(option, weight=1.0, tags=()):
+    # 列表中显示的文字：权重不为 1 时附上权重，有标签时附上标签
+    label = option if weight == 1.0 else f"{option}  (权重 {weight:g})"
+    if tags:
+        label += "  [" + ", ".join(tags) + "]"
+    return label
+
+
+class OptionStore:
+    # 选项存储：保存全部选项及其权重（默认 1），修改后通知订阅者
+    # 通知格式为 callback(event, index, count)，event 为 "insert"、"swap_remove"、"swap_insert"、
+    # "truncate"、"update" 或 "reset"；
+    # "swap_remove" 表示删除了 index 处的选项，原来的最后一项移到了 index（删除的就是最后一项时不移动）；
+    # "swap_insert" 是它的逆操作：在 index 处放回了一个选项，原来在 index 的选项移到了末尾；
+    # "truncate" 表示删除了从 index 开始直到末尾的 count 个选项（撤销追加）。
+    #
+    # 每个选项有一个不会重复使用的编号（id），删除用「与最后一项交换再弹出」实现，O(1)。
+    # 编号数组在第一次删除前不存在（编号 = 起始编号 + 下标）；编号到下标的映射只记录
+    # 不满足这个关系的选项，所以百万级选项在没有删除时不占额外内存。
+    # dedup=True 时添加已存在的选项会被忽略；count() 统计相同选项的个数
+    def __init__(self, options=None, weights=None, dedup=False):
+        self._options = []
+        self._weights = []
+        self._listeners = []
+        # 权重不为 1 和权重为 0 的选项数，用于 O(1) 判断是否需要按权重抽取
+        self._weighted_count = 0
+        self._zero_count = 0
+        self._ids = None
+        self._slots = {}
+        self._id_base = 0
+        self._next_id = 0
+        # 选项 -> 出现次数，第一次需要时才统计
+        self._counts = None
+        # 修改计数：每次通知加一，不订阅的缓存（例如 BatchChooser）据此判断是否过期
+        self.version = 0
+        self.dedup = dedup
+        if options:
+            self._load(options, weights)
+
+    def __len__(self):
+        return len(self._options)
+
+    def __getitem__(self, index):
+        return self._options[index]
+
+    def __iter__(self):
+        return iter(self._options)
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, event, index=0, count=0):
+        self.version += 1
+        for callback in list(self._listeners):
+            callback(event, index, count)
+
+    def _count_weight(self, weight, delta):
+        if weight != 1.0:
+            self._weighted_count += delta
+        if weight == 0.0:
+            self._zero_count += delta
+
+    def _count_weights(self, weights, delta):
+        self._weighted_count += delta * (len(weights) - weights.count(1.0))
+        self._zero_count += delta * weights.count(0.0)
+
+    @staticmethod
+    def _prepare(options, weights):
+        # list 会被复制；其他只读序列（例如内存映射的选项文件）原样保留，
+        # 读取时按需解码，第一次修改时才转换成 list。weights 为 None 表示全部为 1
+        if isinstance(options, list) or not isinstance(options, Sequence):
+            options = list(options)
+        if weights is not None:
+            weights = check_weights(weights)
+            if len(weights) != len(options):
+                raise ValueError("权重数量与选项数量不一致")
+        return options, weights
+
+    def _mutable_options(self):
+        if not isinstance(self._options, list):
+            self._options = list(self._options)
+        return self._options
+
+    def _adopt(self, options, weights):
+        self._options = options
+        self._ids = None
+        self._slots = {}
+        self._id_base = self._next_id
+        self._next_id += len(options)
+        self._weighted_count = 0
+        self._zero_count = 0
+        if weights is None:
+            self._weights = [1.0] * len(options)
+        else:
+            self._weights = weights
+            self._count_weights(weights, 1)
+
+    def _load(self, options, weights):
+        options, weights = self._prepare(options, weights)
+        self._counts = None
+        if self.dedup:
+            self._counts = Counter()
+            options, weights = self._unique(options, weights)
+            self._counts.update(options)
+        self._adopt(options, weights)
+
+    def _unique(self, options, weights):
+        # 去掉已经在存储中或在这一批中重复出现的选项（保留第一次出现的）
+        counts = self._option_counts()
+        keep = []
+        for i, option in enumerate(options):
+            if option not in counts:
+                counts[option] = 0
+                keep.append(i)
+        if len(keep) == len(options):
+            return options, weights
+        options = [options[i] for i in keep]
+        if weights is not None:
+            weights = [weights[i] for i in keep]
+        return options, weights
+
+    def unique(self, options, weights=None):
+        # 去掉已经在存储中或在这一批中重复出现的选项，返回 (选项, 权重列表或 None)，不修改存储；
+        # 第一次调用时统计一遍现有选项，之后随修改同步更新
+        options, weights = self._prepare(options, weights)
+        return self._unique(options, weights)
+
+    def _option_counts(self):
+        if self._counts is None:
+            self._counts = Counter(self._options)
+        return self._counts
+
+    def count(self, option):
+        # 与 option 相同的选项个数
+        return self._option_counts()[option]
+
+    def _track_ids(self, first, count):
+        # 新追加的选项依次分配编号；撤销追加或整体换回旧内容后编号不再等于起始编号 + 下标，这时才建立编号数组
+        if self._ids is None and self._next_id != self._id_base + first:
+            self._ids = array("q", range(self._id_base, self._id_base + first))
+        if self._ids is not None:
+            for slot in range(first, first + count):
+                self._ids.append(self._next_id)
+                if self._next_id - self._id_base != slot:
+                    self._slots[self._next_id] = slot
+                self._next_id += 1
+        else:
+            self._next_id += count
+
+    def add(self, option, weight=1.0):
+        # 返回新选项的下标；dedup=True 且选项已存在时不添加，返回 None
+        weight = check_weight(weight)
+        if self.dedup and self.count(option):
+            return None
+        self._mutable_options().append(option)
+        self._weights.append(weight)
+        self._count_weight(weight, 1)
+        index = len(self._options) - 1
+        self._track_ids(index, 1)
+        if self._counts is not None:
+            self._counts[option] += 1
+        self._notify("insert", index, 1)
+        return index
+
+    def extend(self, options, weights=None):
+        # 批量追加，只发出一次通知；返回第一个新选项的下标
+        options, weights = self._prepare(options, weights)
+        if self.dedup:
+            options, weights = self._unique(options, weights)
+        first = len(self._options)
+        if not first:
+            # 空存储直接接管新序列，避免复制
+            self._adopt(options, weights)
+        else:
+            self._mutable_options().extend(options)
+            if weights is None:
+                self._weights.extend([1.0] * len(options))
+            else:
+                self._weights.extend(weights)
+                self._count_weights(weights, 1)
+            self._track_ids(first, len(options))
+        if self._counts is not None:
+            self._counts.update(options)
+        if options:
+            self._notify("insert", first, len(options))
+        return first
+
+    def id_at(self, index):
+        if self._ids is None:
+            if not 0 <= index < len(self._options):
+                raise IndexError("选项下标超出范围")
+            return self._id_base + index
+        return self._ids[index]
+
+    def index_of(self, option_id):
+        # 编号对应的当前下标，选项已被删除时抛出 KeyError
+        slot = self._slots.get(option_id, option_id - self._id_base)
+        if 0 <= slot < len(self._options) and self.id_at(slot) == option_id:
+            return slot
+        raise KeyError(option_id)
+
+    def remove_id(self, option_id):
+        return self.remove_at(self.index_of(option_id))
+
+    def remove_at(self, index):
+        # 与最后一项交换后弹出，O(1)；最后一项会移到 index
+        options = self._mutable_options()
+        last = len(options) - 1
+        if index < 0:
+            index += last + 1
+        if not 0 <= index <= last:
+            raise IndexError("选项下标超出范围")
+        if self._ids is None:
+            self._ids = array("q", range(self._id_base, self._id_base + last + 1))
+        ids = self._ids
+        weights = self._weights
+
+        option = options[index]
+        self._count_weight(weights[index], -1)
+        self._slots.pop(ids[index], None)
+        options[index] = options[last]
+        weights[index] = weights[last]
+        ids[index] = moved = ids[last]
+        options.pop()
+        weights.pop()
+        ids.pop()
+        if index != last:
+            if moved - self._id_base == index:
+                self._slots.pop(moved, None)
+            else:
+                self._slots[moved] = index
+        if self._counts is not None:
+            self._counts[option] -= 1
+            if not self._counts[option]:
+                del self._counts[option]
+        self._notify("swap_remove", index, 1)
+        return option
+
+    def insert_swap(self, index, option, weight=1.0, option_id=None):
+        # remove_at 的逆操作：把 option 放回 index，原来在 index 的选项移到末尾，O(1)；
+        # index 等于选项数时就是追加。option_id 为删除前的编号（撤销删除时恢复），None 时分配新编号
+        weight = check_weight(weight)
+        options = self._mutable_options()
+        last = len(options)
+        if not 0 <= index <= last:
+            raise IndexError("选项下标超出范围")
+        if self._ids is None:
+            self._ids = array("q", range(self._id_base, self._id_base + last))
+        if option_id is None:
+            option_id = self._next_id
+            self._next_id += 1
+        ids = self._ids
+        weights = self._weights
+
+        if index < last:
+            moved = ids[index]
+            options.append(options[index])
+            weights.append(weights[index])
+            ids.append(moved)
+            if moved - self._id_base == last:
+                self._slots.pop(moved, None)
+            else:
+                self._slots[moved] = last
+            options[index] = option
+            weights[index] = weight
+            ids[index] = option_id
+        else:
+            options.append(option)
+            weights.append(weight)
+            ids.append(option_id)
+        if option_id - self._id_base == index:
+            self._slots.pop(option_id, None)
+        else:
+            self._slots[option_id] = index
+        self._count_weight(weight, 1)
+        if self._counts is not None:
+            self._counts[option] += 1
+        self._notify("swap_insert" if index < last else "insert", index, 1)
+
+    def truncate(self, length):
+        # 删除下标 length 及之后的全部选项（撤销追加），只发出一次通知；返回被删除的 (选项列表, 权重列表)
+        options = self._mutable_options()
+        if not 0 <= length <= len(options):
+            raise IndexError("选项下标超出范围")
+        removed = options[length:]
+        weights = self._weights[length:]
+        if not removed:
+            return removed, weights
+        del options[length:]
+        del self._weights[length:]
+        self._count_weights(weights, -1)
+        if self._ids is not None:
+            for option_id in self._ids[length:]:
+                self._slots.pop(option_id, None)
+            del self._ids[length:]
+        if self._counts is not None:
+            for option in removed:
+                self._counts[option] -= 1
+                if not self._counts[option]:
+                    del self._counts[option]
+        self._notify("truncate", length, len(removed))
+        return removed, weights
+
+    def weight(self, index):
+        return self._weights[index]
+
+    def set_weight(self, index, weight):
+        weight = check_weight(weight)
+        self._count_weight(self._weights[index], -1)
+        self._weights[index] = weight
+        self._count_weight(weight, 1)
+        self._notify("update", index, 1)
+
+    def set_weights(self, start, weights):
+        # 批量修改从 start 开始的一段权重，只发出一次通知
+        weights = check_weights(weights)
+        end = start + len(weights)
+        if start < 0 or end > len(self._weights):
+            raise IndexError("权重下标超出范围")
+        self._count_weights(self._weights[start:end], -1)
+        self._weights[start:end] = weights
+        self._count_weights(weights, 1)
+        if weights:
+            self._notify("update", start, len(weights))
+
+    def weights(self, start=0, end=None):
+        # 权重列表的副本；给出范围时只复制 [start, end) 这一段
+        return self._weights[start:end]
+
+    def is_weighted(self):
+        return self._weighted_count > 0
+
+    def choosable_count(self):
+        # 权重大于 0、可以被抽中的选项数
+        return len(self._options) - self._zero_count
+
+    def _state(self):
+        return (self._options, self._weights, self._weighted_count, self._zero_count,
+                self._ids, self._slots, self._id_base, self._counts)
+
+    def replace(self, options, weights=None):
+        # 返回原来的内容，交给 swap_state() 可以换回来
+        old = self._state()
+        self._load(options, weights)
+        self._notify("reset", 0, len(self._options))
+        return old
+
+    def clear(self):
+        old = self._state()
+        self._load([], None)
+        self._notify("reset", 0, 0)
+        return old
+
+    def swap_state(self, state=None):
+        # 整体换成 state（replace()、clear() 或 swap_state() 返回的内容），返回原来的内容；
+        # 整体替换时总是换上新的列表，旧的列表之后不会再被修改，所以这里只交换引用，O(1)。
+        # state 为 None 时清空
+        old = self._state()
+        if state is None:
+            self._load([], None)
+        else:
+            (self._options, self._weights, self._weighted_count, self._zero_count,
+             self._ids, self._slots, self._id_base, self._counts) = state
+        self._notify("reset", 0, len(self._options))
+        return old
+
+    def to_list(self):
+        return list(self._options)
+
+    def snapshot(self):
+        # 当前选项和权重的副本，可以交给后台线程读取：
+        # list 只做浅复制，只读序列（例如内存映射的选项文件）不会被修改，原样返回
+        options = self._options
+        if isinstance(options, list):
+            options = list(options)
+        return options, list(self._weights)
+
+
+class Chooser:
+    # 随机选择：从选项存储中抽取选项
+    # 所有权重都为 1 时直接均匀抽取，否则交给 WeightedSampler（别名表 / 树状数组）
+    def __init__(self, store, rng=None):
+        self.store = store
+        self.rng = rng if rng is not None else random.Random()
+        self.sampler = WeightedSampler(store)
+        self.batch = BatchChooser(store, self.rng)
+
+    # subset 为存储下标列表（例如筛选结果）时只在其中抽取，耗时与 subset 的长度成正比
+    def can_choose(self, subset=None):
+        if subset is None:
+            return self.store.choosable_count() > 0
+        if not self.store.is_weighted():
+            return len(subset) > 0
+        return any(self.store.weight(i) > 0 for i in subset)
+
+    def choose_index(self, subset=None):
+        if not self.can_choose(subset):
+            raise IndexError("没有可选择的选项")
+        if subset is not None:
+            if not self.store.is_weighted():
+                return subset[self.rng.randrange(len(subset))]
+            return self.rng.choices(subset, weights=[self.store.weight(i) for i in subset])[0]
+        if self.store.is_weighted():
+            return self.sampler.sample(self.rng)
+        return self.rng.randrange(len(self.store))
+
+    def choose(self, subset=None):
+        return self.store[self.choose_index(subset)]
+
+    def choose_many(self, k, replace=True):
+        # 一次抽取 k 个结果，replace=False 时不会重复
+        return self.batch.draw(k, replace)
+
+    def shuffled(self):
+        # 随机打乱后的全部可选选项
+        return self.batch.shuffled()
+
+    def animation_frames(self, count=10, subset=None):
+        # 一次生成动画过程中依次闪过的 count 个选项（不含最终结果，最终结果在动画结束时另行抽取）
+        if not self.can_choose(subset):
+            return []
+        store = self.store
+        if subset is not None:
+            weights = [store.weight(i) for i in subset] if store.is_weighted() else None
+            indices = self.rng.choices(subset, weights=weights, k=count)
+        elif store.is_weighted():
+            indices = [self.sampler.sample(self.rng) for _ in range(count)]
+        else:
+            indices = self.rng.choices(range(len(store)), k=count)
+        return [store[i] for i in indices]
+
+
+def ensure_save_path(path=DEFAULT_SAVE_PATH):
+    if not os.path.exists(path):
+        os.makedirs(path)
+    return path
+
+
+# json 会连带导入 re 等模块，推迟到真正保存或加载时再导入，以加快引擎的导入速度
+# 文件格式为 {"options": [...]}；有权重不为 1 的选项时再附加一个等长的 "weights" 列表，
+# 旧版本程序只读取 "options"，旧文件没有 "weights" 时所有权重视为 1。
+# 轮换抽取进行到一半时，本轮已抽中的选项下标保存在可选的 "drawn" 列表中（见 chooser_rotation.py）。
+# 选项有标签时保存在可选的 "tags" 对象中：{"标签": [选项下标, ...]}（见 chooser_tags.py）。
+# 扩展名为 .rcb 时改用可内存映射的二进制格式（见 chooser_binary.py）。
+#
+# 先写到同一目录下的临时文件，写完并 fsync 之后再替换目标文件：中途出错或程序退出时
+# 原文件保持不变，不会留下写了一半的文件。覆盖正被内存映射的 .rcb 文件时，其他系统上原来的映射仍指向
+# 旧的内容，Windows 上则不能替换被映射的文件，先把映射着它的选项读入内存并关闭映射（chooser_binary.release_mappings）。
+# progress(已完成的比例) 在写入过程中定期调用，可以在后台线程中保存。tags 为 {标签: 位图 bytes}
+def save_options_file(filename, options, weights=None, drawn=None, progress=None, tags=None):
+    from chooser_binary import is_binary_file, release_mappings, save_binary_file
+    tmp = f"{filename}.{os.urandom(4).hex()}.tmp"
+    try:
+        if is_binary_file(filename):
+            save_binary_file(tmp, options, weights, drawn, tags)
+        else:
+            _save_json_file(tmp, options, weights, drawn, progress, tags)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        if os.name == "nt":
+            release_mappings(filename)
+        os.replace(tmp, filename)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    if progress is not None:
+        progress(1.0)
+
+
+# 写入 JSON 时每输出这么多段报告一次进度
+PROGRESS_CHUNKS = 16384
+
+
+def _save_json_file(filename, options, weights, drawn, progress, tags=None):
+    import json
+    data = {"options": list(options)}
+    if weights is not None and any(w != 1.0 for w in weights):
+        data["weights"] = list(weights)
+    if drawn:
+        data["drawn"] = list(drawn)
+    # 与 json.dump 的输出相同；带缩进时列表中的每一项正好输出为一段，据此估计进度
+    total = sum(map(len, data.values()))
+    if tags:
+        from chooser_tags import bits_to_indices
+        data["tags"] = {name: bits_to_indices(bits) for name, bits in tags.items()}
+        total += sum(map(len, data["tags"].values()))
+    total = total or 1
+    encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+    with open(filename, "w", encoding="utf-8") as f:
+        for done, chunk in enumerate(encoder.iterencode(data)):
+            f.write(chunk)
+            if progress is not None and not done % PROGRESS_CHUNKS:
+                progress(min(done / total, 1.0))
+
+
+def load_options_file(filename):
+    # 返回 (options, weights)，没有保存权重时 weights 为 None
+    from chooser_binary import is_binary_file, load_binary_file
+    if is_binary_file(filename):
+        return load_binary_file(filename)
+    return options_from_json(load_json_data(filename))
+
+
+def load_json_data(filename):
+    # 读入整个 JSON 选项文件；选项、轮换记录和标签分别由 options_from_json()、
+    # chooser_binary.drawn_from_json() 和 chooser_tags.tags_from_json() 取出，同一个文件只需解析一次
+    import json
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (ValueError, RecursionError):
+        # 不是 UTF-8 文本或不是合法的 JSON（UnicodeDecodeError 和 JSONDecodeError 都是 ValueError）
+        raise OptionFormatError("文件格式不正确!")
+
+
+def options_from_json(data):
+    options = data.get("options") if isinstance(data, dict) else None
+    # 选项必须都是字符串；按类型集合检查，百万级选项也只需要几十毫秒
+    if not isinstance(options, list) or not {str}.issuperset(map(type, options)):
+        raise OptionFormatError("文件格式不正确!")
+    weights = data.get("weights")
+    if weights is not None:
+        try:
+            weights = check_weights(weights)
+        except ValueError:
+            raise OptionFormatError("文件格式不正确!")
+        if len(weights) != len(options):
+            raise OptionFormatError("文件格式不正确!")
+    return options, weights
@@ -0,0 +1,220 @@
+# 当前选项列表的实时筛选：不区分大小写的子串匹配，背后是字符二元组（bigram）倒排索引。
+# OptionFilter 和 OptionStore 一样支持 len、下标、weight() 和 subscribe()，
+# 界面直接显示它即可只显示匹配的行；source_index() 把显示的行号换算回存储中的下标。
+# 建立索引比扫描一遍慢得多，所以索引由界面在空闲时调用 build_index() 分段建立，
+# 建好之前的查询直接扫描所有选项；继续输入（新查询包含旧查询）时只在旧结果中缩小范围
+from bisect import bisect_left, insort
+
+# build_index() 每次最多索引这么多个选项，保证界面不会卡顿
+INDEX_STEP = 5000
+
+
+def option_grams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class OptionFilter:
+    def __init__(self, store):
+        self.store = store
+        self.query = ""
+        # 匹配的存储下标（升序）；没有筛选条件时为 None，表示全部显示
+        self.indices = None
+        self._listeners = []
+        # 二元组 -> 含有它的存储下标列表，只包含前 _indexed 个选项。
+        # 删除选项后列表中可能留有过时的下标，查询时都会重新核对，过时的太多时重建
+        self._grams = {}
+        self._indexed = 0
+        self._stale = 0
+        store.subscribe(self._on_store_changed)
+
+    @property
+    def active(self):
+        return self.indices is not None
+
+    @property
+    def index_ready(self):
+        return self._indexed == len(self.store)
+
+    def __len__(self):
+        if self.indices is None:
+            return len(self.store)
+        return len(self.indices)
+
+    def __getitem__(self, row):
+        return self.store[self.source_index(row)]
+
+    def source_index(self, row):
+        if self.indices is None:
+            return row
+        return self.indices[row]
+
+    def view_row(self, index):
+        # 存储下标在筛选结果中的行号，不在结果中时返回 None
+        if self.indices is None:
+            return index
+        row = bisect_left(self.indices, index)
+        if row < len(self.indices) and self.indices[row] == index:
+            return row
+        return None
+
+    def weight(self, row):
+        return self.store.weight(self.source_index(row))
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, event, index=0, count=0):
+        for callback in list(self._listeners):
+            callback(event, index, count)
+
+    def _matches(self, index, query):
+        return query in self.store[index].casefold()
+
+    def _index_option(self, index):
+        grams = self._grams
+        for gram in option_grams(self.store[index].casefold()):
+            postings = grams.get(gram)
+            if postings is None:
+                grams[gram] = [index]
+            else:
+                postings.append(index)
+
+    def _reset_index(self):
+        self._grams = {}
+        self._indexed = 0
+        self._stale = 0
+
+    def build_index(self, limit=INDEX_STEP):
+        # 继续为最多 limit 个选项建立索引，还没有建完时返回 True
+        end = min(len(self.store), self._indexed + limit)
+        for index in range(self._indexed, end):
+            self._index_option(index)
+        self._indexed = end
+        return not self.index_ready
+
+    def _search(self, query, previous=None):
+        # previous 是旧查询的结果且旧查询是新查询的子串时，只需在旧结果中继续缩小
+        if previous is not None:
+            return [i for i in previous if self._matches(i, query)]
+        if len(query) < 2 or not self.index_ready:
+            return [i for i, option in enumerate(self.store) if query in option.casefold()]
+        grams = self._grams
+        postings = []
+        for gram in option_grams(query):
+            found = grams.get(gram)
+            if not found:
+                return []
+            postings.append(found)
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        size = len(self.store)
+        return sorted(i for i in candidates if i < size and self._matches(i, query))
+
+    def set_query(self, query):
+        query = query.strip().casefold()
+        if not query:
+            self.query = ""
+            self.indices = None
+        else:
+            previous = self.indices if self.query and self.query in query else None
+            self.indices = self._search(query, previous)
+            self.query = query
+        self._notify("reset", 0, len(self))
+
+    def _on_store_changed(self, event, index, count):
+        if event == "insert" and index == len(self.store) - count:
+            # 索引已经建好时顺便索引新追加的少量选项，大批量的留给 build_index()
+            if self._indexed == index and count <= INDEX_STEP:
+                self.build_index(count)
+        elif event == "swap_remove":
+            # 最后一项移到了 index：把它的二元组补记到 index 上，旧的记录留着，查询时会被核对掉
+            self._indexed = min(self._indexed, len(self.store))
+            if index < self._indexed:
+                self._index_option(index)
+            self._stale += 1
+            if self._stale * 4 > len(self.store):
+                self._reset_index()
+        elif event == "swap_insert":
+            # index 处放回了一个选项，原来的移到了末尾：两者都补记，index 上旧的记录同样留给查询核对
+            last = len(self.store) - 1
+            if index < self._indexed:
+                self._index_option(index)
+                self._stale += 1
+            if self._indexed == last:
+                self._index_option(last)
+                self._indexed += 1
+            if self._stale * 4 > len(self.store):
+                self._reset_index()
+        elif event == "truncate":
+            self._indexed = min(self._indexed, index)
+            self._stale += count
+            if self._stale * 4 > len(self.store):
+                self._reset_index()
+        elif event != "update":
+            self._reset_index()
+
+        if self.indices is None:
+            self._notify(event, index, count)
+            return
+        if event == "update":
+            rows = [self.view_row(i) for i in range(index, index + count)]
+            rows = [row for row in rows if row is not None]
+            if rows:
+                self._notify("update", rows[0], rows[-1] - rows[0] + 1)
+            return
+        if event == "swap_remove":
+            self._swap_remove(index)
+            return
+        if event == "swap_insert":
+            self._swap_insert(index)
+            return
+        if event == "truncate":
+            del self.indices[bisect_left(self.indices, index):]
+            self._notify("reset", 0, len(self.indices))
+            return
+        if event == "insert" and index == len(self.store) - count:
+            first = len(self.indices)
+            self.indices.extend(i for i in range(index, index + count) if self._matches(i, self.query))
+            if len(self.indices) > first:
+                self._notify("insert", first, len(self.indices) - first)
+            return
+        self.indices = self._search(self.query)
+        self._notify("reset", 0, len(self.indices))
+
+    def _swap_remove(self, index):
+        # 原来的最后一项（下标 last）移到了 index，筛选结果中对应地调整
+        indices = self.indices
+        last = len(self.store)
+        row = self.view_row(index)
+        moved = bool(indices) and indices[-1] == last
+        if index == last:
+            if moved:
+                indices.pop()
+                self._notify("swap_remove", len(indices), 1)
+            return
+        if moved:
+            indices.pop()
+        if row is not None and moved:
+            # 被删除的和移过来的都在结果中，结果中同样是「最后一行移到 row」
+            self._notify("swap_remove", row, 1)
+        elif row is not None:
+            del indices[row]
+            self._notify("reset", 0, len(indices))
+        elif moved:
+            insort(indices, index)
+            self._notify("reset", 0, len(indices))
+
+    def _swap_insert(self, index):
+        # index 处的选项移到了末尾（下标 last），index 处换成放回的选项
+        indices = self.indices
+        last = len(self.store) - 1
+        row = self.view_row(index)
+        if row is not None:
+            del indices[row]
+            indices.append(last)
+        if self._matches(index, self.query):
+            insort(indices, index)
+        self._notify("reset", 0, len(indices))
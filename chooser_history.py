@@ -0,0 +1,174 @@
+# 撤销 / 重做：操作日志，不保存选项列表的副本。
+#
+# 界面通过 History 修改选项（添加、删除、改权重、清空、编辑标签），每次修改只记下撤销它所需的
+# 最少信息，撤销时执行相反的操作，并把「撤销这次撤销」的记录放到重做栈中：
+#   添加 n 个选项    只记下位置和个数；撤销时截掉末尾这 n 个（OptionStore.truncate），
+#                    截下来的选项才交给重做记录，所以添加时不多占内存
+#   删除一个选项     记下选项、权重、编号和标签；撤销时用 insert_swap 放回原位，O(1)
+#   改权重           记下原来的权重
+#   清空 / 替换      整体替换总是换上新的列表，旧的列表、标签位图和轮换排列之后不会再被修改，
+#                    所以直接保存它们的引用；撤销时用 swap_state 把引用换回来，
+#                    不管有多少选项都是 O(1)，也不额外占内存（这些数据本来就在内存中）
+#   编辑标签         记下原来的标签或受影响标签的位图
+#
+# 记录的数量没有上限；新的修改会清空重做栈。undo() 和 redo() 每次只发出一次选项存储的通知
+# （撤销删除时另外改一次标签），界面在执行期间暂停刷新，结束后整体刷新一次即可。
+# 不经过 History 的修改（例如后台加载的批次）必须暂停记录（recording = False），
+# 或者在修改后 forget()，否则记录中的下标会对不上
+
+
+class History:
+    def __init__(self, store, tags=None, rotation=None):
+        self.store = store
+        self.tags = tags
+        # 整体替换时随选项一起保存和换回的状态（chooser_tags.TagIndex、chooser_rotation.Rotation）
+        self._parts = [part for part in (tags, rotation) if part is not None]
+        self._undo = []
+        self._redo = []
+        # 为 False 时修改照常执行，但不记录（例如加载文件的过程中）
+        self.recording = True
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        # 下一次撤销的操作名称，没有时返回 None
+        return self._undo[-1][0] if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1][0] if self._redo else None
+
+    def forget(self):
+        self._undo = []
+        self._redo = []
+
+    def _record(self, label, *entry):
+        if self.recording:
+            self._undo.append((label,) + entry)
+            self._redo = []
+
+    def add(self, option, weight=1.0):
+        index = self.store.add(option, weight)
+        if index is not None:
+            self._record(f"添加「{option}」", "added", index, 1)
+        return index
+
+    def extend(self, options, weights=None):
+        first = self.store.extend(options, weights)
+        count = len(self.store) - first
+        if count:
+            self._record(f"添加 {count} 个选项", "added", first, count)
+        return first
+
+    def _removal(self, index):
+        # 删除 index 处的选项，返回放回它所需的记录
+        store = self.store
+        weight = store.weight(index)
+        option_id = store.id_at(index)
+        names = self.tags.tags_of(index) if self.tags is not None else []
+        option = store.remove_at(index)
+        return "removed", index, option, weight, option_id, names
+
+    def remove_at(self, index):
+        if index < 0:
+            index += len(self.store)
+        entry = self._removal(index)
+        self._record(f"删除「{entry[2]}」", *entry)
+        return entry[2]
+
+    def set_weight(self, index, weight):
+        old = self.store.weight(index)
+        self.store.set_weight(index, weight)
+        self._record(f"修改「{self.store[index]}」的权重", "weights", index, [old])
+
+    def set_weights(self, start, weights):
+        old = [self.store.weight(i) for i in range(start, start + len(weights))]
+        self.store.set_weights(start, weights)
+        if weights:
+            self._record("修改权重", "weights", start, old)
+
+    def _save_parts(self):
+        return [part.state() for part in self._parts]
+
+    def replace(self, options, weights=None, label="替换全部选项"):
+        parts = self._save_parts()
+        state = self.store.replace(options, weights)
+        self._record(label, "state", state, parts)
+
+    def clear(self, label="清空所有选项"):
+        parts = self._save_parts()
+        state = self.store.clear()
+        self._record(label, "state", state, parts)
+
+    def set_tags(self, index, names):
+        old = self.tags.tags_of(index)
+        self.tags.set_tags(index, names)
+        self._record(f"修改「{self.store[index]}」的标签", "option_tags", index, old)
+
+    def update_tags(self, indices=None, add=(), remove=()):
+        # 见 TagIndex.update()；记下受影响的标签原来的位图
+        bitmaps = self.tags.bitmaps(list(add) + [name for name in remove if name not in add])
+        self.tags.update(indices, add, remove)
+        self._record("批量设置标签", "bitmaps", bitmaps)
+
+    def _apply(self, entry):
+        # 执行 entry 记下的相反操作，返回撤销这一步的记录
+        label, kind = entry[0], entry[1]
+        store = self.store
+        if kind == "added":
+            _, _, first, count = entry
+            options, weights = store.truncate(first)
+            return label, "truncated", first, options, weights
+        if kind == "truncated":
+            _, _, first, options, weights = entry
+            store.extend(options, weights)
+            return label, "added", first, len(options)
+        if kind == "removed":
+            _, _, index, option, weight, option_id, names = entry
+            store.insert_swap(index, option, weight, option_id)
+            if names:
+                self.tags.set_tags(index, names)
+            return label, "restored", index
+        if kind == "restored":
+            return (label,) + self._removal(entry[2])
+        if kind == "weights":
+            _, _, start, weights = entry
+            old = [store.weight(i) for i in range(start, start + len(weights))]
+            store.set_weights(start, weights)
+            return label, "weights", start, old
+        if kind == "state":
+            # 先取出标签和轮换的当前状态：换回选项时的 "reset" 通知会把它们清空
+            _, _, state, parts = entry
+            current = self._save_parts()
+            old = store.swap_state(state)
+            for part, part_state in zip(self._parts, parts):
+                part.set_state(part_state)
+            return label, "state", old, current
+        if kind == "option_tags":
+            _, _, index, names = entry
+            old = self.tags.tags_of(index)
+            self.tags.set_tags(index, names)
+            return label, "option_tags", index, old
+        if kind == "bitmaps":
+            return label, "bitmaps", self.tags.set_bitmaps(entry[2])
+        raise ValueError(f"未知的撤销记录: {kind}")
+
+    def undo(self):
+        # 撤销最近一次修改，返回它的名称；没有可以撤销的修改时返回 None
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._redo.append(self._apply(entry))
+        return entry[0]
+
+    def redo(self):
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(self._apply(entry))
+        return entry[0]
@@ -0,0 +1,350 @@
+# 自动保存：每次添加、删除、修改权重、清空、修改标签和轮换抽取都作为一条很短的记录追加到日志文件，
+# 日志变长后在后台线程中压缩成快照（二进制 .rcb 格式，包括标签和轮换进度），
+# 启动时读取快照再重放日志即可恢复。
+#
+# 文件都放在 saved_options/ 下，以 . 开头，不会出现在选项集查找中：
+#   .autosave.<代>.rcb       第 <代> 代快照
+#   .autosave.<代>.journal   在第 <代> 代状态上依次执行的操作，每行一个 JSON 数组：
+#       ["+", 选项列表, 权重列表或 null]   在末尾追加
+#       ["-", 下标]                        删除（与最后一项交换后弹出）
+#       ["r", 下标, 选项, 权重]            放回删除的选项（撤销删除），原来在该下标的选项移到末尾
+#       ["t", 长度]                        只保留前「长度」个选项（撤销追加）
+#       ["w", 起始下标, 权重列表]          修改权重
+#       ["c"]                              清空
+#       ["g", 下标, 标签列表]              把一个选项的标签换成给出的标签
+#       ["G", {标签: 位图或 null}]         把这些标签的位图整体换掉（null 表示去掉这个标签）
+#       ["T", {标签: 位图}]                全部标签整体替换
+#       ["d", 下标]                        轮换中标记为本轮已抽取
+#       ["n", 下标列表]                    轮换开始新的一轮，列表中的下标已经抽取
+#     位图为 base64 编码的字节（见 chooser_tags.py）；
+#     第一行是 {"gen": 代, "continues": 是否接着上一代的日志, "count": 开始记录时的选项数}
+#
+# 切换到新一代日志时在界面线程中只复制当前状态，快照总是在后台线程中写出，写完之后才删除旧的快照和日志。
+# 整体替换（加载、撤销清空）或一次加入大量选项后的新一代日志不接着上一代，没有它的快照就不会被重放：
+# 快照写完之前程序退出时恢复到替换之前的状态，恢复出来的总是一个曾经完整存在过的状态。
+# 写日志出错（例如磁盘已满、目录被删除）时停止记录，保留已有的文件，并调用 on_error
+import base64
+import json
+import os
+import queue
+import threading
+
+from chooser_engine import DEFAULT_SAVE_PATH, OptionStore
+from chooser_binary import load_binary_drawn, load_binary_file, load_binary_tags, save_binary_file
+
+AUTOSAVE_NAME = ".autosave"
+
+# 日志累计的选项数超过这个值和当前选项数中较大的一个时压缩
+COMPACT_MIN_ITEMS = 10000
+
+
+def _encode_bits(bits):
+    return None if bits is None else base64.b64encode(bits).decode("ascii")
+
+
+def _decode_bits(data):
+    return None if data is None else base64.b64decode(data)
+
+
+class Journal:
+    def __init__(self, path=DEFAULT_SAVE_PATH, name=AUTOSAVE_NAME):
+        self.path = path
+        self.name = name
+        self.store = None
+        self.tags = None
+        self.rotation = None
+        self.gen = 0
+        # 写日志出错时调用 on_error(异常)，在修改选项的线程中调用，此时已经停止记录
+        self.on_error = None
+        self._file = None
+        self._items = 0
+        # recover() 之后 start() 可以直接接着恢复出来的日志写，不需要先写快照
+        self._resume_len = None
+        self._jobs = queue.Queue()
+        self._worker = None
+
+    def _file_name(self, gen, ext):
+        return os.path.join(self.path, f"{self.name}.{gen}{ext}")
+
+    def _generations(self, ext):
+        # 返回已存在的某类文件的代号（升序）
+        prefix = self.name + "."
+        result = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return result
+        for name in names:
+            if name.startswith(prefix) and name.endswith(ext):
+                gen = name[len(prefix):-len(ext)]
+                if gen.isdigit():
+                    result.append(int(gen))
+        return sorted(result)
+
+    def exists(self):
+        return bool(self._generations(".rcb") or self._generations(".journal"))
+
+    def recover(self):
+        # 从最新的快照和之后的日志恢复，返回 (选项, 权重列表或 None, 轮换中本轮已抽取的下标列表,
+        # {标签: 位图 bytes})；没有自动保存或者第一份快照还没写完时返回 None。
+        # 日志在真正的选项存储、标签索引和轮换上重放，结果与记录时完全一致
+        from chooser_rotation import Rotation
+        from chooser_tags import TagIndex
+        snapshots = self._generations(".rcb")
+        journals = self._generations(".journal")
+        if not snapshots and not journals:
+            return None
+        self.gen = max(snapshots + journals)
+        store = OptionStore()
+        tags = TagIndex(store)
+        rotation = Rotation(store)
+        if snapshots:
+            gen = snapshots[-1]
+            filename = self._file_name(gen, ".rcb")
+            store.replace(*load_binary_file(filename))
+            tags.load(load_binary_tags(filename))
+            rotation.restore(load_binary_drawn(filename))
+        else:
+            # 没有快照时只能从最早的一代日志开始重放，而且它必须是从空的选项开始记录的；
+            # 否则是第一份快照写完之前程序就退出了，当时的选项无法恢复
+            gen = journals[0]
+        first = True
+        while gen in journals:
+            if not self._replay(self._file_name(gen, ".journal"), store, tags, rotation, first, bool(snapshots)):
+                if first:
+                    return None
+                break
+            first = False
+            gen += 1
+        if gen > self.gen:
+            # 所有日志都重放了，之后可以接着写
+            self._resume_len = len(store)
+        options, weights = store.snapshot()
+        return options, weights if store.is_weighted() else None, rotation.drawn_indices(), tags.snapshot()
+
+    def set_aside(self):
+        # recover() 失败时调用：把现有的自动保存文件改名为 *.damaged，以后不再尝试恢复
+        # （需要时可以手动检查），之后 start() 从当前的选项重新开始记录
+        for ext in (".rcb", ".journal"):
+            for gen in self._generations(ext):
+                filename = self._file_name(gen, ext)
+                try:
+                    os.replace(filename, filename + ".damaged")
+                except OSError:
+                    # 改不了名时 start() 写出新一代快照后也会删除它们
+                    pass
+        self._resume_len = None
+
+    def _replay(self, filename, store, tags, rotation, first, snapshot):
+        with open(filename, "r", encoding="utf-8") as f:
+            lines = iter(f)
+            try:
+                header = json.loads(next(lines))
+            except (StopIteration, ValueError):
+                return False
+            # 不接着上一代的日志只能用在同一代的快照上
+            if not first and not header.get("continues"):
+                return False
+            if first and not snapshot and header.get("count") != 0:
+                return False
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 最后一行可能只写了一半
+                    break
+                self._apply(record, store, tags, rotation)
+        return True
+
+    @staticmethod
+    def _apply(record, store, tags, rotation):
+        op = record[0]
+        if op == "+":
+            store.extend(record[1], record[2])
+        elif op == "-":
+            store.remove_at(record[1])
+        elif op == "r":
+            store.insert_swap(record[1], record[2], record[3])
+        elif op == "t":
+            store.truncate(record[1])
+        elif op == "w":
+            store.set_weights(record[1], record[2])
+        elif op == "c":
+            store.clear()
+        elif op == "g":
+            tags.set_tags(record[1], record[2])
+        elif op == "G":
+            tags.set_bitmaps({name: _decode_bits(data) for name, data in record[1].items()})
+        elif op == "T":
+            tags.load({name: _decode_bits(data) for name, data in record[1].items()})
+        elif op == "d":
+            rotation.mark(record[1])
+        elif op == "n":
+            rotation.restore(record[1])
+
+    def start(self, store, tags=None, rotation=None):
+        # 开始记录 store 的修改，给出 tags（chooser_tags.TagIndex）和 rotation（chooser_rotation.Rotation）时
+        # 也记录标签和轮换进度；刚恢复出来的状态直接接着写日志，否则先写一份快照
+        self.store = store
+        self.tags = tags
+        self.rotation = rotation
+        store.subscribe(self._on_store_changed)
+        if tags is not None:
+            tags.subscribe(self._on_tags_changed)
+        if rotation is not None:
+            rotation.subscribe(self._on_rotation_changed)
+        if self._resume_len is not None and self._resume_len == len(store):
+            self._rotate(continues=True, snapshot=False)
+        else:
+            self._rotate(continues=False)
+        self._resume_len = None
+
+    def stop(self, discard=True):
+        # 停止记录；discard=True 时删除所有自动保存文件，下次启动不再恢复
+        if self.store is not None:
+            self.store.unsubscribe(self._on_store_changed)
+            self.store = None
+        if self.tags is not None:
+            self.tags.unsubscribe(self._on_tags_changed)
+            self.tags = None
+        if self.rotation is not None:
+            self.rotation.unsubscribe(self._on_rotation_changed)
+            self.rotation = None
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        if discard:
+            self._submit(("cleanup", self.gen + 1, None))
+
+    @property
+    def recording(self):
+        return self.store is not None
+
+    def wait(self):
+        # 等待后台的快照和清理完成
+        self._jobs.join()
+
+    def _fail(self, error):
+        # 写日志出错：停止记录，已有的文件保留（可以恢复到出错之前），再通知界面；
+        # 不把异常抛给选项存储的通知，修改本身已经完成
+        self.stop(discard=False)
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _write(self, record, items=1):
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            # 每条记录都交给操作系统，程序崩溃时也不会丢失
+            self._file.flush()
+        except OSError as e:
+            self._fail(e)
+            return
+        self._items += items
+        if self._items > max(COMPACT_MIN_ITEMS, len(self.store)):
+            self.compact()
+
+    def compact(self):
+        self._rotate(continues=True)
+
+    def _rotate(self, continues, snapshot=True):
+        # 切换到新一代日志；snapshot=True 时复制当前状态，交给后台线程写成这一代的快照
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.gen += 1
+            self._items = 0
+            self._file = open(self._file_name(self.gen, ".journal"), "w", encoding="utf-8")
+            self._file.write(json.dumps({"gen": self.gen, "continues": continues, "count": len(self.store)}) + "\n")
+            self._file.flush()
+        except OSError as e:
+            self._fail(e)
+            return
+        if snapshot:
+            options, weights = self.store.snapshot()
+            drawn = self.rotation.drawn_indices() if self.rotation is not None else None
+            tags = self.tags.snapshot() if self.tags is not None else None
+            self._submit(("snapshot", self.gen, (options, weights, drawn, tags)))
+
+    def _submit(self, job):
+        self._jobs.put(job)
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            kind, gen, data = self._jobs.get()
+            try:
+                if kind == "snapshot":
+                    self._write_snapshot(gen, *data)
+                self._remove_before(gen)
+            except (OSError, ValueError):
+                # 写不了快照时上一代的快照和日志仍然完整，下次压缩再试
+                pass
+            finally:
+                self._jobs.task_done()
+
+    def _write_snapshot(self, gen, options, weights, drawn=None, tags=None):
+        filename = self._file_name(gen, ".rcb")
+        tmp = filename + ".tmp"
+        save_binary_file(tmp, options, weights, drawn, tags)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, filename)
+
+    def _remove_before(self, gen):
+        # 删除 gen 之前的快照和日志
+        for ext in (".rcb", ".journal"):
+            for old in self._generations(ext):
+                if old < gen:
+                    try:
+                        os.remove(self._file_name(old, ext))
+                    except OSError:
+                        # Windows 上仍被内存映射的快照删不掉，下次压缩时再删
+                        pass
+
+    def _on_store_changed(self, event, index, count):
+        store = self.store
+        if event == "insert":
+            if count >= max(COMPACT_MIN_ITEMS, len(store) // 2):
+                # 一次加入很多选项（例如加载文件）时直接写快照，不逐条记录
+                self._rotate(continues=False)
+                return
+            options = [store[i] for i in range(index, index + count)]
+            weights = [store.weight(i) for i in range(index, index + count)]
+            if all(w == 1.0 for w in weights):
+                weights = None
+            self._write(["+", options, weights], count)
+        elif event == "swap_remove":
+            self._write(["-", index])
+        elif event == "swap_insert":
+            self._write(["r", index, store[index], store.weight(index)])
+        elif event == "truncate":
+            self._write(["t", index], count)
+        elif event == "update":
+            self._write(["w", index, [store.weight(i) for i in range(index, index + count)]], count)
+        elif len(store) == 0:
+            self._write(["c"])
+        else:
+            self._rotate(continues=False)
+
+    def _on_tags_changed(self, event, value):
+        tags = self.tags
+        if event == "option":
+            self._write(["g", value, tags.tags_of(value)])
+            return
+        bitmaps = tags.bitmaps(value) if event == "tags" else tags.snapshot()
+        # 位图按 8 个选项一个字节计，大约 16 个字节算作一个选项
+        size = sum(len(bits) for bits in bitmaps.values() if bits is not None)
+        self._write(["G" if event == "tags" else "T", {name: _encode_bits(bits) for name, bits in bitmaps.items()}],
+                    size // 16 + 1)
+
+    def _on_rotation_changed(self, event, value):
+        if event == "drawn":
+            self._write(["d", value])
+        else:
+            self._write(["n", value], len(value) + 1)
@@ -0,0 +1,201 @@
+# 性能记录，与界面库无关：每种操作的耗时直方图、事件循环卡顿和控件数量，可以导出为 JSON 统计
+# 或 Chrome trace（在 chrome://tracing 或 https://ui.perfetto.dev 中打开），还可以用 cProfile 分析下一次操作。
+#
+# 界面的热点方法用 @timed() 包装；没有开启时包装只多一次属性判断。开启方式：
+#   CHOOSER_PROFILE=1            启动时开启
+#   CHOOSER_PROFILE=文件.json    启动时开启，退出时把统计写到该文件，Chrome trace 写到同名的 .trace.json
+# 或在界面中按 F12 打开「性能记录」窗口开关、查看和导出。
+#
+# 卡顿检测：界面在开启时每 HEARTBEAT_MS 毫秒调用一次 heartbeat()，两次调用的间隔比预期晚了
+# STALL_MS 以上就说明事件循环被占住了，记录下卡顿的开始时间和长度；顺便每秒记录一次控件数量
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+# 心跳间隔和判定为卡顿的延迟（毫秒）
+HEARTBEAT_MS = 50
+STALL_MS = 100
+# 记录控件数量的间隔（秒）
+WIDGET_SAMPLE_S = 1.0
+# 最多保留的 trace 事件数，更早的丢弃
+TRACE_LIMIT = 200000
+# 直方图的桶数：第 k 个桶是 [2^(k-1), 2^k) 微秒
+BUCKETS = 40
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        # 近似的分位数（秒）：所在桶的上界
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(2 ** k / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"count": self.count, "total_ms": self.total * 1000, "mean_ms": self.total * 1000 / max(self.count, 1),
+                "p50_ms": self.percentile(0.5) * 1000, "p90_ms": self.percentile(0.9) * 1000,
+                "p99_ms": self.percentile(0.99) * 1000, "max_ms": self.max * 1000,
+                "buckets_us": {f"<{2 ** k}": n for k, n in enumerate(self.buckets) if n}}
+
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.histograms = {}
+        self.events = deque(maxlen=TRACE_LIMIT)
+        self.stalls = []
+        self.widgets = []
+        self._last_beat = None
+        self._last_sample = 0.0
+        self._local = threading.local()
+        # profile_next() 之后下一次最外层的操作在 cProfile 下运行，结果写到这个文件
+        self.profile_file = None
+        self.on_profile = None
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.histograms = {}
+        self.events.clear()
+        self.stalls = []
+        self.widgets = []
+        self._last_beat = None
+
+    def record(self, name, start, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram())
+        histogram.add(seconds)
+        self.events.append((name, start, seconds, threading.get_ident()))
+
+    def timed(self, name=None):
+        # 装饰器：开启时记录每次调用的耗时，name 默认为函数名
+        def decorate(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                local = self._local
+                depth = getattr(local, "depth", 0)
+                local.depth = depth + 1
+                start = time.perf_counter()
+                try:
+                    if (self.profile_file is not None and depth == 0
+                            and threading.current_thread() is threading.main_thread()):
+                        return self._profile(label, func, args, kwargs)
+                    return func(*args, **kwargs)
+                finally:
+                    local.depth = depth
+                    self.record(label, start, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def profile_next(self, filename, on_profile=None):
+        # 用 cProfile 分析下一次操作，完成后调用 on_profile(文件名, 操作名)
+        self.profile_file = filename
+        self.on_profile = on_profile
+
+    def _profile(self, label, func, args, kwargs):
+        import cProfile
+        filename, on_profile = self.profile_file, self.on_profile
+        self.profile_file = self.on_profile = None
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            profile.dump_stats(filename)
+            if on_profile is not None:
+                on_profile(filename, label)
+
+    def heartbeat(self, count_widgets=None):
+        # 界面每 HEARTBEAT_MS 毫秒调用一次；count_widgets() 返回当前的控件数量
+        now = time.perf_counter()
+        if self._last_beat is not None:
+            late = now - self._last_beat - HEARTBEAT_MS / 1000
+            if late * 1000 >= STALL_MS:
+                self.stalls.append((self._last_beat + HEARTBEAT_MS / 1000, late))
+        self._last_beat = now
+        if count_widgets is not None and now - self._last_sample >= WIDGET_SAMPLE_S:
+            self._last_sample = now
+            self.widgets.append((now, count_widgets()))
+
+    def stop_heartbeat(self):
+        # 停止心跳后重新开始时不把中间的时间算作卡顿
+        self._last_beat = None
+
+    def stats(self):
+        return {"operations": {name: h.to_dict() for name, h in sorted(self.histograms.items())},
+                "stalls": [{"at_s": start - self.origin, "ms": late * 1000} for start, late in self.stalls],
+                "widgets": [{"at_s": at - self.origin, "count": count} for at, count in self.widgets]}
+
+    def summary(self):
+        # 供调试窗口显示的文字：按总耗时排序
+        lines = [f"{'操作':<24}{'次数':>8}{'平均ms':>10}{'p90ms':>10}{'p99ms':>10}{'最长ms':>10}"]
+        for name, h in sorted(self.histograms.items(), key=lambda item: -item[1].total):
+            lines.append(f"{name:<24}{h.count:>8}{h.total * 1000 / h.count:>10.2f}"
+                         f"{h.percentile(0.9) * 1000:>10.2f}{h.percentile(0.99) * 1000:>10.2f}{h.max * 1000:>10.2f}")
+        if self.stalls:
+            longest = max(late for _, late in self.stalls)
+            lines.append(f"\n事件循环卡顿 {len(self.stalls)} 次，最长 {longest * 1000:.0f} ms")
+        if self.widgets:
+            lines.append(f"控件数量: {self.widgets[-1][1]}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        # Chrome trace 格式：操作和卡顿是持续事件（ph=X），控件数量是计数器（ph=C），时间单位为微秒
+        pid = os.getpid()
+        main = threading.main_thread().ident
+        events = [{"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": seconds * 1e6,
+                   "pid": pid, "tid": tid, "cat": "main" if tid == main else "worker"}
+                  for name, start, seconds, tid in list(self.events)]
+        events += [{"name": "事件循环卡顿", "ph": "X", "ts": (start - self.origin) * 1e6, "dur": late * 1e6,
+                    "pid": pid, "tid": 0, "cat": "stall"} for start, late in self.stalls]
+        events += [{"name": "控件数量", "ph": "C", "ts": (at - self.origin) * 1e6, "pid": pid,
+                    "args": {"widgets": count}} for at, count in self.widgets]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, filename, fmt="json"):
+        # fmt 为 "json"（统计）或 "trace"（Chrome trace）
+        import json
+        data = self.chrome_trace() if fmt == "trace" else self.stats()
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=None if fmt == "trace" else 2)
+
+
+def _from_environment():
+    value = os.environ.get("CHOOSER_PROFILE", "")
+    profiler = Profiler(enabled=bool(value) and value != "0")
+    if value not in ("", "0", "1"):
+        # 给出文件名时退出前导出统计和 Chrome trace
+        import atexit
+        stem = value[:-5] if value.endswith(".json") else value
+        atexit.register(profiler.export, value)
+        atexit.register(profiler.export, stem + ".trace.json", "trace")
+    return profiler
+
+
+# 进程内共用的记录器，界面模块用 timed() 包装热点方法
+PROFILER = _from_environment()
+timed = PROFILER.timed
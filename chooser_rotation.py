@@ -0,0 +1,236 @@
+# 轮换抽取：不放回地跨多次抽取，每个选项在一轮中最多被抽中一次，全部抽完后开始新的一轮。
+#
+# 用「延迟的 Fisher–Yates 洗牌」实现：把选项下标看作一个排列，前 drawn 个位置是本轮已抽中的，
+# 每次从剩下的位置中随机取一个，与第 drawn 个位置交换，O(1)；不会预先打乱整个列表。
+# 排列只记录与恒等排列不同的位置（位置 -> 下标，下标 -> 位置两个字典），
+# 本轮抽取次数很多、稀疏记录比数组还大时改用两个 array('q')，新一轮开始时再换回空字典，
+# 所以百万级选项在刚开始时不占额外内存。
+#
+# 选项存储的修改会同步到排列中：新追加的选项都算作未抽中，删除（与最后一项交换）也是 O(1)，
+# 撤销删除时放回的选项同样算作未抽中。
+# 轮换只保证不重复，不按权重抽取；权重为 0 的选项不会被抽中。
+#
+# 抽取和重新开始一轮时通知订阅者 callback(event, value)（存储的修改引起的变化不通知）：
+#   "drawn"   第 value 个选项标记为本轮已抽取
+#   "round"   开始新的一轮，value 为本轮已抽取的下标列表（新的一轮为空列表）
+#
+# 抽取的结果取决于排列，排列又只取决于本轮开始之后的抽取和选项的增删：在同一个选项集上
+# 从初始顺序（at_start()）开始按顺序重放同样的抽取，就能得到同样的结果（见 chooser_audit.py）
+import random
+from array import array
+
+# 稀疏记录的条目数超过选项数的这个比例（且不少于 DENSE_MIN）时改用数组
+DENSE_RATIO = 0.25
+DENSE_MIN = 1024
+
+
+class Rotation:
+    def __init__(self, store, rng=None):
+        self.store = store
+        self.rng = rng if rng is not None else random.Random()
+        self._listeners = []
+        # 每次修改（抽取、新的一轮、选项的增删）后加一，可以据此判断两次抽取之间有没有别的修改
+        self.version = 0
+        self._reset(len(store))
+        store.subscribe(self._on_store_changed)
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, event, value):
+        for callback in list(self._listeners):
+            callback(event, value)
+
+    def _notify_round(self):
+        # 没有订阅者时不生成已抽取的下标列表，撤销清空等整体换回仍是 O(1)
+        if self._listeners:
+            self._notify("round", self.drawn_indices())
+
+    def _reset(self, count):
+        self.version += 1
+        self._count = count
+        self._drawn = 0
+        self._dense = False
+        # 位置 -> 下标、下标 -> 位置
+        self._perm = {}
+        self._where = {}
+
+    @property
+    def drawn_count(self):
+        # 本轮已经抽取过的选项数
+        return self._drawn
+
+    @property
+    def remaining(self):
+        return self._count - self._drawn
+
+    def at_start(self):
+        # 排列还是初始顺序：本轮还没有抽取，也没有因为放回选项等被打乱
+        return self._drawn == 0 and not self._dense and not self._perm
+
+    def new_round(self):
+        self._reset(self._count)
+        self._notify("round", [])
+
+    def _value(self, pos):
+        return self._perm[pos] if self._dense else self._perm.get(pos, pos)
+
+    def _pos(self, index):
+        return self._where[index] if self._dense else self._where.get(index, index)
+
+    def _put(self, pos, index):
+        if self._dense:
+            self._perm[pos] = index
+            self._where[index] = pos
+        elif pos == index:
+            self._perm.pop(pos, None)
+            self._where.pop(index, None)
+        else:
+            self._perm[pos] = index
+            self._where[index] = pos
+
+    def _swap(self, a, b):
+        if a != b:
+            first = self._value(a)
+            self._put(a, self._value(b))
+            self._put(b, first)
+
+    def _densify(self):
+        if self._dense or len(self._perm) <= max(DENSE_MIN, self._count * DENSE_RATIO):
+            return
+        perm = array("q", range(self._count))
+        where = array("q", range(self._count))
+        for pos, index in self._perm.items():
+            perm[pos] = index
+        for index, pos in self._where.items():
+            where[index] = pos
+        self._perm, self._where, self._dense = perm, where, True
+
+    def _mark(self, pos):
+        # 把 pos 处的选项移到已抽取区域的末尾
+        self._swap(pos, self._drawn)
+        self._drawn += 1
+        self.version += 1
+        self._densify()
+
+    def mark(self, index):
+        # 把 index 标记为本轮已抽取（例如重放自动保存日志时）；已经抽过的不变
+        if not self.is_drawn(index):
+            self._mark(self._pos(index))
+            self._notify("drawn", index)
+
+    def is_drawn(self, index):
+        return self._pos(index) < self._drawn
+
+    def can_choose(self, subset=None):
+        if subset is None:
+            return self.store.choosable_count() > 0
+        return any(self.store.weight(i) > 0 for i in subset)
+
+    def choose_index(self, subset=None, rng=None):
+        # subset 为存储下标列表（例如筛选结果）时只在其中未抽过的选项中抽取，耗时与 subset 的长度成正比；
+        # 没有可抽的选项时开始新的一轮
+        if not self.can_choose(subset):
+            raise IndexError("没有可选择的选项")
+        rng = rng if rng is not None else self.rng
+        store = self.store
+        if subset is not None:
+            candidates = [i for i in subset if not self.is_drawn(i) and store.weight(i) > 0]
+            if not candidates:
+                self.new_round()
+                candidates = [i for i in subset if store.weight(i) > 0]
+            index = candidates[rng.randrange(len(candidates))]
+            self._mark(self._pos(index))
+            self._notify("drawn", index)
+            return index
+        while True:
+            if self._drawn >= self._count:
+                self.new_round()
+            pos = rng.randrange(self._drawn, self._count)
+            index = self._value(pos)
+            self._mark(pos)
+            self._notify("drawn", index)
+            # 权重为 0 的选项算作本轮已经轮到，继续抽取
+            if store.weight(index) > 0:
+                return index
+
+    def choose(self, subset=None, rng=None):
+        return self.store[self.choose_index(subset, rng)]
+
+    def drawn_indices(self):
+        # 本轮已抽中的选项下标（按抽取顺序），保存选项时一起保存
+        return [self._value(pos) for pos in range(self._drawn)]
+
+    def restore(self, indices):
+        # 开始新的一轮并把 indices 标记为已抽取；超出范围或重复的下标被忽略
+        self._reset(self._count)
+        for index in indices:
+            if isinstance(index, int) and 0 <= index < self._count and not self.is_drawn(index):
+                self._mark(self._pos(index))
+        self._notify_round()
+
+    def state(self):
+        # 当前的轮换状态（不复制）：选项整体替换时会换上新的排列，取出的状态之后不会再被修改
+        return self._count, self._drawn, self._dense, self._perm, self._where
+
+    def set_state(self, state):
+        # 放回 state() 取出的状态，选项也必须已经换回取出时的那一份
+        self._count, self._drawn, self._dense, self._perm, self._where = state
+        self.version += 1
+        self._notify_round()
+
+    def _drop_last(self, index):
+        # 去掉最后一个位置（其中是被删除的 index），原来的最后一个下标改称 index
+        last = self._count - 1
+        if self._dense:
+            self._perm.pop()
+            if index != last:
+                pos = self._where[last]
+                self._perm[pos] = index
+                self._where[index] = pos
+            self._where.pop()
+        else:
+            self._perm.pop(last, None)
+            self._where.pop(index, None)
+            if index != last:
+                self._put(self._where.pop(last, last), index)
+        self._count = last
+
+    def _remove(self, index):
+        pos = self._pos(index)
+        last = self._count - 1
+        if pos < self._drawn:
+            self._swap(pos, self._drawn - 1)
+            self._drawn -= 1
+            pos = self._drawn
+        self._swap(pos, last)
+        self._drop_last(index)
+
+    def _on_store_changed(self, event, index, count):
+        self.version += 1
+        if event == "insert":
+            # 追加的选项都在未抽取区域的末尾
+            if self._dense:
+                self._perm.extend(range(self._count, self._count + count))
+                self._where.extend(range(self._count, self._count + count))
+            self._count += count
+        elif event == "swap_remove":
+            self._remove(index)
+        elif event == "swap_insert":
+            # 原来的选项改称 last，放回的选项占用末尾新增的（未抽取的）位置
+            last = self._count
+            if self._dense:
+                self._perm.append(last)
+                self._where.append(last)
+            self._count += 1
+            self._put(self._pos(index), last)
+            self._put(last, index)
+            self._densify()
+        elif event == "truncate":
+            for removed in range(self._count - 1, index - 1, -1):
+                self._remove(removed)
+        elif event == "reset":
+            self._reset(len(self.store))
@@ -0,0 +1,329 @@
+# 本地 HTTP 抽取服务（asyncio），只监听 127.0.0.1，供其他工具调用：
+#   python random_chooser.py --serve [--port 端口] [--dir 选项集目录]
+#   python chooser_server.py [--port 端口] [--dir 选项集目录]
+#
+# 接口（请求和响应都是 JSON）：
+#   GET    /sets                          saved_options/ 下的选项集
+#   GET    /sets/<名称>/draw?n=&replace=&seed=   从保存的选项集中抽取
+#   GET    /options                       当前选项列表 [{"id", "option", "weight"}]
+#   POST   /options                       添加 {"option", "weight"} 或 {"options": [...], "weights": [...]}
+#   PATCH  /options/<id>                  修改权重 {"weight"}
+#   DELETE /options/<id>                  删除一个选项
+#   DELETE /options                       清空
+#   POST   /options/load                  用保存的选项集替换当前选项 {"name"}
+#   GET    /draw?n=&replace=&seed=        从当前选项中抽取
+#
+# 浏览器中的网页也能访问 127.0.0.1：Host（以及 Origin，如果有）不是本机的请求一律拒绝（防止 DNS 重绑定），
+# 修改当前选项的请求（POST、PATCH、DELETE）必须带 Content-Type: application/json，
+# 网页不经过预检就发不出这样的跨域请求。
+#
+# 保存的选项集读入后放在 LRU 缓存中，文件的修改时间或大小变化时自动重新读取；
+# 读取文件在线程池中进行，不会阻塞其他请求
+import asyncio
+import json
+import os
+import random
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from chooser_engine import DEFAULT_SAVE_PATH, OptionFormatError, OptionStore, Chooser
+from chooser_batch import BatchChooser
+from chooser_stream import read_option_file
+from chooser_catalog import OPTION_FILE_EXTS
+
+DEFAULT_PORT = 8765
+CACHE_SIZE = 16
+# 一次请求最多抽取的次数和请求体的最大长度
+MAX_DRAWS = 100000
+MAX_BODY = 16 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error"}
+
+LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+MUTATING_METHODS = ("POST", "PATCH", "DELETE")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class OptionSetCache:
+    # 名称 -> (修改时间, 大小, Chooser)，最近使用的排在最后
+    def __init__(self, path=DEFAULT_SAVE_PATH, capacity=CACHE_SIZE):
+        self.path = path
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        # 正在读取的选项集：同时请求同一个选项集时只读取一次文件，
+        # 这里合并的是重复的读取，选项本身按文件内容原样加载，不去重
+        self._loading = {}
+
+    def names(self):
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        return sorted(name for name in names if not name.startswith(".")
+                      and os.path.splitext(name)[1].lower() in OPTION_FILE_EXTS)
+
+    def _filename(self, name):
+        if (not name or name.startswith(".") or os.path.basename(name) != name
+                or os.path.splitext(name)[1].lower() not in OPTION_FILE_EXTS):
+            raise HTTPError(404, f"没有选项集: {name}")
+        return os.path.join(self.path, name)
+
+    @staticmethod
+    def _load(filename):
+        options, weights = read_option_file(filename)
+        return Chooser(OptionStore(options, weights))
+
+    async def get(self, name):
+        filename = self._filename(name)
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            raise HTTPError(404, f"没有选项集: {name}")
+        key = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == key:
+            self._entries.move_to_end(name)
+            return entry[1]
+
+        loading = self._loading.get(name)
+        if loading is None or loading[0] != key:
+            future = asyncio.get_running_loop().run_in_executor(None, self._load, filename)
+            loading = self._loading[name] = (key, future)
+        try:
+            chooser = await loading[1]
+        except (OptionFormatError, ValueError):
+            raise HTTPError(400, f"选项集格式不正确: {name}")
+        except OSError as e:
+            raise HTTPError(404, f"无法读取选项集 {name}: {e}")
+        finally:
+            if self._loading.get(name) is loading:
+                del self._loading[name]
+
+        self._entries[name] = (key, chooser)
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+        return chooser
+
+
+def _draw(chooser, query):
+    try:
+        count = int(query.get("n", "1"))
+        replace = query.get("replace", "1") not in ("0", "false", "no")
+        seed = int(query["seed"]) if "seed" in query else None
+    except ValueError:
+        raise HTTPError(400, "参数格式不正确")
+    if not 0 <= count <= MAX_DRAWS:
+        raise HTTPError(400, f"抽取次数必须在 0 到 {MAX_DRAWS} 之间")
+    if count and not chooser.can_choose():
+        raise HTTPError(400, "没有可以抽取的选项")
+    if not replace and count > chooser.store.choosable_count():
+        raise HTTPError(400, "不放回抽取的数量超过了可选择的选项数")
+    if seed is not None:
+        # 指定了种子时用独立的生成器，相同的种子总是得到相同的结果；
+        # BatchChooser 不订阅存储的修改，用完直接丢弃，不会在共用的存储上留下订阅者
+        return {"options": BatchChooser(chooser.store, random.Random(seed)).draw(count, replace)}
+    if count == 1:
+        return {"options": [chooser.choose()]}
+    return {"options": chooser.choose_many(count, replace)}
+
+
+def _is_local(netloc):
+    # "127.0.0.1:8765"、"localhost"、"[::1]:8765" 这样的主机名（可以带端口）是否指向本机
+    try:
+        return urlsplit("//" + netloc).hostname in LOCAL_HOSTS
+    except ValueError:
+        return False
+
+
+def _check_request(method, headers):
+    # 检查请求头，返回请求体的长度
+    host = headers.get("host")
+    if host is not None and not _is_local(host):
+        raise HTTPError(403, "只接受发给本机的请求")
+    origin = headers.get("origin")
+    if origin is not None and not (origin.startswith("http://") and _is_local(origin[len("http://"):])):
+        raise HTTPError(403, "不接受来自其他网页的请求")
+    if method in MUTATING_METHODS:
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise HTTPError(415, "请求必须带 Content-Type: application/json")
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPError(400, "Content-Length 不是整数")
+    if length < 0:
+        raise HTTPError(400, "Content-Length 不能是负数")
+    if length > MAX_BODY:
+        raise HTTPError(413, "请求体太大")
+    return length
+
+
+class ChooserService:
+    def __init__(self, path=DEFAULT_SAVE_PATH, cache_size=CACHE_SIZE):
+        self.cache = OptionSetCache(path, cache_size)
+        self.options = OptionStore()
+        self.chooser = Chooser(self.options)
+
+    def _option_index(self, option_id):
+        try:
+            return self.options.index_of(int(option_id))
+        except (KeyError, ValueError):
+            raise HTTPError(404, f"没有编号为 {option_id} 的选项")
+
+    async def handle(self, method, target, body):
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if parts == ["sets"] and method == "GET":
+            return {"sets": self.cache.names()}
+        if len(parts) == 3 and parts[0] == "sets" and parts[2] == "draw" and method == "GET":
+            return _draw(await self.cache.get(parts[1]), query)
+        if parts == ["draw"] and method == "GET":
+            return _draw(self.chooser, query)
+        if parts == ["options"]:
+            if method == "GET":
+                options = self.options
+                return {"options": [{"id": options.id_at(i), "option": options[i],
+                                     "weight": options.weight(i)} for i in range(len(options))]}
+            if method == "POST":
+                return self._add(body)
+            if method == "DELETE":
+                self.options.clear()
+                return {"count": 0}
+        if parts == ["options", "load"] and method == "POST":
+            name = body.get("name") if isinstance(body, dict) else None
+            store = (await self.cache.get(name)).store
+            # 缓存中的存储可能被其他请求继续使用，这里只复制选项和权重
+            self.options.replace(*store.snapshot())
+            return {"count": len(self.options)}
+        if len(parts) == 2 and parts[0] == "options":
+            index = self._option_index(parts[1])
+            if method == "DELETE":
+                return {"option": self.options.remove_at(index)}
+            if method == "PATCH":
+                try:
+                    self.options.set_weight(index, body["weight"])
+                except (KeyError, TypeError, ValueError):
+                    raise HTTPError(400, "需要有效的 weight")
+                return {"id": self.options.id_at(index), "weight": self.options.weight(index)}
+        raise HTTPError(404, f"没有这个接口: {method} {url.path}")
+
+    def _add(self, body):
+        if not isinstance(body, dict):
+            raise HTTPError(400, "请求体必须是 JSON 对象")
+        if "options" in body:
+            options, weights = body["options"], body.get("weights")
+        else:
+            options, weights = [body.get("option")], [body.get("weight", 1.0)]
+        if not isinstance(options, list) or not all(isinstance(o, str) and o.strip() for o in options):
+            raise HTTPError(400, "选项必须是非空字符串")
+        first = len(self.options)
+        try:
+            self.options.extend([o.strip() for o in options], weights)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "权重无效")
+        return {"ids": [self.options.id_at(i) for i in range(first, len(self.options))]}
+
+    async def serve_connection(self, reader, writer):
+        # HTTP/1.1，支持 keep-alive，一个连接上可以连续发送多个请求
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    key, _, value = line.partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version == "HTTP/1.1")
+
+                status, result = 200, None
+                try:
+                    try:
+                        length = _check_request(method, headers)
+                    except HTTPError:
+                        # 请求体没有读出来，这个连接不能接着用
+                        keep_alive = False
+                        raise
+                    body = None
+                    if length:
+                        data = await reader.readexactly(length)
+                        try:
+                            body = json.loads(data)
+                        except ValueError:
+                            raise HTTPError(400, "请求体不是有效的 JSON")
+                    result = await self.handle(method, target, body)
+                except HTTPError as e:
+                    status, result = e.status, {"error": e.message}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as e:
+                    status, result = 500, {"error": str(e)}
+
+                payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(port=DEFAULT_PORT, path=DEFAULT_SAVE_PATH, ready=None):
+    # 启动服务并一直运行；ready(端口) 在开始监听后调用（port=0 时可以得到实际端口）
+    service = ChooserService(path)
+    server = await asyncio.start_server(service.serve_connection, "127.0.0.1", port, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+    if ready:
+        ready(port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    port = DEFAULT_PORT
+    path = DEFAULT_SAVE_PATH
+    while argv:
+        arg = argv.pop(0)
+        if arg == "--port" and argv and argv[0].isdigit():
+            port = int(argv.pop(0))
+        elif arg == "--dir" and argv:
+            path = argv.pop(0)
+        else:
+            print("用法: python chooser_server.py [--port 端口] [--dir 选项集目录]", file=sys.stderr)
+            return 2
+    try:
+        asyncio.run(serve(port, path,
+                          ready=lambda port: print(f"正在监听 http://127.0.0.1:{port}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+# 流式加载大型选项文件：在后台线程中逐块读取和解析，按批次交给界面，
+# 第一批选项几毫秒内就能显示出来，同时报告进度并支持取消。支持的格式：
+#   .json            {"options": [...], "weights": [...], "drawn": [...], "tags": {...}}，
+#                    分块解析，不会一次读入整个文件；接受的文件与 load_options_file() 完全相同
+#   .ndjson / .jsonl 每行一个 JSON：字符串，或 {"option": ..., "weight": ...}
+#   .rcb             二进制格式，内存映射后作为一个批次整体交出（见 chooser_binary.py）
+#   其他（.txt 等）  每行一个选项，忽略空行
+import json
+import math
+import os
+import queue
+import threading
+
+from chooser_engine import OptionFormatError, check_weight, check_weights, load_options_file
+from chooser_binary import is_binary_file, load_binary_drawn, load_binary_file, load_binary_tags
+
+BATCH_SIZE = 2000
+CHUNK_SIZE = 1 << 16
+
+LINE_FORMATS = (".ndjson", ".jsonl")
+
+
+class _JsonStream:
+    # 在分块读入的缓冲区上逐个解析 JSON 值，只保留尚未解析的部分
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # 跳过空白，返回下一个字符（文件结束时返回空字符串）
+        while True:
+            buffer = self.buffer
+            while self.pos < len(buffer) and buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(buffer):
+                return buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise OptionFormatError("文件格式不正确!")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise OptionFormatError("文件格式不正确!")
+                continue
+            # 数字等值可能恰好在缓冲区末尾被截断，需要读到分隔符才能确定
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise OptionFormatError("文件格式不正确!")
+
+    def object_items(self, keys=None):
+        # 依次产生 (键, 值的第一个字符)，调用者接着用 array_items()、object_items() 或 value() 读完这个值；
+        # 给出 keys 时其他键的值整体跳过
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            if keys is None or key in keys:
+                yield key, self.peek()
+            else:
+                self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise OptionFormatError("文件格式不正确!")
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _check_weights(weights):
+    try:
+        return check_weights(weights)
+    except ValueError:
+        raise OptionFormatError("文件格式不正确!")
+
+
+def _check_option(option):
+    if not isinstance(option, str):
+        raise OptionFormatError("文件格式不正确!")
+    return option
+
+
+def _ndjson_entries(f):
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            raise OptionFormatError("文件格式不正确!")
+        if isinstance(entry, dict):
+            try:
+                weight = check_weight(entry.get("weight", 1.0))
+            except (TypeError, ValueError):
+                raise OptionFormatError("文件格式不正确!")
+            yield _check_option(entry.get("option")), weight
+        else:
+            yield _check_option(entry), 1.0
+
+
+def _text_entries(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield line, 1.0
+
+
+def iter_option_events(f, filename, batch_size=BATCH_SIZE):
+    # 产生 ("options", 选项列表, 权重列表或 None) 和 ("weights", 起始下标, 权重列表) 事件；
+    # JSON 文件中有轮换记录时最后再产生一个 ("drawn", 下标列表, None)，
+    # 有标签时最后再产生一个 ("tags", {标签: 位图 bytes}, None)。
+    # 文件有问题时抛出 OptionFormatError（可能已经产生了一部分事件）
+    try:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == ".json":
+            yield from _json_events(_JsonStream(f), batch_size)
+            return
+        entries = _ndjson_entries(f) if ext in LINE_FORMATS else _text_entries(f)
+        for batch in _batches(entries, batch_size):
+            options = [option for option, _ in batch]
+            weights = [weight for _, weight in batch]
+            if all(w == 1.0 for w in weights):
+                weights = None
+            yield "options", options, weights
+    except (UnicodeDecodeError, RecursionError):
+        # 不是 UTF-8 文本，或 JSON 嵌套太深
+        raise OptionFormatError("文件格式不正确!")
+
+
+def _json_events(stream, batch_size):
+    # 与 load_options_file()、load_drawn() 和 load_tags() 接受同样的文件：顶层是对象，"options" 是字符串数组，
+    # "weights"（可以在 "options" 之前）与选项等长，"drawn" 和 "tags" 的值是下标数组，这三项可以为 null
+    count = None
+    weights = None
+    weight_count = None
+    weight_sums = []
+    drawn = None
+    tags = None
+    for key, char in stream.object_items(("options", "weights", "drawn", "tags")):
+        if char == "n" and key != "options":
+            if stream.value() is not None:
+                raise OptionFormatError("文件格式不正确!")
+            continue
+        # 重复的键没有办法在流式读取中按最后一个为准，按格式不正确处理
+        if char != ("{" if key == "tags" else "[") or key == "options" and count is not None \
+                or key == "weights" and weight_count is not None:
+            raise OptionFormatError("文件格式不正确!")
+        if key == "tags":
+            tags = {}
+            for name, value in stream.object_items():
+                if value != "[":
+                    raise OptionFormatError("文件格式不正确!")
+                tags[name] = list(stream.array_items())
+        elif key == "drawn":
+            drawn = list(stream.array_items())
+            if not all(isinstance(i, int) and 0 <= i for i in drawn):
+                raise OptionFormatError("文件格式不正确!")
+        elif key == "options":
+            count = 0
+            for batch in _batches(stream.array_items(), batch_size):
+                yield "options", [_check_option(o) for o in batch], None
+                count += len(batch)
+            if weights is not None:
+                # 权重写在选项之前时先读入，选项全部交出后再交出
+                if len(weights) != count:
+                    raise OptionFormatError("文件格式不正确!")
+                if weights:
+                    yield "weights", 0, weights
+        elif count is None:
+            weights = _check_weights(list(stream.array_items()))
+            weight_count = len(weights)
+        else:
+            weight_count = 0
+            for batch in _batches(stream.array_items(), batch_size):
+                if weight_count + len(batch) > count:
+                    raise OptionFormatError("文件格式不正确!")
+                batch = _check_weights(batch)
+                weight_sums.append(math.fsum(batch))
+                yield "weights", weight_count, batch
+                weight_count += len(batch)
+    if stream.peek() != "" or count is None:
+        raise OptionFormatError("文件格式不正确!")
+    # 分批检查过每批权重，总和也必须是有限的数
+    try:
+        total = math.fsum(weight_sums)
+    except OverflowError:
+        total = math.inf
+    if weight_count is not None and weight_count != count or not math.isfinite(total):
+        raise OptionFormatError("文件格式不正确!")
+    if drawn:
+        # 选项可能写在轮换记录之后，全部选项都交出后才交出轮换记录
+        yield "drawn", drawn, None
+    if tags:
+        from chooser_tags import check_tag, indices_to_bits
+        try:
+            yield "tags", {check_tag(name): indices_to_bits(indices, count)
+                           for name, indices in tags.items()}, None
+        except ValueError:
+            raise OptionFormatError("文件格式不正确!")
+
+
+def read_option_file(filename):
+    # 一次读入整个选项文件（支持上面列出的所有格式），返回 (选项, 权重列表或 None)
+    if os.path.splitext(filename)[1].lower() == ".json" or is_binary_file(filename):
+        return load_options_file(filename)
+    options = []
+    weights = []
+    weighted = False
+    with open(filename, "r", encoding="utf-8") as f:
+        for _, batch, batch_weights in iter_option_events(f, filename):
+            options.extend(batch)
+            if batch_weights is None:
+                weights.extend([1.0] * len(batch))
+            else:
+                weights.extend(batch_weights)
+                weighted = True
+    return options, weights if weighted else None
+
+
+def split_option_text(text, fmt="text"):
+    # 一次拆分粘贴、拖入或导入的文本，返回 (选项, 权重列表或 None)：去掉首尾空白、空行和
+    # 重复的选项（保留第一次出现的）。fmt="csv" 时第一列是选项，第二列（可选）是权重，
+    # 第一行的权重列不是数字时视为表头
+    if fmt != "csv":
+        return list(dict.fromkeys(filter(None, map(str.strip, text.splitlines())))), None
+    import csv
+    entries = {}
+    for row_number, row in enumerate(csv.reader(text.splitlines())):
+        option = row[0].strip() if row else ""
+        if not option or option in entries:
+            continue
+        weight = 1.0
+        if len(row) > 1 and row[1].strip():
+            try:
+                weight = check_weight(row[1])
+            except ValueError:
+                if row_number == 0:
+                    continue
+                raise OptionFormatError("文件格式不正确!")
+        entries[option] = weight
+    weights = list(entries.values())
+    return list(entries), weights if any(w != 1.0 for w in weights) else None
+
+
+def read_import_file(filename):
+    # 读取要追加到列表中的文件：.csv 和 .txt 按 split_option_text() 拆分，其他格式见 read_option_file()
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".csv", ".txt"):
+        with open(filename, "r", encoding="utf-8-sig") as f:
+            return split_option_text(f.read(), "csv" if ext == ".csv" else "text")
+    return read_option_file(filename)
+
+
+class StreamingLoader:
+    # 后台线程读取文件，界面线程定时调用 poll() 取回事件：
+    #   ("options", 选项列表, 权重列表或 None)
+    #   ("weights", 起始下标, 权重列表)
+    #   ("drawn", 轮换中本轮已抽中的下标列表, None)
+    #   ("tags", {标签: 位图 bytes}, None)
+    #   ("done", 选项总数)
+    #   ("error", 异常)
+    # 队列有上限，界面来不及处理时后台线程会暂停读取，内存占用不会无限增长。
+    # start() 在新线程中读取；也可以在其他工作线程（例如 Qt 的线程池）中直接调用 run()，
+    # 这时 notify() 在每个事件放入队列后调用，用来通知界面线程取回
+    def __init__(self, filename, batch_size=BATCH_SIZE, max_pending=64, notify=None):
+        self.filename = filename
+        self.notify = notify
+        self.batch_size = batch_size
+        self.events = queue.Queue(maxsize=max_pending)
+        self.cancelled = threading.Event()
+        self.progress = 0.0
+        self.count = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _put(self, event):
+        while not self.cancelled.is_set():
+            try:
+                self.events.put(event, timeout=0.1)
+                if self.notify is not None:
+                    self.notify()
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            if is_binary_file(self.filename):
+                # 内存映射几乎不花时间，选项在显示或被抽中时才解码
+                options, weights = load_binary_file(self.filename)
+                self.count = len(options)
+                self.progress = 1.0
+                drawn = load_binary_drawn(self.filename)
+                tags = load_binary_tags(self.filename)
+                if not self._put(("options", options, weights)):
+                    return
+                if drawn and not self._put(("drawn", drawn, None)):
+                    return
+                if tags and not self._put(("tags", tags, None)):
+                    return
+                # 选项先交给界面显示，再在这个线程中检查一遍，文件损坏时报告错误
+                if not options.check(self.cancelled.is_set):
+                    return
+                self._put(("done", self.count))
+                return
+            size = os.path.getsize(self.filename) or 1
+            with open(self.filename, "r", encoding="utf-8") as f:
+                for event in iter_option_events(f, self.filename, self.batch_size):
+                    self.progress = min(1.0, f.buffer.tell() / size)
+                    if event[0] == "options":
+                        self.count += len(event[1])
+                    if not self._put(event):
+                        return
+            self.progress = 1.0
+            self._put(("done", self.count))
+        except Exception as e:
+            self._put(("error", e))
+
+    def poll(self, max_events=16):
+        # 取回最多 max_events 个事件，不会阻塞
+        events = []
+        while len(events) < max_events:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] in ("done", "error"):
+                self.finished = True
+            events.append(event)
+        return events
@@ -0,0 +1,429 @@
+# 选项标签：每个标签一个位图（bitset）索引，按标签组合抽取时直接对位图做与、非运算，不扫描选项列表。
+#
+# 位图的第 i 位表示存储中第 i 个选项有没有这个标签（字节内低位在前）。每个标签的位图是一个 bytearray，
+# 打标签、去标签和跟随选项存储的「交换删除」都是 O(1)；查询时把位图转换成 Python 整数（按标签缓存，
+# 修改后才重新转换），百万个选项的一次与运算只要几十微秒，几十个标签组合起来也在毫秒以内。
+# 查询结果是 BitSubset：支持 len、下标、迭代和 in，可以直接作为 Chooser、Rotation 和审计抽取的 subset。
+#
+# 标签条件（parse_query）：空格分隔，不带前缀的标签都要有，前面加 "-" 或 "!" 的标签都不能有，例如
+#   素食 -本周吃过
+# 也可以写成 "素食 AND NOT 本周吃过"（AND 和 NOT 不区分大小写）。
+#
+# 文件中的格式：JSON 文件的可选键 "tags": {"标签": [选项下标, ...]}，旧版本程序会忽略这个键；
+# .rcb 文件在末尾追加标签记录（见 chooser_binary.py）。保存函数接收、读取函数返回的都是 {标签: 位图 bytes}，
+# 和 JSON 中下标列表之间的转换用 bits_to_indices() / indices_to_bits()
+from bisect import bisect_right
+from collections.abc import Sequence
+
+# BitSubset 按块记录置位的累计个数，取第 r 个下标时先找到块，再在块内二分
+BLOCK_BITS = 1 << 16
+
+# 字节值 -> 其中置位的位置
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def check_tag(name):
+    # 标签不能为空、不能含空白，不能以 "-" 或 "!" 开头（在条件中表示「没有这个标签」），也不能是 AND 或 NOT
+    if (not isinstance(name, str) or not name or name[0] in "-!" or any(c.isspace() for c in name)
+            or name.upper() in ("AND", "NOT")):
+        raise ValueError(f"无效的标签: {name!r}")
+    return name
+
+
+def parse_query(text):
+    # 返回 (必须有的标签列表, 不能有的标签列表)
+    all_of, none_of = [], []
+    negate = False
+    for word in text.split():
+        keyword = word.upper()
+        if keyword == "AND":
+            continue
+        if keyword == "NOT":
+            negate = not negate
+            continue
+        if word[0] in "-!" and len(word) > 1:
+            negate, word = not negate, word[1:]
+        (none_of if negate else all_of).append(word)
+        negate = False
+    return all_of, none_of
+
+
+def parse_tags(text):
+    # 编辑标签时输入的文字：空格或逗号分隔的标签，去掉重复的
+    return list(dict.fromkeys(check_tag(word) for word in text.replace(",", " ").replace("，", " ").split()))
+
+
+def bits_to_indices(bits):
+    # 位图 -> 置位的下标列表（升序）
+    result = []
+    for i, byte in enumerate(bits):
+        if byte:
+            base = i << 3
+            result.extend(base + bit for bit in _BYTE_BITS[byte])
+    return result
+
+
+def indices_to_bits(indices, count):
+    # 下标列表 -> 位图；下标不是 [0, count) 中的整数时抛出 ValueError
+    bits = bytearray((count + 7) >> 3)
+    for i in indices:
+        if not isinstance(i, int) or not 0 <= i < count:
+            raise ValueError(f"无效的选项下标: {i!r}")
+        bits[i >> 3] |= 1 << (i & 7)
+    return bytes(bits)
+
+
+def load_tags(filename, count):
+    # 读取选项文件中保存的标签，返回 {标签: 位图 bytes}；只有 JSON 和 .rcb 格式有标签，其他格式返回空字典
+    import os
+    from chooser_binary import is_binary_file, load_binary_tags
+    if is_binary_file(filename):
+        return load_binary_tags(filename)
+    if os.path.splitext(filename)[1].lower() != ".json":
+        return {}
+    from chooser_engine import load_json_data
+    return tags_from_json(load_json_data(filename), count)
+
+
+def tags_from_json(data, count):
+    # 从 chooser_engine.load_json_data() 读入的内容中取出标签
+    from chooser_engine import OptionFormatError
+    tags = data.get("tags") if isinstance(data, dict) else None
+    if tags is None:
+        return {}
+    try:
+        if not isinstance(tags, dict) or not all(isinstance(indices, list) for indices in tags.values()):
+            raise ValueError("无效的标签")
+        return {check_tag(name): indices_to_bits(indices, count) for name, indices in tags.items()}
+    except (TypeError, ValueError):
+        raise OptionFormatError("文件格式不正确!")
+
+
+class BitSubset(Sequence):
+    # 用一个整数位图表示的存储下标集合，按下标升序：len 为置位的个数，第 r 项是第 r 个置位的下标
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+        self._len = bits.bit_count()
+        self._data = None
+        self._blocks = None
+
+    def __len__(self):
+        return self._len
+
+    def _bytes(self):
+        if self._data is None:
+            self._data = self.bits.to_bytes((self.size + 7) >> 3, "little")
+        return self._data
+
+    def _block_starts(self):
+        # 第 k 项是第 k 块之前的置位个数
+        if self._blocks is None:
+            data = self._bytes()
+            step = BLOCK_BITS >> 3
+            starts = [0]
+            for offset in range(0, len(data), step):
+                starts.append(starts[-1] + int.from_bytes(data[offset:offset + step], "little").bit_count())
+            self._blocks = starts
+        return self._blocks
+
+    def __getitem__(self, r):
+        if isinstance(r, slice):
+            return [self[i] for i in range(*r.indices(self._len))]
+        if r < 0:
+            r += self._len
+        if not 0 <= r < self._len:
+            raise IndexError("下标超出范围")
+        starts = self._block_starts()
+        block = bisect_right(starts, r) - 1
+        r -= starts[block]
+        step = BLOCK_BITS >> 3
+        word = int.from_bytes(self._bytes()[block * step:(block + 1) * step], "little")
+        # 在块内二分：低半部分的置位不少于 r + 1 个时目标在低半部分，否则在高半部分
+        position = block * BLOCK_BITS
+        width = BLOCK_BITS
+        while width > 8:
+            width >>= 1
+            low = word & ((1 << width) - 1)
+            count = low.bit_count()
+            if r < count:
+                word = low
+            else:
+                r -= count
+                word >>= width
+                position += width
+        return position + _BYTE_BITS[word][r]
+
+    def __iter__(self):
+        for i, byte in enumerate(self._bytes()):
+            if byte:
+                base = i << 3
+                for bit in _BYTE_BITS[byte]:
+                    yield base + bit
+
+    def __contains__(self, index):
+        if not isinstance(index, int) or not 0 <= index < self.size:
+            return False
+        return bool(self._bytes()[index >> 3] >> (index & 7) & 1)
+
+    def restrict(self, indices):
+        # 只保留 indices（升序的存储下标列表，例如筛选结果）中有的下标，返回列表
+        data = self._bytes()
+        size = self.size
+        return [i for i in indices if i < size and data[i >> 3] >> (i & 7) & 1]
+
+
+class TagIndex:
+    # 选项存储的标签索引：订阅存储的修改，让每个标签的位图始终与选项的下标对应。
+    # 直接修改标签时通知订阅者 callback(event, value)（存储的修改引起的位图变化不通知）：
+    #   "option"  第 value 个选项的标签变了
+    #   "tags"    value 中这些标签的位图整体变了
+    #   "all"     全部标签整体替换（value 为 None）
+    def __init__(self, store):
+        self.store = store
+        # 标签 -> 位图；位图可以比选项数短，缺少的部分都是 0
+        self._bits = {}
+        # 标签 -> 位图对应的整数，修改后删除
+        self._ints = {}
+        self._listeners = []
+        store.subscribe(self._on_store_changed)
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, event, value=None):
+        for callback in list(self._listeners):
+            callback(event, value)
+
+    def __len__(self):
+        return len(self._bits)
+
+    def __contains__(self, name):
+        return name in self._bits
+
+    def names(self):
+        # 用过的标签（删除选项后可能已经没有选项带有其中的某些标签）
+        return sorted(self._bits)
+
+    def count(self, name):
+        # 有这个标签的选项数
+        bits = self._bits.get(name)
+        if bits is None:
+            return 0
+        return self._int(name).bit_count()
+
+    def has(self, index, name):
+        bits = self._bits.get(name)
+        return bits is not None and (index >> 3) < len(bits) and bool(bits[index >> 3] >> (index & 7) & 1)
+
+    def tags_of(self, index):
+        byte, mask = index >> 3, 1 << (index & 7)
+        return sorted(name for name, bits in self._bits.items() if byte < len(bits) and bits[byte] & mask)
+
+    def _check_index(self, index):
+        if not 0 <= index < len(self.store):
+            raise IndexError("选项下标超出范围")
+
+    def _set(self, name, index):
+        bits = self._bits.get(name)
+        if bits is None:
+            bits = self._bits[name] = bytearray()
+        byte = index >> 3
+        if byte >= len(bits):
+            bits.extend(bytes(byte + 1 - len(bits)))
+        bits[byte] |= 1 << (index & 7)
+        self._ints.pop(name, None)
+
+    def _clear(self, name, index):
+        bits = self._bits.get(name)
+        byte = index >> 3
+        if bits is not None and byte < len(bits) and bits[byte] >> (index & 7) & 1:
+            bits[byte] &= ~(1 << (index & 7)) & 0xFF
+            self._ints.pop(name, None)
+
+    def _prune(self, names):
+        # 不再有任何选项的标签直接删除
+        for name in names:
+            bits = self._bits.get(name)
+            if bits is not None and bits.count(0) == len(bits):
+                del self._bits[name]
+                self._ints.pop(name, None)
+
+    def tag(self, index, name):
+        self._check_index(index)
+        self._set(check_tag(name), index)
+        self._notify("option", index)
+
+    def untag(self, index, name):
+        self._check_index(index)
+        self._clear(name, index)
+        self._prune([name])
+        self._notify("option", index)
+
+    def set_tags(self, index, names):
+        # 把第 index 个选项的标签整体换成 names
+        self._check_index(index)
+        names = [check_tag(name) for name in names]
+        old = self.tags_of(index)
+        for name in old:
+            if name not in names:
+                self._clear(name, index)
+        for name in names:
+            self._set(name, index)
+        self._prune(old)
+        self._notify("option", index)
+
+    def update(self, indices=None, add=(), remove=()):
+        # 批量给 indices（存储下标，None 表示全部选项）加上 add 中的标签、去掉 remove 中的标签：
+        # 先把 indices 转换成一个位图，每个标签只做一次或运算 / 与非运算
+        add = [check_tag(name) for name in add]
+        count = len(self.store)
+        if indices is None:
+            mask = (1 << count) - 1
+        else:
+            try:
+                mask = int.from_bytes(indices_to_bits(indices, count), "little")
+            except ValueError:
+                raise IndexError("选项下标超出范围")
+        size = (count + 7) >> 3
+        for name in add:
+            value = (self._int(name) if name in self._bits else 0) | mask
+            self._bits[name] = bytearray(value.to_bytes(size, "little"))
+            self._ints[name] = value
+        for name in remove:
+            if name in self._bits and name not in add:
+                value = self._int(name) & ~mask
+                if value:
+                    self._bits[name] = bytearray(value.to_bytes(size, "little"))
+                    self._ints[name] = value
+                else:
+                    del self._bits[name]
+                    self._ints.pop(name, None)
+        self._notify("tags", add + [name for name in remove if name not in add])
+
+    def load(self, tags):
+        # 整体替换为从文件读出的 {标签: 位图}；超出选项数的位被忽略
+        count = len(self.store)
+        self._bits = {}
+        self._ints = {}
+        size = (count + 7) >> 3
+        for name, data in tags.items():
+            bits = bytearray(data[:size])
+            if count & 7 and len(bits) == size:
+                bits[-1] &= (1 << (count & 7)) - 1
+            if bits.count(0) != len(bits):
+                self._bits[check_tag(name)] = bits
+        self._notify("all")
+        return len(self._bits)
+
+    def snapshot(self):
+        # 当前全部标签的位图副本 {标签: bytes}，可以交给后台线程保存；删除选项后不再有选项的标签不保存
+        return {name: bytes(bits) for name, bits in sorted(self._bits.items()) if bits.count(0) != len(bits)}
+
+    def bitmaps(self, names):
+        # 这些标签当前位图的副本 {标签: bytes，没有这个标签时为 None}，交给 set_bitmaps() 可以恢复
+        return {name: bytes(self._bits[name]) if name in self._bits else None for name in names}
+
+    def set_bitmaps(self, bitmaps):
+        # 把 bitmaps 中的标签换成给出的位图（None 表示去掉这个标签），返回原来的位图副本
+        old = self.bitmaps(bitmaps)
+        for name, data in bitmaps.items():
+            self._ints.pop(name, None)
+            if data is None:
+                self._bits.pop(name, None)
+            else:
+                self._bits[name] = bytearray(data)
+        self._notify("tags", list(bitmaps))
+        return old
+
+    def state(self):
+        # 当前的全部位图（不复制）：选项整体替换时会换上新的字典，取出的状态之后不会再被修改
+        return self._bits, self._ints
+
+    def set_state(self, state):
+        # 放回 state() 取出的状态，选项也必须已经换回取出时的那一份
+        self._bits, self._ints = state
+        self._notify("all")
+
+    def _int(self, name):
+        value = self._ints.get(name)
+        if value is None:
+            value = self._ints[name] = int.from_bytes(self._bits[name], "little")
+        return value
+
+    def query(self, all_of=(), none_of=()):
+        # 有 all_of 中所有标签、没有 none_of 中任何标签的选项，返回 BitSubset；
+        # 只对位图做与、非运算，耗时与选项数 / 64 和标签数成正比
+        size = len(self.store)
+        if all_of:
+            if any(name not in self._bits for name in all_of):
+                return BitSubset(0, size)
+            bits = self._int(all_of[0])
+            for name in all_of[1:]:
+                bits &= self._int(name)
+        else:
+            bits = (1 << size) - 1
+        for name in none_of:
+            if bits and name in self._bits:
+                bits &= ~self._int(name)
+        return BitSubset(bits, size)
+
+    def select(self, text, indices=None):
+        # 按标签条件文字查询；给出 indices（筛选结果）时只保留其中的下标，返回列表
+        subset = self.query(*parse_query(text))
+        if indices is not None:
+            return subset.restrict(indices)
+        return subset
+
+    def _on_store_changed(self, event, index, count):
+        if event == "swap_remove":
+            # 原来的最后一项（下标 last）移到了 index：每个标签把第 last 位移到第 index 位
+            last = len(self.store)
+            last_byte, last_mask = last >> 3, 1 << (last & 7)
+            byte, mask = index >> 3, 1 << (index & 7)
+            for name, bits in self._bits.items():
+                moved = last_byte < len(bits) and bits[last_byte] & last_mask
+                if moved:
+                    bits[last_byte] &= ~last_mask & 0xFF
+                if index != last:
+                    if moved:
+                        bits[byte] |= mask
+                    elif byte < len(bits) and bits[byte] & mask:
+                        bits[byte] &= ~mask & 0xFF
+                    else:
+                        continue
+                elif not moved:
+                    continue
+                self._ints.pop(name, None)
+        elif event == "swap_insert":
+            # 原来在 index 的选项移到了末尾（下标 last）：每个标签把第 index 位移到第 last 位，放回的选项没有标签
+            last = len(self.store) - 1
+            last_byte, last_mask = last >> 3, 1 << (last & 7)
+            byte, mask = index >> 3, 1 << (index & 7)
+            for name, bits in self._bits.items():
+                if byte < len(bits) and bits[byte] & mask:
+                    bits[byte] &= ~mask & 0xFF
+                    if last_byte >= len(bits):
+                        bits.extend(bytes(last_byte + 1 - len(bits)))
+                    bits[last_byte] |= last_mask
+                    self._ints.pop(name, None)
+        elif event == "truncate":
+            # 去掉第 index 位及之后的位
+            size = (index + 7) >> 3
+            tail = (1 << (index & 7)) - 1
+            for name, bits in self._bits.items():
+                changed = len(bits) > size
+                if changed:
+                    del bits[size:]
+                if index & 7 and len(bits) == size and bits[-1] & ~tail:
+                    bits[-1] &= tail
+                    changed = True
+                if changed:
+                    self._ints.pop(name, None)
+        elif event == "reset":
+            # 整体替换选项（加载、清空）时标签一并清空，加载的文件中有标签时再由 load() 读入
+            self._bits = {}
+            self._ints = {}
@@ -0,0 +1,175 @@
+# 按权重随机选择：
+#   AliasTable    Vose 别名表，构建 O(n)，每次抽取 O(1)
+#   FenwickTree   树状数组，修改、追加权重和抽取都是 O(log n)
+#   WeightedSampler 跟随 OptionStore 的变化自动在两者之间切换
+
+
+class AliasTable:
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if n == 0 or total <= 0:
+            raise ValueError("所有选项的权重都为 0")
+
+        scaled = [w * n / total for w in weights]
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # 剩下的槽位由于浮点误差接近 1，直接视为 1
+
+        self.n = n
+        self.prob = prob
+        self.alias = alias
+
+    def __len__(self):
+        return self.n
+
+    def sample(self, rng):
+        # 只用一个随机数：整数部分选槽位，小数部分决定是否走别名
+        u = rng.random() * self.n
+        i = int(u)
+        if i == self.n:
+            i -= 1
+        return i if u - i < self.prob[i] else self.alias[i]
+
+
+class FenwickTree:
+    def __init__(self, weights=()):
+        # 线性时间构建
+        tree = [0.0]
+        tree.extend(float(w) for w in weights)
+        n = len(tree) - 1
+        for i in range(1, n + 1):
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.tree) - 1
+
+    def prefix_sum(self, count):
+        # 前 count 个权重之和
+        total = 0.0
+        tree = self.tree
+        while count > 0:
+            total += tree[count]
+            count -= count & -count
+        return total
+
+    def total(self):
+        return self.prefix_sum(len(self))
+
+    def get(self, index):
+        return self.prefix_sum(index + 1) - self.prefix_sum(index)
+
+    def add(self, index, delta):
+        tree = self.tree
+        i = index + 1
+        n = len(tree) - 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def set(self, index, weight):
+        self.add(index, weight - self.get(index))
+
+    def append(self, weight):
+        # 新节点 i 覆盖区间 (i - lowbit(i), i]
+        i = len(self.tree)
+        self.tree.append(float(weight) + self.prefix_sum(i - 1) - self.prefix_sum(i - (i & -i)))
+
+    def pop(self):
+        # 最后一个节点不被其他节点覆盖，直接去掉即可
+        self.tree.pop()
+
+    def find(self, target):
+        # 找到前缀和第一次超过 target 的位置（权重为 0 的选项不会被选中）
+        tree = self.tree
+        n = len(tree) - 1
+        pos = 0
+        mask = 1 << n.bit_length()
+        while mask:
+            nxt = pos + mask
+            if nxt <= n and tree[nxt] <= target:
+                target -= tree[nxt]
+                pos = nxt
+            mask >>= 1
+        return pos
+
+    def sample(self, rng):
+        total = self.total()
+        if total <= 0:
+            raise ValueError("所有选项的权重都为 0")
+        index = self.find(rng.random() * total)
+        # 浮点误差可能越界，或者落到末尾权重为 0 的选项上
+        while index >= len(self) or self.get(index) <= 0:
+            index = self.find(rng.random() * total)
+        return index
+
+
+class WeightedSampler:
+    # 订阅 OptionStore 的变化：
+    # - 权重修改、追加和删除选项（以及撤销这些操作）时增量更新树状数组（O(log n)），并作废别名表
+    # - 连续抽取足够多次没有变化后，再用 O(n) 重建别名表，之后每次抽取 O(1)
+    # 这样频繁修改权重时不会反复重建，权重稳定后抽取又是常数时间
+    ALIAS_AMORTIZE = 8
+
+    def __init__(self, store):
+        self.store = store
+        self._alias = None
+        self._fenwick = None
+        self._draws_since_change = 0
+        store.subscribe(self._on_store_changed)
+
+    def _on_store_changed(self, event, index, count):
+        self._alias = None
+        self._draws_since_change = 0
+        fenwick = self._fenwick
+        if fenwick is None:
+            return
+        if event == "insert" and index == len(fenwick):
+            for i in range(index, index + count):
+                fenwick.append(self.store.weight(i))
+        elif event == "update":
+            for i in range(index, index + count):
+                fenwick.set(i, self.store.weight(i))
+        elif event == "swap_remove" and len(fenwick) == len(self.store) + 1:
+            # 最后一项已经移到 index
+            if index < len(self.store):
+                fenwick.set(index, self.store.weight(index))
+            fenwick.pop()
+        elif event == "swap_insert" and len(fenwick) == len(self.store) - 1:
+            # index 处的权重移到了末尾，index 处换成放回的选项的权重
+            fenwick.append(self.store.weight(len(self.store) - 1))
+            fenwick.set(index, self.store.weight(index))
+        elif event == "truncate" and len(fenwick) == len(self.store) + count:
+            for _ in range(count):
+                fenwick.pop()
+        else:
+            # 整体替换后下次抽取时重新构建
+            self._fenwick = None
+
+    def sample(self, rng):
+        if self._alias is not None:
+            return self._alias.sample(rng)
+
+        self._draws_since_change += 1
+        if self._draws_since_change * self.ALIAS_AMORTIZE >= len(self.store):
+            self._alias = AliasTable(self.store.weights())
+            return self._alias.sample(rng)
+
+        if self._fenwick is None:
+            self._fenwick = FenwickTree(self.store.weights())
+        return self._fenwick.sample(rng)
@@ -1,8 +1,382 @@
-import tkinter as tk
-from tkinter import messagebox, filedialog
-import random
-import json
 import os
+import sys
+
+# --headless：在命令行中批量抽取（见 chooser_cli.py）；
+# --serve：启动本地 HTTP 抽取服务（见 chooser_server.py）。两者都不导入 tkinter
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    from chooser_cli import main
+    sys.exit(main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+if __name__ == "__main__" and "--serve" in sys.argv[1:]:
+    from chooser_server import main
+    sys.exit(main([arg for arg in sys.argv[1:] if arg != "--serve"]))
+
+import tkinter as tk
+from tkinter import messagebox, filedialog, simpledialog
+from chooser_engine import (OptionStore, Chooser, OptionFormatError, ensure_save_path,
+                            save_options_file, option_label)
+from chooser_filter import OptionFilter
+from chooser_audit import AUDIT_FILENAME, AuditLog, DrawAuditor, session_stream
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex, bits_to_indices, check_tag, parse_query, parse_tags
+from chooser_history import History
+from chooser_animation import FRAME_COUNT, SpinAnimation
+from chooser_profile import HEARTBEAT_MS, PROFILER, timed
+
+# 启动时只导入画出窗口需要的模块；读取文件（chooser_stream）、查找选项集（chooser_catalog）
+# 和自动保存（chooser_journal）的模块在第一次用到时才导入
+
+# 后台加载时检查新批次的间隔（毫秒）
+LOAD_POLL_MS = 10
+
+class VirtualOptionList(tk.Frame):
+    # 虚拟化的选项列表：只为可见的行创建卡片控件，滚动时复用这些控件，
+    # 因此无论有多少选项，每次添加、滚动和删除的控件开销都是固定的。
+    # 给出 tags（chooser_tags.TagIndex）时每行附上选项的标签，options 为筛选结果（OptionFilter）
+    ROW_HEIGHT = 46
+    
+    def __init__(self, master, options, on_delete, on_activate=None, on_context=None, tags=None):
+        super().__init__(master, bg="white", bd=0)
+        self.options = options
+        self.on_delete = on_delete
+        self.on_activate = on_activate
+        self.on_context = on_context
+        self.tags = tags
+        self.first = 0
+        self.cards = []
+        self.batching = False
+        # 选项变化时只刷新可见行；batch() 期间的变化最后只刷新一次
+        self.options.subscribe(lambda event, index, count: self.batching or self.refresh())
+        
+        self.body = tk.Frame(self, bg="white", bd=0)
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        # 窗口大小变化时调整卡片池的大小
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+    
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", lambda e: self.yview("scroll", -1, "units"))
+        widget.bind("<Button-5>", lambda e: self.yview("scroll", 1, "units"))
+    
+    def _create_card(self, slot):
+        # 创建选项卡片框架
+        option_card = tk.Frame(self.body, bg="white", padx=10, pady=5)
+        
+        # 添加选项文本
+        option_label = tk.Label(option_card, font=("微软雅黑", 12),
+                              bg="white", fg="#333333", anchor="w", padx=12)
+        option_label.pack(side="left", fill="x", expand=True)
+        
+        # 添加删除按钮，点击时按卡片当前显示的行号删除
+        delete_btn = tk.Button(option_card, text="×", font=("微软雅黑", 11),
+                             bg="white", fg="#666666", bd=0,
+                             activebackground="#ff4444", activeforeground="white",
+                             command=lambda s=slot: self._on_delete_click(s))
+        delete_btn.pack(side="right")
+        
+        # 设置卡片样式（每个卡片只绑定一次）
+        option_card.bind("<Enter>", lambda e, card=option_card: self._on_card_enter(card))
+        option_card.bind("<Leave>", lambda e, card=option_card: self._on_card_leave(card))
+        # 双击卡片（例如修改权重），右键单击（例如编辑标签）
+        for widget in (option_card, option_label):
+            widget.bind("<Double-Button-1>", lambda e, s=slot: self._on_activate_click(s))
+            widget.bind("<Button-3>", lambda e, s=slot: self._on_context_click(s))
+        for widget in (option_card, option_label, delete_btn):
+            self._bind_wheel(widget)
+        
+        return option_card, option_label
+    
+    def _on_resize(self, event):
+        visible = max(1, event.height // self.ROW_HEIGHT + 1)
+        while len(self.cards) < visible:
+            self.cards.append(self._create_card(len(self.cards)))
+        while len(self.cards) > visible:
+            card, _ = self.cards.pop()
+            card.destroy()
+        self.refresh()
+    
+    @timed()
+    def _on_card_enter(self, card):
+        card.configure(bg="#f5f5f5")
+        for widget in card.winfo_children():
+            widget.configure(bg="#f5f5f5")
+    
+    @timed()
+    def _on_card_leave(self, card):
+        card.configure(bg="white")
+        for widget in card.winfo_children():
+            widget.configure(bg="white")
+    
+    def _on_delete_click(self, slot):
+        index = self.first + slot
+        if index < len(self.options):
+            self.on_delete(index)
+    
+    def _on_activate_click(self, slot):
+        index = self.first + slot
+        if self.on_activate and index < len(self.options):
+            self.on_activate(index)
+    
+    def _on_context_click(self, slot):
+        index = self.first + slot
+        if self.on_context and index < len(self.options):
+            self.on_context(index)
+    
+    def _on_wheel(self, event):
+        self.yview("scroll", -1 if event.delta > 0 else 1, "units")
+    
+    def _page_size(self):
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+    
+    def yview(self, *args):
+        # 实现滚动条协议（moveto / scroll），只移动首个可见行
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.options)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._page_size()
+            self.scroll_to(self.first + step)
+    
+    def scroll_to(self, index):
+        self.first = max(0, min(index, len(self.options) - self._page_size()))
+        self.refresh()
+    
+    def see(self, index):
+        # 滚动到能看到指定行的位置
+        page = self._page_size()
+        if index < self.first:
+            self.scroll_to(index)
+        elif index >= self.first + page:
+            self.scroll_to(index - page + 1)
+        else:
+            self.refresh()
+    
+    def batch(self, func, *args):
+        # 执行 func（例如撤销、重做）期间不管发生多少次修改，结束后只刷新一次
+        self.batching = True
+        try:
+            return func(*args)
+        finally:
+            self.batching = False
+            self.refresh()
+    
+    @timed("list_refresh")
+    def refresh(self):
+        # 把可见的行绑定到卡片池中的控件上，耗时只与可见行数有关
+        total = len(self.options)
+        self.first = max(0, min(self.first, total - self._page_size()))
+        for slot, (card, label) in enumerate(self.cards):
+            index = self.first + slot
+            if index < total:
+                tags = self.tags.tags_of(self.options.source_index(index)) if self.tags is not None else ()
+                label.configure(text=option_label(self.options[index], self.options.weight(index), tags))
+                card.place(x=5, y=slot * self.ROW_HEIGHT + 3, relwidth=1, width=-10,
+                           height=self.ROW_HEIGHT - 6)
+            else:
+                card.place_forget()
+        
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + len(self.cards)) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+class CatalogSearchWindow(tk.Toplevel):
+    # 在 saved_options 目录的索引中边输入边查找选项集，双击结果加载
+    def __init__(self, master, catalog, on_open):
+        super().__init__(master)
+        self.title("查找选项集")
+        self.geometry("520x420")
+        self.configure(bg="#f0f0f0")
+        self.catalog = catalog
+        self.on_open = on_open
+        self.results = []
+        self.refreshed = False
+        
+        self.query_var = tk.StringVar()
+        self.query_var.trace_add("write", lambda *args: self.search())
+        query_entry = tk.Entry(self, textvariable=self.query_var, font=("微软雅黑", 13))
+        query_entry.pack(fill="x", padx=10, pady=10)
+        query_entry.focus_set()
+        
+        self.results_listbox = tk.Listbox(self, font=("微软雅黑", 11), selectbackground="#a6d4fa")
+        self.results_listbox.pack(fill="both", expand=True, padx=10)
+        self.results_listbox.bind("<Double-Button-1>", lambda event: self.open_selected())
+        self.results_listbox.bind("<Return>", lambda event: self.open_selected())
+        
+        self.status_var = tk.StringVar(value="正在更新索引...")
+        status_label = tk.Label(self, textvariable=self.status_var, font=("微软雅黑", 9),
+                                bg="#f0f0f0", anchor="w")
+        status_label.pack(fill="x", padx=10, pady=5)
+        
+        # 在后台线程中增量刷新索引，完成后重新查找
+        catalog.refresh_async(on_done=self._on_refreshed)
+        self.after(100, self._check_refreshed)
+    
+    def _on_refreshed(self):
+        # 在后台线程中调用，只设置标志，由界面线程检查
+        self.refreshed = True
+    
+    def _check_refreshed(self):
+        if not self.winfo_exists():
+            return
+        if self.refreshed:
+            self.search()
+        else:
+            self.after(100, self._check_refreshed)
+    
+    def search(self):
+        self.results = self.catalog.search(self.query_var.get())
+        self.results_listbox.delete(0, tk.END)
+        for match in self.results:
+            text = f"{match.name}  ({match.count} 个选项)"
+            if match.matches:
+                text += "  匹配: " + ", ".join(match.matches)
+            self.results_listbox.insert(tk.END, text)
+        
+        state = "" if self.refreshed else "正在更新索引... | "
+        self.status_var.set(f"{state}已索引 {len(self.catalog.files)} 个选项集 | 找到 {len(self.results)} 个")
+    
+    def open_selected(self):
+        selection = self.results_listbox.curselection()
+        if selection:
+            self.on_open(self.results[selection[0]].name)
+            self.destroy()
+
+
+class BulkImportWindow(tk.Toplevel):
+    # 批量导入：粘贴多行文本（每行一个选项，CSV 格式时第一列为选项、第二列为权重），
+    # 或选择文本 / CSV 文件，一次追加到列表中。标准库的 tkinter 不支持拖放文件，这里用文件对话框代替
+    def __init__(self, master, on_import_text, on_import_file):
+        super().__init__(master)
+        self.title("批量导入")
+        self.geometry("520x420")
+        self.configure(bg="#f0f0f0")
+        self.on_import_text = on_import_text
+        self.on_import_file = on_import_file
+        
+        hint_label = tk.Label(self, text="每行一个选项，重复的选项和空行会被忽略", font=("微软雅黑", 10),
+                              bg="#f0f0f0", anchor="w")
+        hint_label.pack(fill="x", padx=10, pady=(10, 0))
+        
+        self.text = tk.Text(self, font=("微软雅黑", 11), undo=False)
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        self.text.focus_set()
+        
+        buttons_frame = tk.Frame(self, bg="#f0f0f0")
+        buttons_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
+        self.csv_var = tk.BooleanVar(value=False)
+        csv_check = tk.Checkbutton(buttons_frame, text="CSV 格式（选项,权重）", font=("微软雅黑", 10),
+                                   variable=self.csv_var, bg="#f0f0f0", activebackground="#f0f0f0")
+        csv_check.pack(side="left")
+        
+        import_button = tk.Button(buttons_frame, text="导入", font=("微软雅黑", 10),
+                                  command=self.import_text, bg="#4CAF50", fg="white",
+                                  activebackground="#45a049", activeforeground="white", width=8)
+        import_button.pack(side="right", padx=5)
+        
+        file_button = tk.Button(buttons_frame, text="从文件导入...", font=("微软雅黑", 10),
+                                command=self.import_file, bg="#607d8b", fg="white",
+                                activebackground="#455a64", activeforeground="white")
+        file_button.pack(side="right", padx=5)
+    
+    def import_text(self):
+        if self.on_import_text(self.text.get("1.0", "end"), "csv" if self.csv_var.get() else "text"):
+            self.destroy()
+    
+    def import_file(self):
+        filename = filedialog.askopenfilename(
+            parent=self,
+            title="导入选项",
+            filetypes=[("文本和 CSV 文件", "*.txt *.csv"), ("选项文件", "*.json *.rcb *.ndjson *.jsonl")]
+        )
+        if filename and self.on_import_file(filename):
+            self.destroy()
+
+
+class ProfilerWindow(tk.Toplevel):
+    # 性能记录（见 chooser_profile.py）：开关、查看每种操作的耗时统计、导出和用 cProfile 分析下一次操作
+    def __init__(self, master, on_toggle, on_profiled):
+        super().__init__(master)
+        self.title("性能记录")
+        self.geometry("640x420")
+        self.configure(bg="#f0f0f0")
+        self.on_toggle = on_toggle
+        self.on_profiled = on_profiled
+        
+        top_frame = tk.Frame(self, bg="#f0f0f0")
+        top_frame.pack(fill="x", padx=10, pady=(10, 0))
+        
+        self.enabled_var = tk.BooleanVar(value=PROFILER.enabled)
+        enabled_check = tk.Checkbutton(top_frame, text="开启性能记录", font=("微软雅黑", 10),
+                                       variable=self.enabled_var, command=self.toggle,
+                                       bg="#f0f0f0", activebackground="#f0f0f0")
+        enabled_check.pack(side="left")
+        
+        clear_button = tk.Button(top_frame, text="清空", font=("微软雅黑", 10), command=self.clear)
+        clear_button.pack(side="right", padx=5)
+        
+        self.text = tk.Text(self, font=("Consolas", 10), wrap="none")
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        buttons_frame = tk.Frame(self, bg="#f0f0f0")
+        buttons_frame.pack(fill="x", padx=10, pady=(0, 10))
+        
+        for text, command in (("导出统计...", lambda: self.export("json")),
+                              ("导出 Chrome trace...", lambda: self.export("trace")),
+                              ("分析下一次操作...", self.profile_next)):
+            button = tk.Button(buttons_frame, text=text, font=("微软雅黑", 10), command=command)
+            button.pack(side="left", padx=5)
+        
+        self.refresh()
+    
+    def toggle(self):
+        self.on_toggle(self.enabled_var.get())
+    
+    def clear(self):
+        PROFILER.reset()
+        self.refresh()
+    
+    def refresh(self):
+        # 窗口打开期间每秒刷新一次统计
+        if not self.winfo_exists():
+            return
+        self.text.delete("1.0", "end")
+        self.text.insert("1.0", PROFILER.summary() if PROFILER.histograms else "还没有记录，开启后操作一下界面")
+        self.after(1000, self.refresh)
+    
+    def export(self, fmt):
+        filename = filedialog.asksaveasfilename(
+            parent=self,
+            title="导出性能记录",
+            filetypes=[("JSON文件", "*.json")],
+            defaultextension=".json"
+        )
+        if filename:
+            try:
+                PROFILER.export(filename, fmt)
+            except OSError as e:
+                messagebox.showerror("错误", f"导出时出错: {str(e)}", parent=self)
+    
+    def profile_next(self):
+        filename = filedialog.asksaveasfilename(
+            parent=self,
+            title="保存 cProfile 结果",
+            filetypes=[("cProfile 结果", "*.prof")],
+            defaultextension=".prof"
+        )
+        if filename:
+            # 分析需要开启记录
+            self.enabled_var.set(True)
+            self.toggle()
+            PROFILER.profile_next(filename, self.on_profiled)
+
 
 class RandomChooser(tk.Tk):
     def __init__(self):
@@ -19,16 +393,60 @@ class RandomChooser(tk.Tk):
         except:
             pass
         
-        # 存储选项的列表
-        self.options = []
+        # 存储选项的列表和随机选择器
+        self.options = OptionStore()
+        # 会话随机流：动画和最终结果各用一条子流，最终结果可以根据审计日志重放（见 chooser_audit.py）
+        self.random_stream = session_stream()
+        animation_stream, result_stream = self.random_stream.spawn(2)
+        self.chooser = Chooser(self.options, animation_stream.generator())
+        # 轮换抽取的状态：本轮已经抽中过哪些选项
+        self.rotation = Rotation(self.options)
+        # 选项的标签，每个标签一个位图索引，可以按标签条件抽取（见 chooser_tags.py）
+        self.tags = TagIndex(self.options)
+        # 撤销 / 重做（见 chooser_history.py），界面对选项的修改都经过它
+        self.history = History(self.options, self.tags, self.rotation)
+        # 列表上方筛选框对应的筛选结果，列表只显示匹配的选项
+        self.option_filter = OptionFilter(self.options)
+        self.filter_indexing = False
+        # 正在进行的后台加载
+        self.loader = None
+        # saved_options 目录的索引，第一次查找时才创建
+        self.catalog = None
         
         # 创建界面元素
         self.create_widgets()
         
+        # 结果动画（见 chooser_animation.py）：只有一个控制器和一个 after 计时器
+        self.animation_job = None
+        self.animation = SpinAnimation(self._schedule_animation, self._unschedule_animation,
+                                       self.result_var.set, self._finish_choice)
+        
         # 设置默认保存路径
-        self.save_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_options")
-        if not os.path.exists(self.save_path):
-            os.makedirs(self.save_path)
+        self.save_path = ensure_save_path()
+        
+        # 每个最终结果都记录到审计日志
+        self.auditor = DrawAuditor(self.options, result_stream,
+                                   AuditLog(os.path.join(self.save_path, AUDIT_FILENAME)))
+        
+        # 自动保存日志（见 chooser_journal.py），窗口第一次画出来之后才创建并恢复上次的选项
+        self.journal = None
+        self.recovered = None
+        self.session_started = False
+        self.bind("<Expose>", self._on_expose, add="+")
+        
+        # 按 Esc 取消正在进行的加载
+        self.bind("<Escape>", lambda event: self.cancel_loading())
+        
+        # Ctrl+Z 撤销，Ctrl+Y 或 Ctrl+Shift+Z 重做
+        self.bind("<Control-z>", lambda event: self.undo())
+        self.bind("<Control-y>", lambda event: self.redo())
+        self.bind("<Control-Z>", lambda event: self.redo())
+        
+        # 性能记录（见 chooser_profile.py）：按 F12 打开，开启时每 HEARTBEAT_MS 毫秒检查一次事件循环是否卡顿
+        self.heartbeat_job = None
+        self.bind("<F12>", lambda event: self.show_profiler())
+        if PROFILER.enabled:
+            self.set_profiling(True)
     
     def create_widgets(self):
         # 标题标签
@@ -48,6 +466,17 @@ class RandomChooser(tk.Tk):
         self.option_entry = tk.Entry(input_frame, font=("微软雅黑", 13), width=40)  # 调整输入框
         self.option_entry.pack(side="left", padx=10)
         self.option_entry.bind("<Return>", lambda event: self.add_option())
+        # 粘贴多行文本时作为批量导入处理
+        self.option_entry.bind("<<Paste>>", self._on_entry_paste)
+        
+        # 新选项的权重，权重越大越容易被选中
+        weight_label = tk.Label(input_frame, text="权重", font=("微软雅黑", 11), bg="#f0f0f0")
+        weight_label.pack(side="left")
+        
+        self.weight_var = tk.StringVar(value="1")
+        weight_spinbox = tk.Spinbox(input_frame, from_=0, to=1000, increment=1,
+                                    textvariable=self.weight_var, font=("微软雅黑", 13), width=5)
+        weight_spinbox.pack(side="left", padx=5)
         
         add_button = tk.Button(input_frame, text="添加选项", font=("微软雅黑", 11), 
                               command=self.add_option, bg="#4CAF50", fg="white", 
@@ -59,37 +488,53 @@ class RandomChooser(tk.Tk):
         list_frame = tk.Frame(self, bg="#f0f0f0")
         list_frame.pack(pady=15, fill="both", expand=True, padx=30)  # 调整内边距
         
-        list_label = tk.Label(list_frame, text="当前选项列表", font=("微软雅黑", 12, "bold"), bg="#f0f0f0", fg="#333333")
-        list_label.pack(anchor="w", pady=(0, 10))
+        # 标题右侧是撤销和重做按钮
+        list_header = tk.Frame(list_frame, bg="#f0f0f0")
+        list_header.pack(fill="x", pady=(0, 10))
         
-        list_container = tk.Frame(list_frame, bg="white", bd=0)
-        list_container.pack(fill="both", expand=True)
+        list_label = tk.Label(list_header, text="当前选项列表", font=("微软雅黑", 12, "bold"), bg="#f0f0f0", fg="#333333")
+        list_label.pack(side="left")
+        
+        self.redo_button = tk.Button(list_header, text="重做", font=("微软雅黑", 10),
+                                     command=self.redo, bg="#795548", fg="white",
+                                     activebackground="#5d4037", activeforeground="white", state="disabled")
+        self.redo_button.pack(side="right", padx=5)
         
-        # 创建画布和滚动条
-        canvas = tk.Canvas(list_container, bg="white", bd=0, highlightthickness=0)
-        scrollbar = tk.Scrollbar(list_container, orient="vertical", command=canvas.yview)
+        self.undo_button = tk.Button(list_header, text="撤销", font=("微软雅黑", 10),
+                                     command=self.undo, bg="#795548", fg="white",
+                                     activebackground="#5d4037", activeforeground="white", state="disabled")
+        self.undo_button.pack(side="right", padx=5)
         
-        # 创建选项容器框架
-        self.options_frame = tk.Frame(canvas, bg="white")
-        self.options_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        # 筛选区域
+        filter_frame = tk.Frame(list_frame, bg="#f0f0f0")
+        filter_frame.pack(fill="x", pady=(0, 10))
         
-        # 在画布上创建窗口
-        canvas.create_window((0, 0), window=self.options_frame, anchor="nw", width=canvas.winfo_reqwidth())
-        canvas.configure(yscrollcommand=scrollbar.set)
+        filter_label = tk.Label(filter_frame, text="筛选", font=("微软雅黑", 11), bg="#f0f0f0")
+        filter_label.pack(side="left")
         
-        # 布局画布和滚动条
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *args: self.apply_filter())
+        filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var, font=("微软雅黑", 11), width=30)
+        filter_entry.pack(side="left", padx=10)
         
-        # 绑定画布大小变化事件
-        canvas.bind("<Configure>", lambda e: canvas.itemconfig(canvas.find_all()[0], width=e.width))
+        self.filter_draw_var = tk.BooleanVar(value=False)
+        filter_draw_check = tk.Checkbutton(filter_frame, text="只从筛选结果中抽取", font=("微软雅黑", 10),
+                                           variable=self.filter_draw_var, bg="#f0f0f0",
+                                           activebackground="#f0f0f0")
+        filter_draw_check.pack(side="left")
         
-        self.options_listbox = tk.Listbox(list_container, font=("微软雅黑", 12), 
-                                        selectbackground="#a6d4fa", 
-                                        selectmode=tk.SINGLE, 
-                                        yscrollcommand=scrollbar.set)
-        self.options_listbox.pack(side="left", fill="both", expand=True)
-        scrollbar.config(command=self.options_listbox.yview)
+        # 一次给筛选结果（没有筛选条件时为全部选项）加上或去掉标签
+        bulk_tag_button = tk.Button(filter_frame, text="批量设置标签", font=("微软雅黑", 10),
+                                    command=self.bulk_tag)
+        bulk_tag_button.pack(side="left", padx=10)
+        
+        list_container = tk.Frame(list_frame, bg="white", bd=0)
+        list_container.pack(fill="both", expand=True)
+        
+        # 虚拟化选项列表：只为可见行创建控件；双击修改权重，右键单击编辑标签
+        self.options_view = VirtualOptionList(list_container, self.option_filter, self._delete_option_card,
+                                              self._edit_option_weight, self._edit_option_tags, self.tags)
+        self.options_view.pack(fill="both", expand=True)
         
         # 操作按钮区域
         buttons_frame = tk.Frame(self, bg="#f0f0f0")
@@ -115,6 +560,24 @@ class RandomChooser(tk.Tk):
                               activebackground="#7b1fa2", activeforeground="white")
         load_button.pack(side="left", padx=5)
         
+        search_button = tk.Button(buttons_frame, text="查找选项集", font=("微软雅黑", 10), 
+                                command=self.search_saved_sets, bg="#607d8b", fg="white", 
+                                activebackground="#455a64", activeforeground="white")
+        search_button.pack(side="left", padx=5)
+        
+        import_button = tk.Button(buttons_frame, text="批量导入", font=("微软雅黑", 10), 
+                                command=self.bulk_import, bg="#009688", fg="white", 
+                                activebackground="#00796b", activeforeground="white")
+        import_button.pack(side="left", padx=5)
+        
+        # 开启后每次修改都会记录下来，下次启动时自动恢复
+        self.autosave_var = tk.BooleanVar(value=False)
+        # 自动保存准备好之前不能切换
+        self.autosave_check = tk.Checkbutton(buttons_frame, text="自动保存", font=("微软雅黑", 10),
+                                             variable=self.autosave_var, command=self.toggle_autosave,
+                                             bg="#f0f0f0", activebackground="#f0f0f0", state="disabled")
+        self.autosave_check.pack(side="right", padx=5)
+        
         # 随机选择区域
         choose_frame = tk.Frame(self, bg="#f0f0f0")
         choose_frame.pack(pady=20, padx=20)
@@ -125,6 +588,31 @@ class RandomChooser(tk.Tk):
                                 height=2, width=20)  # 调整随机选择按钮尺寸
         choose_button.pack()
         
+        choose_options_frame = tk.Frame(choose_frame, bg="#f0f0f0")
+        choose_options_frame.pack(pady=(5, 0))
+        
+        # 轮换抽取：所有选项都抽中过一次之前不会重复
+        self.rotation_var = tk.BooleanVar(value=False)
+        rotation_check = tk.Checkbutton(choose_options_frame, text="轮换抽取（一轮内不重复）", font=("微软雅黑", 10),
+                                        variable=self.rotation_var, command=self.update_status,
+                                        bg="#f0f0f0", activebackground="#f0f0f0")
+        rotation_check.pack(side="left", padx=5)
+        
+        # 跳过动画，点击后立即显示结果
+        self.no_animation_var = tk.BooleanVar(value=False)
+        no_animation_check = tk.Checkbutton(choose_options_frame, text="跳过动画", font=("微软雅黑", 10),
+                                            variable=self.no_animation_var,
+                                            bg="#f0f0f0", activebackground="#f0f0f0")
+        no_animation_check.pack(side="left", padx=5)
+        
+        # 标签条件：只从符合条件的选项中抽取，例如「素食 -本周吃过」
+        tag_label = tk.Label(choose_options_frame, text="标签条件", font=("微软雅黑", 10), bg="#f0f0f0")
+        tag_label.pack(side="left", padx=(10, 0))
+        self.tag_var = tk.StringVar()
+        self.tag_var.trace_add("write", lambda *args: self.update_status())
+        tag_entry = tk.Entry(choose_options_frame, textvariable=self.tag_var, font=("微软雅黑", 10), width=20)
+        tag_entry.pack(side="left", padx=5)
+        
         # 结果显示区域
         result_frame = tk.Frame(self, bg="#f0f0f0")
         result_frame.pack(pady=10, padx=20, fill="x")
@@ -151,91 +639,236 @@ class RandomChooser(tk.Tk):
                                font=("微软雅黑", 9), bg="#e0e0e0", anchor="w")
         status_label.pack(side="left", padx=10)
     
+    @timed()
     def add_option(self):
         option = self.option_entry.get().strip()
         if option:
-            self.options.append(option)
-            
-            # 创建选项卡片框架
-            option_card = tk.Frame(self.options_frame, bg="white", padx=10, pady=5)
-            option_card.pack(fill="x", padx=5, pady=3)
-            
-            # 添加选项文本
-            option_label = tk.Label(option_card, text=option, font=("微软雅黑", 12),  # 调整字体大小
-                                  bg="white", fg="#333333", anchor="w", padx=12, pady=10)
-            option_label.pack(side="left", fill="x", expand=True)
-            
-            # 添加删除按钮
-            delete_btn = tk.Button(option_card, text="×", font=("微软雅黑", 11),
-                                 bg="white", fg="#666666", bd=0,
-                                 activebackground="#ff4444", activeforeground="white")
-            delete_btn.pack(side="right")
-            
-            # 设置卡片样式
-            option_card.bind("<Enter>", lambda e, card=option_card: self._on_card_enter(card))
-            option_card.bind("<Leave>", lambda e, card=option_card: self._on_card_leave(card))
-            
-            # 绑定删除按钮事件
-            delete_btn.configure(command=lambda c=option_card, o=option: self._delete_option_card(c, o))
+            try:
+                self.history.add(option, self.weight_var.get())
+            except ValueError:
+                messagebox.showwarning("警告", "请输入有效的权重!")
+                return
+            # 滚动到列表末尾（新添加的选项符合筛选条件时会显示在最后）
+            self.options_view.see(len(self.option_filter) - 1)
             
             self.option_entry.delete(0, tk.END)
             self.update_status()
         else:
             messagebox.showwarning("警告", "请输入有效的选项!")
     
-    def _on_card_enter(self, card):
-        card.configure(bg="#f5f5f5")
-        for widget in card.winfo_children():
-            widget.configure(bg="#f5f5f5")
+    def _on_entry_paste(self, event):
+        try:
+            text = self.clipboard_get()
+        except tk.TclError:
+            return None
+        if "\n" not in text.strip():
+            # 单行文本照常粘贴到输入框
+            return None
+        self.import_text(text)
+        return "break"
     
-    def _on_card_leave(self, card):
-        card.configure(bg="white")
-        for widget in card.winfo_children():
-            widget.configure(bg="white")
+    def bulk_import(self):
+        BulkImportWindow(self, self.import_text, self.import_file)
+    
+    def import_text(self, text, fmt="text"):
+        from chooser_stream import split_option_text
+        try:
+            options, weights = split_option_text(text, fmt)
+        except OptionFormatError:
+            messagebox.showerror("错误", "CSV 格式不正确!")
+            return False
+        return self._import_options(options, weights)
+    
+    def import_file(self, filename):
+        from chooser_stream import read_import_file
+        try:
+            options, weights = read_import_file(filename)
+        except (OptionFormatError, ValueError):
+            messagebox.showerror("错误", "文件格式不正确!")
+            return False
+        except OSError as e:
+            messagebox.showerror("错误", f"加载文件时出错: {str(e)}")
+            return False
+        return self._import_options(options, weights)
+    
+    @timed()
+    def _import_options(self, options, weights):
+        # 去掉列表中已有的选项后一次追加：列表、筛选和自动保存都只更新一次，状态栏也只刷新一次
+        new_options, new_weights = self.options.unique(options, weights)
+        self.history.extend(new_options, new_weights)
+        if new_options:
+            self.options_view.see(len(self.option_filter) - 1)
+        self._update_history_buttons()
+        self.status_var.set(f"已导入 {len(new_options)} 个选项，跳过重复 {len(options) - len(new_options)} 个"
+                            f" | 选项数量: {len(self.options)}")
+        return True
     
-    def _delete_option_card(self, card, option):
-        card.destroy()
-        self.options.remove(option)
+    @timed()
+    def _delete_option_card(self, row):
+        # 按行号删除，保证删除的是被点击的那一项
+        self.history.remove_at(self.option_filter.source_index(row))
+        self.update_status()
+    
+    def _edit_option_weight(self, row):
+        index = self.option_filter.source_index(row)
+        weight = simpledialog.askfloat("设置权重", f"「{self.options[index]}」的权重:",
+                                       initialvalue=self.options.weight(index),
+                                       minvalue=0, parent=self)
+        if weight is not None:
+            self.history.set_weight(index, weight)
+            self._update_history_buttons()
+    
+    def _edit_option_tags(self, row):
+        index = self.option_filter.source_index(row)
+        text = simpledialog.askstring("编辑标签", f"「{self.options[index]}」的标签（空格分隔）:",
+                                      initialvalue=" ".join(self.tags.tags_of(index)), parent=self)
+        if text is None:
+            return
+        try:
+            self.history.set_tags(index, parse_tags(text))
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+            return
+        self.options_view.refresh()
+        self.update_status()
+    
+    @timed()
+    def bulk_tag(self):
+        # 给筛选结果（没有筛选条件时为全部选项）加上标签，前面加 "-" 的标签表示去掉
+        if not len(self.option_filter):
+            messagebox.showinfo("提示", "没有可以设置标签的选项!")
+            return
+        scope = "筛选结果中的" if self.option_filter.active else "全部"
+        text = simpledialog.askstring(
+            "批量设置标签", f"给{scope} {len(self.option_filter)} 个选项加上标签（空格分隔，前面加 - 表示去掉）:",
+            parent=self)
+        if text is None:
+            return
+        add, remove = parse_query(text)
+        try:
+            for name in add:
+                check_tag(name)
+            self.history.update_tags(self.option_filter.indices, add, remove)
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+            return
+        self.options_view.refresh()
         self.update_status()
     
+    @timed()
+    def apply_filter(self):
+        self.option_filter.set_query(self.filter_var.get())
+        self.options_view.scroll_to(0)
+        self.update_status()
+        # 开始筛选后在空闲时分段建立索引，之后的查询会更快
+        if not self.filter_indexing and not self.option_filter.index_ready:
+            self.filter_indexing = True
+            self.after(1, self._build_filter_index)
+    
+    def _build_filter_index(self):
+        if self.option_filter.build_index():
+            self.after(1, self._build_filter_index)
+        else:
+            self.filter_indexing = False
+    
+    def _draw_conditions(self):
+        # 抽取条件 (筛选条件, 标签条件)；只有勾选了「只从筛选结果中抽取」时才使用筛选条件
+        active = self.filter_draw_var.get() and self.option_filter.active
+        return self.option_filter.query if active else "", self.tag_var.get().strip()
+    
+    def _draw_subset(self):
+        # 按抽取条件返回可以抽取的存储下标（筛选结果、标签条件的结果或两者的交集），没有条件时返回 None
+        query, tag_query = self._draw_conditions()
+        subset = self.option_filter.indices if query else None
+        if tag_query:
+            subset = self.tags.select(tag_query, subset)
+        return subset
+    
     def delete_option(self):
         # 此方法不再使用，保留为空以防其他地方调用
         pass
     
+    @timed()
     def clear_options(self):
         if messagebox.askyesno("确认", "确定要清空所有选项吗?"):
-            # 清空选项列表
-            self.options.clear()
-            # 清空选项框架
-            for widget in self.options_frame.winfo_children():
-                widget.destroy()
-            # 清空列表框
-            self.options_listbox.delete(0, tk.END)
+            self.animation.cancel()
+            # 清空选项列表（可以撤销）
+            self.options_view.batch(self.history.clear)
             # 重置结果显示
             self.result_var.set("等待选择...")
             # 更新状态栏
             self.update_status()
     
+    @timed()
+    def undo(self):
+        self._step_history(self.history.undo, "撤销")
+    
+    @timed()
+    def redo(self):
+        self._step_history(self.history.redo, "重做")
+    
+    def _step_history(self, step, action):
+        # 加载过程中选项还在变化，完成或取消后才能撤销、重做
+        if self.loader is not None:
+            self.status_var.set(f"正在加载，完成或取消后才能{action}")
+            return
+        label = self.options_view.batch(step)
+        if self.option_filter.active and not self.filter_indexing and not self.option_filter.index_ready:
+            self.filter_indexing = True
+            self.after(1, self._build_filter_index)
+        self.update_status()
+        if label is None:
+            self.status_var.set(f"没有可以{action}的操作 | 选项数量: {len(self.options)}")
+        else:
+            self.status_var.set(f"已{action}: {label} | 选项数量: {len(self.options)}")
+    
+    def _update_history_buttons(self):
+        loading = self.loader is not None
+        self.undo_button.config(state="normal" if self.history.can_undo and not loading else "disabled")
+        self.redo_button.config(state="normal" if self.history.can_redo and not loading else "disabled")
+    
+    @timed()
     def choose_random(self):
         if not self.options:
             messagebox.showinfo("提示", "请先添加一些选项!")
             return
+        subset = self._draw_subset()
+        if not self.chooser.can_choose(subset):
+            messagebox.showinfo("提示", "没有可以抽取的选项!")
+            return
         
-        # 添加选择动画效果
-        self.choose_animation()
+        if self.no_animation_var.get():
+            self.animation.cancel()
+            self._finish_choice()
+            return
+        # 添加选择动画效果；动画进行中再次点击会从头开始
+        self.animation.start(self.chooser.animation_frames(FRAME_COUNT, subset))
     
-    def choose_animation(self, count=10):
-        if count > 0:
-            random_option = random.choice(self.options)
-            self.result_var.set(random_option)
-            delay = int(100 * (1 + (10-count)/5))  # 逐渐减慢动画速度
-            self.after(delay, lambda: self.choose_animation(count-1))
-        else:
-            # 最终选择
-            final_choice = random.choice(self.options)
-            self.result_var.set(final_choice)
-            self.status_var.set(f"已选择: {final_choice} | 选项数量: {len(self.options)}")
+    def _schedule_animation(self, delay):
+        self.animation_job = self.after(delay, self._animation_tick)
+    
+    @timed()
+    def _animation_tick(self):
+        self.animation.tick()
+    
+    def _unschedule_animation(self):
+        if self.animation_job is not None:
+            self.after_cancel(self.animation_job)
+            self.animation_job = None
+    
+    @timed()
+    def _finish_choice(self):
+        # 最终选择（动画期间选项可能被修改，这里重新检查）
+        subset = self._draw_subset()
+        if not self.chooser.can_choose(subset):
+            return
+        rotation = self.rotation if self.rotation_var.get() else None
+        query, tag_query = self._draw_conditions()
+        final_choice = self.options[self.auditor.choose_index(subset, query, rotation, tag_query)]
+        self.result_var.set(final_choice)
+        self.status_var.set(f"已选择: {final_choice} | 选项数量: {len(self.options)}{self._rotation_status()}")
     
+    @timed()
     def save_options(self):
         if not self.options:
             messagebox.showwarning("警告", "没有选项可保存!")
@@ -244,13 +877,22 @@ class RandomChooser(tk.Tk):
         filename = filedialog.asksaveasfilename(
             initialdir=self.save_path,
             title="保存选项列表",
-            filetypes=[("JSON文件", "*.json")],
+            filetypes=[("JSON文件", "*.json"), ("二进制选项文件", "*.rcb")],
             defaultextension=".json"
         )
         
         if filename:
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump({"options": self.options}, f, ensure_ascii=False, indent=2)
+            # 轮换抽取进行到一半时一起保存本轮已抽中的选项
+            drawn = self.rotation.drawn_indices() if self.rotation_var.get() else None
+            try:
+                save_options_file(filename, self.options, self.options.weights(), drawn, tags=self.tags.snapshot())
+            except OptionFormatError:
+                # 选项来自损坏的 .rcb 文件等，原文件保持不变
+                messagebox.showerror("错误", "选项中有无法保存的内容!")
+                return
+            except OSError as e:
+                messagebox.showerror("错误", f"保存文件时出错: {str(e)}")
+                return
             
             self.status_var.set(f"已保存 | 选项数量: {len(self.options)}")
     
@@ -258,33 +900,195 @@ class RandomChooser(tk.Tk):
         filename = filedialog.askopenfilename(
             initialdir=self.save_path,
             title="加载选项列表",
-            filetypes=[("JSON文件", "*.json")]
+            filetypes=[("选项文件", "*.json *.rcb *.ndjson *.jsonl *.txt"), ("JSON文件", "*.json"),
+                       ("二进制选项文件", "*.rcb"), ("NDJSON文件", "*.ndjson *.jsonl"), ("文本文件", "*.txt")]
         )
         
         if filename:
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    
-                if "options" in data and isinstance(data["options"], list):
-                    # 清空当前选项
-                    self.options_listbox.delete(0, tk.END)
-                    self.options.clear()
-                    
-                    # 加载新选项
-                    for option in data["options"]:
-                        self.options.append(option)
-                        self.options_listbox.insert(tk.END, option)
-                    
-                    self.update_status()
-                    messagebox.showinfo("成功", f"已加载 {len(self.options)} 个选项")
-                else:
+            self.start_loading(filename)
+    
+    def search_saved_sets(self):
+        if self.catalog is None:
+            from chooser_catalog import Catalog
+            self.catalog = Catalog(self.save_path)
+        CatalogSearchWindow(self, self.catalog,
+                            lambda name: self.start_loading(os.path.join(self.save_path, name)))
+    
+    def _on_expose(self, event):
+        # 窗口第一次画出来之后再准备自动保存，启动时尽快显示窗口
+        if not self.session_started:
+            self.session_started = True
+            self.after_idle(self.start_session)
+    
+    def start_session(self):
+        from chooser_journal import Journal
+        self.journal = Journal(self.save_path)
+        # 存在自动保存文件说明上次开启了自动保存，恢复上次的选项
+        if self.journal.exists():
+            self.restore_autosave()
+        else:
+            self.autosave_check.config(state="normal")
+    
+    def restore_autosave(self):
+        # 在后台线程中读取快照和重放日志，窗口在恢复期间照常响应
+        import threading
+        threading.Thread(target=self._recover_autosave, daemon=True).start()
+        self.status_var.set("正在恢复上次的选项...")
+        self.after(LOAD_POLL_MS, self._check_recovered)
+    
+    def _recover_autosave(self):
+        # 在后台线程中调用，只保存结果，由界面线程检查
+        try:
+            self.recovered = ("done", self.journal.recover())
+        except Exception as e:
+            # 文件损坏的方式很多（截断、格式不对、内容不是字符串……），都按恢复失败处理
+            self.recovered = ("error", e)
+    
+    def _check_recovered(self):
+        if self.recovered is None:
+            self.after(LOAD_POLL_MS, self._check_recovered)
+            return
+        kind, state = self.recovered
+        self.recovered = None
+        self.autosave_check.config(state="normal")
+        if kind == "error":
+            # 自动保存文件损坏时把它们放到一边（改名为 *.damaged），从当前的选项重新开始自动保存
+            self.journal.set_aside()
+            state = None
+        # 恢复期间开始加载了文件时不再恢复，自动保存从加载的选项开始记录
+        if state and self.loader is None:
+            options, weights, drawn, tags = state
+            # 恢复期间添加的选项保留在前面，恢复出来的标签和轮换进度跟着选项后移
+            offset = len(self.options)
+            if offset:
+                self.options.extend(options, weights)
+                for name, bits in tags.items():
+                    self.tags.update([offset + i for i in bits_to_indices(bits)], add=[name])
+                drawn = self.rotation.drawn_indices() + [offset + i for i in drawn]
+            else:
+                self.options.replace(options, weights)
+                self.tags.load(tags)
+            if drawn:
+                self.rotation.restore(drawn)
+                self.rotation_var.set(True)
+            self.options_view.refresh()
+            # 恢复出来的选项不能撤销，之前的撤销记录也对不上了
+            self.history.forget()
+        self.journal.on_error = self._on_autosave_error
+        self.journal.start(self.options, self.tags, self.rotation)
+        self.autosave_var.set(self.journal.recording)
+        self.update_status()
+    
+    def toggle_autosave(self):
+        if self.autosave_var.get():
+            self.journal.start(self.options, self.tags, self.rotation)
+            self.autosave_var.set(self.journal.recording)
+        else:
+            self.journal.stop()
+    
+    def _on_autosave_error(self, error):
+        # 写自动保存出错时已经停止记录，已有的文件保留，下次启动仍能恢复到出错之前
+        # 出错时正在通知选项的修改，提示留到事件循环中再弹出
+        self.autosave_var.set(False)
+        self.after_idle(messagebox.showerror, "错误", f"自动保存失败，已停止: {error}")
+    
+    def start_loading(self, filename):
+        # 在后台线程中流式读取文件，分批加入列表，第一批选项马上就能显示
+        self.cancel_loading()
+        # 加载前的选项可以撤销回来；加载的各个批次不单独记录，撤销「加载选项」一次回到加载前
+        self.options_view.batch(self.history.clear, "加载选项")
+        self.history.recording = False
+        self.options_view.scroll_to(0)
+        from chooser_stream import StreamingLoader
+        self.loader = StreamingLoader(filename).start()
+        self._update_history_buttons()
+        self.after(LOAD_POLL_MS, self._poll_loader, self.loader)
+    
+    @timed()
+    def _poll_loader(self, loader):
+        if loader is not self.loader:
+            return
+        for event in loader.poll():
+            if event[0] == "options":
+                self.options.extend(event[1], event[2])
+            elif event[0] == "weights":
+                self.options.set_weights(event[1], event[2])
+            elif event[0] == "drawn":
+                # 文件中保存了轮换进度，接着上次的轮换继续抽取
+                self.rotation.restore(event[1])
+                self.rotation_var.set(True)
+            elif event[0] == "tags":
+                self.tags.load(event[1])
+                self.options_view.refresh()
+            elif event[0] == "done":
+                self.loader = None
+                self.history.recording = True
+                self.update_status()
+                messagebox.showinfo("成功", f"已加载 {len(self.options)} 个选项")
+                return
+            else:
+                # 文件有问题时不保留加载了一半的选项
+                self.loader = None
+                self.options.clear()
+                self.history.recording = True
+                self.update_status()
+                if isinstance(event[1], OptionFormatError):
                     messagebox.showerror("错误", "文件格式不正确!")
-            except Exception as e:
-                messagebox.showerror("错误", f"加载文件时出错: {str(e)}")
+                else:
+                    messagebox.showerror("错误", f"加载文件时出错: {str(event[1])}")
+                return
+        
+        self.status_var.set(f"正在加载 {loader.progress:.0%} (按 Esc 取消) | 选项数量: {len(self.options)}")
+        self.after(LOAD_POLL_MS, self._poll_loader, loader)
+    
+    def cancel_loading(self):
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+            self.history.recording = True
+            self.update_status()
+    
+    def _rotation_status(self):
+        if not self.rotation_var.get():
+            return ""
+        return f" | 本轮已抽取: {self.rotation.drawn_count}/{len(self.options)}"
     
+    @timed()
     def update_status(self):
-        self.status_var.set(f"就绪 | 选项数量: {len(self.options)}")
+        status = f"就绪 | 选项数量: {len(self.options)}"
+        if self.option_filter.active:
+            status += f" | 筛选结果: {len(self.option_filter)}"
+        tag_query = self.tag_var.get().strip()
+        if tag_query:
+            status += f" | 符合标签条件: {len(self.tags.select(tag_query))}"
+        self.status_var.set(status + self._rotation_status())
+        self._update_history_buttons()
+
+    def show_profiler(self):
+        ProfilerWindow(self, self.set_profiling,
+                       lambda filename, name: self.status_var.set(f"已保存 {name} 的分析结果: {filename}"))
+    
+    def set_profiling(self, enabled):
+        PROFILER.enabled = enabled
+        if self.heartbeat_job is not None:
+            self.after_cancel(self.heartbeat_job)
+            self.heartbeat_job = None
+        PROFILER.stop_heartbeat()
+        if enabled:
+            self._heartbeat()
+    
+    def _heartbeat(self):
+        PROFILER.heartbeat(self._count_widgets)
+        self.heartbeat_job = self.after(HEARTBEAT_MS, self._heartbeat)
+    
+    def _count_widgets(self):
+        count = 0
+        pending = [self]
+        while pending:
+            widget = pending.pop()
+            count += 1
+            pending.extend(widget.winfo_children())
+        return count
 
 if __name__ == "__main__":
     app = RandomChooser()
@@ -1,12 +1,412 @@
 import sys
+import os
+from functools import partial
+
+# --headless：在命令行中批量抽取（见 chooser_cli.py）；
+# --serve：启动本地 HTTP 抽取服务（见 chooser_server.py）。两者都不导入 PyQt5
+if __name__ == "__main__" and "--headless" in sys.argv[1:]:
+    from chooser_cli import main
+    sys.exit(main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+if __name__ == "__main__" and "--serve" in sys.argv[1:]:
+    from chooser_server import main
+    sys.exit(main([arg for arg in sys.argv[1:] if arg != "--serve"]))
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QGridLayout, QLabel, QPushButton,
-                             QLineEdit, QListWidget, QMessageBox, QFileDialog)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QFont, QIcon
-import random
-import json
-import os
+                             QLineEdit, QTableView, QHeaderView, QAbstractItemView,
+                             QMessageBox, QFileDialog, QDoubleSpinBox, QInputDialog,
+                             QShortcut, QDialog, QListWidget, QCheckBox, QPlainTextEdit)
+from PyQt5.QtCore import (Qt, QTimer, QAbstractListModel, QModelIndex, QObject, QRunnable,
+                          QThreadPool, QEvent, pyqtSignal, pyqtSlot)
+from PyQt5.QtGui import QFont, QIcon, QKeySequence
+from chooser_engine import (OptionStore, Chooser, OptionFormatError, ensure_save_path,
+                            save_options_file, option_label)
+from chooser_filter import OptionFilter
+from chooser_audit import AUDIT_FILENAME, AuditLog, DrawAuditor, session_stream
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex, bits_to_indices, check_tag, parse_query, parse_tags
+from chooser_history import History
+from chooser_animation import FRAME_COUNT, SpinAnimation
+from chooser_profile import HEARTBEAT_MS, PROFILER, timed
+
+# 用 timed() 包装的槽同时用 pyqtSlot 声明参数，否则 PyQt 会把 clicked(bool) 等信号的参数也传给包装后的方法
+
+# 启动时只导入画出窗口需要的模块；读取文件（chooser_stream）、查找选项集（chooser_catalog）
+# 和自动保存（chooser_journal）的模块在第一次用到时才导入
+
+# 同时进行的后台加载数：被取消的加载可能还卡在慢速磁盘或网络目录的读取上，不能占住唯一的线程
+LOAD_THREADS = 4
+
+class OptionListModel(QAbstractListModel):
+    # 直接包装选项存储（OptionStore）的模型：数据只保存一份，视图按需读取可见行，
+    # 插入和删除都按整段区间发出信号。界面对选项的修改都经过这个模型，
+    # 以便在修改存储前后正确地发出 begin/end 信号。
+    # 模型显示的是筛选结果（self.view）；有筛选条件时事先不知道哪些行会变化，
+    # 修改存储时整体重置一次模型。给出 tags（chooser_tags.TagIndex）时每行附上选项的标签；
+    # 给出 history（chooser_history.History）时修改都经过它，可以撤销
+    def __init__(self, options, tags=None, history=None, parent=None):
+        super().__init__(parent)
+        self.options = options
+        self.tags = tags
+        self.editor = history if history is not None else options
+        self.view = OptionFilter(options)
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.view)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            tags = self.tags.tags_of(self.view.source_index(row)) if self.tags is not None else ()
+            return option_label(self.view[row], self.view.weight(row), tags)
+        if role == Qt.ToolTipRole:
+            return self.view[row]
+        return None
+    
+    def source_index(self, row):
+        return self.view.source_index(row)
+    
+    def set_filter(self, query):
+        self.beginResetModel()
+        self.view.set_query(query)
+        self.endResetModel()
+    
+    def append_options(self, new_options, weights=None):
+        # 一次性追加一批选项，只发出一次插入信号
+        if not new_options:
+            return
+        if self.view.active:
+            self.beginResetModel()
+            self.editor.extend(new_options, weights)
+            self.endResetModel()
+            return
+        first = len(self.options)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_options) - 1)
+        self.editor.extend(new_options, weights)
+        self.endInsertRows()
+    
+    def remove_row(self, row):
+        # 删除是与最后一项交换后弹出：先去掉最后一行，再刷新被换过来的那一行
+        if self.view.active:
+            self.beginResetModel()
+            self.editor.remove_at(self.view.source_index(row))
+            self.endResetModel()
+            return
+        last = len(self.options) - 1
+        self.beginRemoveRows(QModelIndex(), last, last)
+        self.editor.remove_at(row)
+        self.endRemoveRows()
+        if row < last:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+    
+    def set_weight(self, row, weight):
+        self.editor.set_weight(self.view.source_index(row), weight)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+    
+    def set_weights(self, start, weights):
+        # start 是存储中的下标（加载文件时的权重批次）
+        if not weights:
+            return
+        self.editor.set_weights(start, weights)
+        if self.view.active:
+            self.dataChanged.emit(self.index(0), self.index(max(0, len(self.view) - 1)))
+        else:
+            self.dataChanged.emit(self.index(start), self.index(start + len(weights) - 1))
+    
+    def refresh_rows(self):
+        # 标签等不经过存储的修改之后刷新所有行，视图只重画可见的行
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0), self.index(self.rowCount() - 1))
+    
+    def reset_options(self, new_options, weights=None):
+        # 整体替换选项（加载、清空），视图只重置一次
+        self.beginResetModel()
+        try:
+            self.editor.replace(new_options, weights)
+        finally:
+            self.endResetModel()
+    
+    def batch(self, func, *args):
+        # 执行 func（例如撤销、重做、清空）期间不管修改了多少、修改了什么，视图只整体重置一次
+        self.beginResetModel()
+        try:
+            return func(*args)
+        finally:
+            self.endResetModel()
+
+
+class FileTaskSignals(QObject):
+    # 后台文件任务的信号：在线程池中发出，排队到界面线程处理
+    ready = pyqtSignal()
+    progress = pyqtSignal(float)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(object)
+    result = pyqtSignal(object)
+
+
+class LoadTask(QRunnable):
+    # 在线程池中运行 StreamingLoader，每放入一个事件发出 ready 信号，界面线程收到后取回；
+    # 进度、完成和出错都作为事件按顺序交给界面线程（见 chooser_stream.py）。
+    # 线程结束（包括被取消）时发出 finished。
+    # 界面线程取回之前不会重复发出 ready，避免大量排队的信号挤占界面的其他事件
+    def __init__(self, filename):
+        super().__init__()
+        self.setAutoDelete(False)
+        from chooser_stream import StreamingLoader
+        self.signals = FileTaskSignals()
+        self.loader = StreamingLoader(filename, notify=self._notify)
+        self.notified = False
+        self.done = False
+    
+    def _notify(self):
+        if not self.notified:
+            self.notified = True
+            self.signals.ready.emit()
+    
+    @timed("load_file")
+    def run(self):
+        self.loader.run()
+        self.done = True
+        self.signals.finished.emit(self.loader.filename)
+
+
+class SaveTask(QRunnable):
+    # 在线程池中保存选项的快照：先写临时文件再替换，不会留下写了一半的文件
+    def __init__(self, filename, options, weights, drawn=None, tags=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = FileTaskSignals()
+        self.filename = filename
+        self.options = options
+        self.weights = weights
+        self.drawn = drawn
+        self.tags = tags
+    
+    @timed("save_file")
+    def run(self):
+        try:
+            save_options_file(self.filename, self.options, self.weights, self.drawn,
+                              progress=self.signals.progress.emit, tags=self.tags)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(self.filename)
+
+
+class ImportTask(QRunnable):
+    # 在线程池中读取并拆分要导入的文件，完成后发出 result((选项, 权重列表或 None))
+    def __init__(self, filename):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = FileTaskSignals()
+        self.filename = filename
+    
+    def run(self):
+        from chooser_stream import read_import_file
+        try:
+            result = read_import_file(self.filename)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.result.emit(result)
+
+
+class RecoverTask(QRunnable):
+    # 在线程池中从自动保存文件恢复上次的选项，完成后发出 result(Journal.recover() 的结果)
+    def __init__(self, journal):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = FileTaskSignals()
+        self.journal = journal
+    
+    def run(self):
+        try:
+            state = self.journal.recover()
+        except Exception as e:
+            # 文件损坏的方式很多（截断、格式不对、内容不是字符串……），都按恢复失败处理
+            self.signals.failed.emit(e)
+        else:
+            self.signals.result.emit(state)
+
+
+class BulkImportDialog(QDialog):
+    # 批量导入：粘贴多行文本（每行一个选项，CSV 格式时第一列为选项、第二列为权重），或选择文本 / CSV 文件。
+    # 文件和文本也可以直接拖到主窗口上
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量导入")
+        self.resize(520, 420)
+        self.filename = None
+        
+        layout = QVBoxLayout(self)
+        hint_label = QLabel("每行一个选项，重复的选项和空行会被忽略；也可以把文件拖到主窗口上", self)
+        hint_label.setFont(QFont("Microsoft YaHei", 10))
+        layout.addWidget(hint_label)
+        
+        self.text_edit = QPlainTextEdit(self)
+        self.text_edit.setFont(QFont("Microsoft YaHei", 11))
+        layout.addWidget(self.text_edit)
+        
+        buttons_layout = QHBoxLayout()
+        self.csv_check = QCheckBox("CSV 格式（选项,权重）", self)
+        self.csv_check.setFont(QFont("Microsoft YaHei", 10))
+        buttons_layout.addWidget(self.csv_check)
+        buttons_layout.addStretch()
+        
+        file_button = QPushButton("从文件导入...", self)
+        file_button.setFont(QFont("Microsoft YaHei", 10))
+        file_button.setStyleSheet("background-color: #607d8b;")
+        file_button.clicked.connect(self.choose_file)
+        buttons_layout.addWidget(file_button)
+        
+        import_button = QPushButton("导入", self)
+        import_button.setFont(QFont("Microsoft YaHei", 10))
+        import_button.setStyleSheet("background-color: #4CAF50;")
+        import_button.clicked.connect(self.accept)
+        buttons_layout.addWidget(import_button)
+        layout.addLayout(buttons_layout)
+    
+    def text_format(self):
+        return "csv" if self.csv_check.isChecked() else "text"
+    
+    def choose_file(self):
+        filename, _ = QFileDialog.getOpenFileName(
+            self,
+            "导入选项",
+            "",
+            "文本和 CSV 文件 (*.txt *.csv);;选项文件 (*.json *.rcb *.ndjson *.jsonl)"
+        )
+        if filename:
+            self.filename = filename
+            self.accept()
+
+
+class CatalogSearchDialog(QDialog):
+    # 在 saved_options 目录的索引中边输入边查找选项集，双击结果加载
+    refreshed = pyqtSignal()
+    
+    def __init__(self, catalog, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("查找选项集")
+        self.resize(520, 420)
+        self.catalog = catalog
+        self.results = []
+        self.selected_name = None
+        self.refresh_done = False
+        
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setFont(QFont("Microsoft YaHei", 13))
+        self.query_edit.setPlaceholderText("输入选项或文件名...")
+        self.query_edit.textChanged.connect(self.search)
+        layout.addWidget(self.query_edit)
+        
+        self.results_list = QListWidget(self)
+        self.results_list.setFont(QFont("Microsoft YaHei", 11))
+        self.results_list.itemActivated.connect(self.open_selected)
+        layout.addWidget(self.results_list)
+        
+        self.status_label = QLabel("正在更新索引...", self)
+        self.status_label.setFont(QFont("Microsoft YaHei", 9))
+        layout.addWidget(self.status_label)
+        
+        # 在后台线程中增量刷新索引，信号会被排队到界面线程处理
+        self.refreshed.connect(self._on_refreshed)
+        catalog.refresh_async(on_done=self.refreshed.emit)
+    
+    def _on_refreshed(self):
+        self.refresh_done = True
+        self.search()
+    
+    def search(self):
+        self.results = self.catalog.search(self.query_edit.text())
+        self.results_list.clear()
+        for match in self.results:
+            text = f"{match.name}  ({match.count} 个选项)"
+            if match.matches:
+                text += "  匹配: " + ", ".join(match.matches)
+            self.results_list.addItem(text)
+        
+        state = "" if self.refresh_done else "正在更新索引... | "
+        self.status_label.setText(f"{state}已索引 {len(self.catalog.files)} 个选项集 | 找到 {len(self.results)} 个")
+    
+    def open_selected(self):
+        row = self.results_list.currentRow()
+        if row >= 0:
+            self.selected_name = self.results[row].name
+            self.accept()
+
+
+class ProfilerDialog(QDialog):
+    # 性能记录（见 chooser_profile.py）：开关、查看每种操作的耗时统计、导出和用 cProfile 分析下一次操作
+    def __init__(self, on_toggle, on_profiled, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能记录")
+        self.resize(640, 420)
+        self.on_toggle = on_toggle
+        self.on_profiled = on_profiled
+        
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        self.enabled_check = QCheckBox("开启性能记录", self)
+        self.enabled_check.setChecked(PROFILER.enabled)
+        self.enabled_check.toggled.connect(self.on_toggle)
+        top_layout.addWidget(self.enabled_check)
+        top_layout.addStretch()
+        clear_button = QPushButton("清空", self)
+        clear_button.clicked.connect(self.clear)
+        top_layout.addWidget(clear_button)
+        layout.addLayout(top_layout)
+        
+        self.text_edit = QPlainTextEdit(self)
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.text_edit.setFont(QFont("Consolas", 10))
+        layout.addWidget(self.text_edit)
+        
+        buttons_layout = QHBoxLayout()
+        for text, slot in (("导出统计...", lambda: self.export("json")),
+                           ("导出 Chrome trace...", lambda: self.export("trace")),
+                           ("分析下一次操作...", self.profile_next)):
+            button = QPushButton(text, self)
+            button.clicked.connect(slot)
+            buttons_layout.addWidget(button)
+        layout.addLayout(buttons_layout)
+        
+        # 窗口打开期间每秒刷新一次统计
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(1000)
+        self.refresh()
+    
+    def clear(self):
+        PROFILER.reset()
+        self.refresh()
+    
+    def refresh(self):
+        self.text_edit.setPlainText(PROFILER.summary() if PROFILER.histograms else "还没有记录，开启后操作一下界面")
+    
+    def export(self, fmt):
+        filename, _ = QFileDialog.getSaveFileName(self, "导出性能记录", "", "JSON文件 (*.json)")
+        if filename:
+            try:
+                PROFILER.export(filename, fmt)
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"导出时出错: {str(e)}")
+    
+    def profile_next(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "保存 cProfile 结果", "", "cProfile 结果 (*.prof)")
+        if filename:
+            # 分析需要开启记录
+            self.enabled_check.setChecked(True)
+            PROFILER.profile_next(filename, self.on_profiled)
+
 
 class RandomChooserQt(QMainWindow):
     def __init__(self):
@@ -21,13 +421,51 @@ class RandomChooserQt(QMainWindow):
         except:
             pass
         
-        # 存储选项的列表
-        self.options = []
+        # 存储选项的列表和随机选择器
+        self.options = OptionStore()
+        # 会话随机流：动画和最终结果各用一条子流，最终结果可以根据审计日志重放（见 chooser_audit.py）
+        self.random_stream = session_stream()
+        animation_stream, result_stream = self.random_stream.spawn(2)
+        self.chooser = Chooser(self.options, animation_stream.generator())
+        # 轮换抽取的状态：本轮已经抽中过哪些选项
+        self.rotation = Rotation(self.options)
+        # 选项的标签，每个标签一个位图索引，可以按标签条件抽取（见 chooser_tags.py）
+        self.tags = TagIndex(self.options)
+        # 撤销 / 重做（见 chooser_history.py），界面对选项的修改都经过它
+        self.history = History(self.options, self.tags, self.rotation)
+        
+        # saved_options 目录的索引，第一次查找时才创建
+        self.catalog = None
+        
+        # 文件读写都在线程池中进行：加载可以并行（新的加载会取消旧的），
+        # 保存只用一个线程，按顺序写入，后保存的内容不会被先保存的覆盖
+        self.loader = None
+        self.load_tasks = []
+        self.load_pool = QThreadPool(self)
+        self.load_pool.setMaxThreadCount(LOAD_THREADS)
+        self.save_pool = QThreadPool(self)
+        self.save_pool.setMaxThreadCount(1)
+        self.save_tasks = []
+        self.import_tasks = []
+        # 要加载的文件还在保存时，等保存结束后再加载
+        self.waiting_load = None
+        
+        # 开始筛选后在空闲时分段建立筛选索引
+        self.index_timer = QTimer(self)
+        self.index_timer.setInterval(0)
+        self.index_timer.timeout.connect(self._build_filter_index)
         
         # 设置默认保存路径
-        self.save_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_options")
-        if not os.path.exists(self.save_path):
-            os.makedirs(self.save_path)
+        self.save_path = ensure_save_path()
+        
+        # 每个最终结果都记录到审计日志
+        self.auditor = DrawAuditor(self.options, result_stream,
+                                   AuditLog(os.path.join(self.save_path, AUDIT_FILENAME)))
+        
+        # 自动保存日志（见 chooser_journal.py），窗口第一次画出来之后才创建
+        self.journal = None
+        self.recover_task = None
+        self.session_started = False
         
         # 创建主窗口部件和布局
         self.central_widget = QWidget()
@@ -38,6 +476,38 @@ class RandomChooserQt(QMainWindow):
         
         self.create_widgets()
         self.setup_styles()
+        
+        # 结果动画（见 chooser_animation.py）：只有一个控制器和一个单次触发的计时器
+        self.animation_timer = QTimer(self)
+        self.animation_timer.setSingleShot(True)
+        self.animation = SpinAnimation(self.animation_timer.start, self.animation_timer.stop,
+                                       self.result_display.setText, self._finish_choice)
+        self.animation_timer.timeout.connect(self._animation_tick)
+        
+        # 按 Esc 取消正在进行的加载
+        QShortcut(QKeySequence(Qt.Key_Escape), self, self.cancel_loading)
+        
+        # Ctrl+Z 撤销，Ctrl+Y 或 Ctrl+Shift+Z 重做（输入框有焦点时撤销的是输入框中的文字）
+        QShortcut(QKeySequence(QKeySequence.Undo), self, self.undo)
+        redo_keys = QKeySequence.keyBindings(QKeySequence.Redo)
+        for keys in ("Ctrl+Y", "Ctrl+Shift+Z"):
+            if QKeySequence(keys) not in redo_keys:
+                redo_keys.append(QKeySequence(keys))
+        for keys in redo_keys:
+            QShortcut(keys, self, self.redo)
+        
+        # 性能记录（见 chooser_profile.py）：按 F12 打开，开启时每 HEARTBEAT_MS 毫秒检查一次事件循环是否卡顿
+        self.profiler_dialog = None
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.setInterval(HEARTBEAT_MS)
+        self.heartbeat_timer.timeout.connect(lambda: PROFILER.heartbeat(self._count_widgets))
+        QShortcut(QKeySequence(Qt.Key_F12), self, self.show_profiler)
+        if PROFILER.enabled:
+            self.set_profiling(True)
+        
+        # 可以把文本或文件拖到窗口上批量导入
+        self.setAcceptDrops(True)
+        
     
     def create_widgets(self):
         # 标题区域
@@ -61,22 +531,81 @@ class RandomChooserQt(QMainWindow):
         self.option_entry.setFont(QFont("Microsoft YaHei", 13))
         self.option_entry.setPlaceholderText("输入选项...")
         self.option_entry.returnPressed.connect(self.add_option)
+        # 粘贴多行文本时作为批量导入处理
+        self.option_entry.installEventFilter(self)
+        
+        # 新选项的权重，权重越大越容易被选中
+        weight_label = QLabel("权重", self)
+        weight_label.setFont(QFont("Microsoft YaHei", 11))
+        self.weight_spinbox = QDoubleSpinBox(self)
+        self.weight_spinbox.setFont(QFont("Microsoft YaHei", 13))
+        self.weight_spinbox.setRange(0, 1000)
+        self.weight_spinbox.setDecimals(2)
+        self.weight_spinbox.setValue(1)
         
         add_button = QPushButton("添加选项", self)
         add_button.setFont(QFont("Microsoft YaHei", 11))
         add_button.clicked.connect(self.add_option)
         
         input_layout.addWidget(self.option_entry)
+        input_layout.addWidget(weight_label)
+        input_layout.addWidget(self.weight_spinbox)
         input_layout.addWidget(add_button)
         self.main_layout.addLayout(input_layout)
         
-        # 选项列表区域
+        # 选项列表区域：标题右侧是撤销和重做按钮
+        list_header_layout = QHBoxLayout()
         list_label = QLabel("当前选项列表", self)
         list_label.setFont(QFont("Microsoft YaHei", 12, QFont.Bold))
-        self.main_layout.addWidget(list_label)
+        list_header_layout.addWidget(list_label)
+        list_header_layout.addStretch()
+        self.undo_button = QPushButton("撤销", self)
+        self.redo_button = QPushButton("重做", self)
+        for button in [self.undo_button, self.redo_button]:
+            button.setFont(QFont("Microsoft YaHei", 10))
+            list_header_layout.addWidget(button)
+        self.undo_button.clicked.connect(self.undo)
+        self.redo_button.clicked.connect(self.redo)
+        self.main_layout.addLayout(list_header_layout)
+        
+        # 筛选区域：输入时实时筛选列表
+        filter_layout = QHBoxLayout()
+        self.filter_entry = QLineEdit(self)
+        self.filter_entry.setFont(QFont("Microsoft YaHei", 11))
+        self.filter_entry.setPlaceholderText("筛选选项...")
+        self.filter_entry.setClearButtonEnabled(True)
+        self.filter_entry.textChanged.connect(self.apply_filter)
+        
+        self.filter_draw_check = QCheckBox("只从筛选结果中抽取", self)
+        self.filter_draw_check.setFont(QFont("Microsoft YaHei", 10))
         
-        self.options_list = QListWidget(self)
+        # 一次给筛选结果（没有筛选条件时为全部选项）加上或去掉标签
+        bulk_tag_button = QPushButton("批量设置标签", self)
+        bulk_tag_button.setFont(QFont("Microsoft YaHei", 10))
+        bulk_tag_button.clicked.connect(self.bulk_tag)
+        
+        filter_layout.addWidget(self.filter_entry)
+        filter_layout.addWidget(self.filter_draw_check)
+        filter_layout.addWidget(bulk_tag_button)
+        self.main_layout.addLayout(filter_layout)
+        
+        self.options_model = OptionListModel(self.options, self.tags, self.history, self)
+        # 用单列、固定行高的 QTableView 显示列表：QListView 每次重新布局都会
+        # 逐行调用模型，选项很多时会越来越慢，固定行高的表头则不需要访问每一行
+        self.options_list = QTableView(self)
         self.options_list.setFont(QFont("Microsoft YaHei", 12))
+        self.options_list.setModel(self.options_model)
+        self.options_list.horizontalHeader().hide()
+        self.options_list.horizontalHeader().setStretchLastSection(True)
+        self.options_list.verticalHeader().hide()
+        self.options_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.options_list.verticalHeader().setDefaultSectionSize(40)
+        self.options_list.setShowGrid(False)
+        self.options_list.setWordWrap(False)
+        self.options_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.options_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        # 双击选项修改权重
+        self.options_list.doubleClicked.connect(self.edit_option_weight)
         self.main_layout.addWidget(self.options_list)
         
         # 操作按钮区域
@@ -86,15 +615,30 @@ class RandomChooserQt(QMainWindow):
         clear_button = QPushButton("清空所有", self)
         save_button = QPushButton("保存选项", self)
         load_button = QPushButton("加载选项", self)
+        search_button = QPushButton("查找选项集", self)
+        import_button = QPushButton("批量导入", self)
+        tag_button = QPushButton("编辑标签", self)
         
-        for button in [delete_button, clear_button, save_button, load_button]:
+        for button in [delete_button, clear_button, save_button, load_button, search_button, import_button,
+                       tag_button]:
             button.setFont(QFont("Microsoft YaHei", 10))
             buttons_layout.addWidget(button)
         
+        # 开启后每次修改都会记录下来，下次启动时自动恢复
+        self.autosave_check = QCheckBox("自动保存", self)
+        self.autosave_check.setFont(QFont("Microsoft YaHei", 10))
+        self.autosave_check.toggled.connect(self.toggle_autosave)
+        # 自动保存准备好之前不能切换
+        self.autosave_check.setEnabled(False)
+        buttons_layout.addWidget(self.autosave_check)
+        
         delete_button.clicked.connect(self.delete_option)
         clear_button.clicked.connect(self.clear_options)
         save_button.clicked.connect(self.save_options)
         load_button.clicked.connect(self.load_options)
+        search_button.clicked.connect(self.search_saved_sets)
+        import_button.clicked.connect(self.bulk_import)
+        tag_button.clicked.connect(self.edit_option_tags)
         
         self.main_layout.addLayout(buttons_layout)
         
@@ -105,6 +649,34 @@ class RandomChooserQt(QMainWindow):
         choose_button.clicked.connect(self.choose_random)
         self.main_layout.addWidget(choose_button)
         
+        choose_options_layout = QHBoxLayout()
+        choose_options_layout.addStretch()
+        
+        # 标签条件：只从符合条件的选项中抽取，例如「素食 -本周吃过」
+        tag_label = QLabel("标签条件", self)
+        tag_label.setFont(QFont("Microsoft YaHei", 10))
+        self.tag_entry = QLineEdit(self)
+        self.tag_entry.setFont(QFont("Microsoft YaHei", 10))
+        self.tag_entry.setPlaceholderText("例如：素食 -本周吃过")
+        self.tag_entry.setClearButtonEnabled(True)
+        self.tag_entry.textChanged.connect(self.update_status)
+        choose_options_layout.addWidget(tag_label)
+        choose_options_layout.addWidget(self.tag_entry)
+        
+        # 轮换抽取：所有选项都抽中过一次之前不会重复
+        self.rotation_check = QCheckBox("轮换抽取（一轮内不重复）", self)
+        self.rotation_check.setFont(QFont("Microsoft YaHei", 10))
+        self.rotation_check.toggled.connect(self.update_status)
+        choose_options_layout.addWidget(self.rotation_check)
+        
+        # 跳过动画，点击后立即显示结果
+        self.no_animation_check = QCheckBox("跳过动画", self)
+        self.no_animation_check.setFont(QFont("Microsoft YaHei", 10))
+        choose_options_layout.addWidget(self.no_animation_check)
+        
+        choose_options_layout.addStretch()
+        self.main_layout.addLayout(choose_options_layout)
+        
         # 结果显示区域
         result_label = QLabel("结果", self)
         result_label.setFont(QFont("Microsoft YaHei", 12))
@@ -158,21 +730,33 @@ class RandomChooserQt(QMainWindow):
             QPushButton[text="加载选项"] {
                 background-color: #9c27b0;
             }
+            QPushButton[text="查找选项集"] {
+                background-color: #607d8b;
+            }
+            QPushButton[text="批量导入"] {
+                background-color: #009688;
+            }
+            QPushButton[text="撤销"], QPushButton[text="重做"] {
+                background-color: #795548;
+            }
+            QPushButton[text="撤销"]:disabled, QPushButton[text="重做"]:disabled {
+                background-color: #bcaaa4;
+            }
             QPushButton[text="随机选择"] {
                 background-color: #3f51b5;
                 font-size: 16px;
             }
-            QListWidget {
+            QTableView {
                 background-color: white;
                 border: 1px solid #ddd;
                 border-radius: 4px;
                 padding: 5px;
             }
-            QListWidget::item {
+            QTableView::item {
                 padding: 8px;
                 border-bottom: 1px solid #eee;
             }
-            QListWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #a6d4fa;
                 color: black;
             }
@@ -186,26 +770,182 @@ class RandomChooserQt(QMainWindow):
             }
         """)
     
+    @pyqtSlot()
+    @timed()
     def add_option(self):
         option = self.option_entry.text().strip()
         if option:
-            self.options.append(option)
-            self.options_list.addItem(option)
+            self.options_model.append_options([option], [self.weight_spinbox.value()])
+            self.options_list.scrollToBottom()
             self.option_entry.clear()
             self.update_status()
         else:
             QMessageBox.warning(self, "警告", "请输入有效的选项!")
     
+    def eventFilter(self, obj, event):
+        if (obj is self.option_entry and event.type() == QEvent.KeyPress
+                and event.matches(QKeySequence.Paste)):
+            text = QApplication.clipboard().text()
+            if "\n" in text.strip():
+                self.import_text(text)
+                return True
+        return super().eventFilter(obj, event)
+    
+    def dragEnterEvent(self, event):
+        mime = event.mimeData()
+        if mime.hasUrls() or mime.hasText():
+            event.acceptProposedAction()
+    
+    def dropEvent(self, event):
+        mime = event.mimeData()
+        files = [url.toLocalFile() for url in mime.urls() if url.isLocalFile()]
+        for filename in files:
+            self.import_file(filename)
+        if not files and mime.hasText():
+            self.import_text(mime.text())
+        event.acceptProposedAction()
+    
+    def bulk_import(self):
+        dialog = BulkImportDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        if dialog.filename:
+            self.import_file(dialog.filename)
+        else:
+            self.import_text(dialog.text_edit.toPlainText(), dialog.text_format())
+    
+    def import_text(self, text, fmt="text"):
+        from chooser_stream import split_option_text
+        try:
+            options, weights = split_option_text(text, fmt)
+        except OptionFormatError:
+            QMessageBox.critical(self, "错误", "CSV 格式不正确!")
+            return
+        self._import_options(options, weights)
+    
+    def import_file(self, filename):
+        # 在线程池中读取和拆分文件，完成后一次追加
+        task = ImportTask(filename)
+        task.signals.result.connect(partial(self._on_import_read, task))
+        task.signals.failed.connect(partial(self._on_import_failed, task))
+        self.import_tasks.append(task)
+        self.load_pool.start(task)
+        self.statusBar().showMessage(f"正在导入 {os.path.basename(filename)}...")
+    
+    def _on_import_read(self, task, result):
+        self.import_tasks.remove(task)
+        self._import_options(*result)
+    
+    def _on_import_failed(self, task, error):
+        self.import_tasks.remove(task)
+        self.update_status()
+        if isinstance(error, (OptionFormatError, ValueError)):
+            QMessageBox.critical(self, "错误", "文件格式不正确!")
+        else:
+            QMessageBox.critical(self, "错误", f"加载文件时出错: {str(error)}")
+    
+    @timed()
+    def _import_options(self, options, weights):
+        # 去掉列表中已有的选项后一次追加：模型只发出一次插入信号，状态栏也只刷新一次
+        new_options, new_weights = self.options.unique(options, weights)
+        self.options_model.append_options(new_options, new_weights)
+        if new_options:
+            self.options_list.scrollToBottom()
+        self._update_history_buttons()
+        self.statusBar().showMessage(
+            f"已导入 {len(new_options)} 个选项，跳过重复 {len(options) - len(new_options)} 个"
+            f" | 选项数量: {len(self.options)}")
+    
+    def edit_option_weight(self, index):
+        row = index.row()
+        source = self.options_model.source_index(row)
+        weight, ok = QInputDialog.getDouble(self, "设置权重", f"「{self.options[source]}」的权重:",
+                                            self.options.weight(source), 0, 1000, 2)
+        if ok:
+            self.options_model.set_weight(row, weight)
+            self._update_history_buttons()
+    
+    def edit_option_tags(self):
+        current_index = self.options_list.currentIndex()
+        if not current_index.isValid():
+            QMessageBox.information(self, "提示", "请先选择要编辑标签的选项!")
+            return
+        source = self.options_model.source_index(current_index.row())
+        text, ok = QInputDialog.getText(self, "编辑标签", f"「{self.options[source]}」的标签（空格分隔）:",
+                                        text=" ".join(self.tags.tags_of(source)))
+        if not ok:
+            return
+        try:
+            self.history.set_tags(source, parse_tags(text))
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.options_model.dataChanged.emit(current_index, current_index)
+        self.update_status()
+    
+    @pyqtSlot()
+    @timed()
+    def bulk_tag(self):
+        # 给筛选结果（没有筛选条件时为全部选项）加上标签，前面加 "-" 的标签表示去掉
+        view = self.options_model.view
+        if not len(view):
+            QMessageBox.information(self, "提示", "没有可以设置标签的选项!")
+            return
+        scope = "筛选结果中的" if view.active else "全部"
+        text, ok = QInputDialog.getText(self, "批量设置标签",
+                                        f"给{scope} {len(view)} 个选项加上标签（空格分隔，前面加 - 表示去掉）:")
+        if not ok:
+            return
+        add, remove = parse_query(text)
+        try:
+            for name in add:
+                check_tag(name)
+            self.history.update_tags(view.indices, add, remove)
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", str(e))
+            return
+        self.options_model.refresh_rows()
+        self.update_status()
+    
+    @pyqtSlot(str)
+    @timed()
+    def apply_filter(self, text):
+        self.options_model.set_filter(text)
+        self.options_list.scrollToTop()
+        self.update_status()
+        if not self.options_model.view.index_ready:
+            self.index_timer.start()
+    
+    def _build_filter_index(self):
+        if not self.options_model.view.build_index():
+            self.index_timer.stop()
+    
+    def _draw_conditions(self):
+        # 抽取条件 (筛选条件, 标签条件)；只有勾选了「只从筛选结果中抽取」时才使用筛选条件
+        view = self.options_model.view
+        query = view.query if self.filter_draw_check.isChecked() and view.active else ""
+        return query, self.tag_entry.text().strip()
+    
+    def _draw_subset(self):
+        # 按抽取条件返回可以抽取的存储下标（筛选结果、标签条件的结果或两者的交集），没有条件时返回 None
+        query, tag_query = self._draw_conditions()
+        subset = self.options_model.view.indices if query else None
+        if tag_query:
+            subset = self.tags.select(tag_query, subset)
+        return subset
+    
+    @pyqtSlot()
+    @timed()
     def delete_option(self):
-        current_item = self.options_list.currentItem()
-        if current_item:
-            row = self.options_list.row(current_item)
-            self.options_list.takeItem(row)
-            self.options.pop(row)
+        current_index = self.options_list.currentIndex()
+        if current_index.isValid():
+            self.options_model.remove_row(current_index.row())
             self.update_status()
         else:
             QMessageBox.information(self, "提示", "请先选择要删除的选项!")
     
+    @pyqtSlot()
+    @timed()
     def clear_options(self):
         # 创建确认对话框并设置中文按钮文本
         msg_box = QMessageBox(self)
@@ -222,35 +962,84 @@ class RandomChooserQt(QMainWindow):
         msg_box.exec_()
         reply = msg_box.clickedButton()
         if reply == yes_button:
-            # 清空列表控件
-            self.options_list.clear()
-            # 清空选项列表
-            self.options.clear()
+            self.animation.cancel()
+            # 清空选项列表和列表视图（可以撤销）
+            self.options_model.batch(self.history.clear)
             # 清空结果显示
             self.result_display.setText("等待选择...")
             # 更新状态栏
             self.update_status()
     
+    @pyqtSlot()
+    @timed()
+    def undo(self):
+        self._step_history(self.history.undo, "撤销")
+    
+    @pyqtSlot()
+    @timed()
+    def redo(self):
+        self._step_history(self.history.redo, "重做")
+    
+    def _step_history(self, step, action):
+        # 加载过程中选项还在变化，完成或取消后才能撤销、重做
+        if self.loader is not None:
+            self.statusBar().showMessage(f"正在加载，完成或取消后才能{action}")
+            return
+        label = self.options_model.batch(step)
+        view = self.options_model.view
+        if view.active and not view.index_ready:
+            self.index_timer.start()
+        self.update_status()
+        if label is None:
+            self.statusBar().showMessage(f"没有可以{action}的操作 | 选项数量: {len(self.options)}")
+        else:
+            self.statusBar().showMessage(f"已{action}: {label} | 选项数量: {len(self.options)}")
+    
+    def _update_history_buttons(self):
+        loading = self.loader is not None
+        self.undo_button.setEnabled(self.history.can_undo and not loading)
+        self.redo_button.setEnabled(self.history.can_redo and not loading)
+        undo_label, redo_label = self.history.undo_label(), self.history.redo_label()
+        self.undo_button.setToolTip(f"撤销: {undo_label} (Ctrl+Z)" if undo_label else "")
+        self.redo_button.setToolTip(f"重做: {redo_label} (Ctrl+Y)" if redo_label else "")
+    
+    @pyqtSlot()
+    @timed()
     def choose_random(self):
         if not self.options:
             QMessageBox.information(self, "提示", "请先添加一些选项!")
             return
+        subset = self._draw_subset()
+        if not self.chooser.can_choose(subset):
+            QMessageBox.information(self, "提示", "没有可以抽取的选项!")
+            return
         
-        self.animation_count = 10
-        self.choose_animation()
+        if self.no_animation_check.isChecked():
+            self.animation.cancel()
+            self._finish_choice()
+            return
+        # 动画进行中再次点击会从头开始
+        self.animation.start(self.chooser.animation_frames(FRAME_COUNT, subset))
     
-    def choose_animation(self):
-        if self.animation_count > 0:
-            random_option = random.choice(self.options)
-            self.result_display.setText(random_option)
-            delay = int(100 * (1 + (10-self.animation_count)/5))
-            self.animation_count -= 1
-            QTimer.singleShot(delay, self.choose_animation)
-        else:
-            final_choice = random.choice(self.options)
-            self.result_display.setText(final_choice)
-            self.statusBar().showMessage(f"已选择: {final_choice} | 选项数量: {len(self.options)}")
+    @timed()
+    def _animation_tick(self):
+        self.animation.tick()
     
+    @timed()
+    def _finish_choice(self):
+        # 最终选择（动画期间选项可能被修改，这里重新检查）
+        subset = self._draw_subset()
+        if not self.chooser.can_choose(subset):
+            return
+        rotation = self.rotation if self.rotation_check.isChecked() else None
+        query, tag_query = self._draw_conditions()
+        final_choice = self.options[self.auditor.choose_index(subset, query, rotation, tag_query)]
+        self.result_display.setText(final_choice)
+        self.statusBar().showMessage(
+            f"已选择: {final_choice} | 选项数量: {len(self.options)}{self._rotation_status()}")
+    
+    @pyqtSlot()
+    @timed()
     def save_options(self):
         if not self.options:
             QMessageBox.warning(self, "警告", "没有选项可保存!")
@@ -260,45 +1049,259 @@ class RandomChooserQt(QMainWindow):
             self,
             "保存选项列表",
             self.save_path,
-            "JSON文件 (*.json)"
+            "JSON文件 (*.json);;二进制选项文件 (*.rcb)"
         )
         
         if filename:
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump({"options": self.options}, f, ensure_ascii=False, indent=2)
-            
-            self.statusBar().showMessage(f"已保存 | 选项数量: {len(self.options)}")
+            # 轮换抽取进行到一半时一起保存本轮已抽中的选项
+            drawn = self.rotation.drawn_indices() if self.rotation_check.isChecked() else None
+            # 保存的是此刻的快照，写入期间可以继续修改选项
+            task = SaveTask(filename, *self.options.snapshot(), drawn, self.tags.snapshot())
+            task.signals.progress.connect(self._on_save_progress)
+            task.signals.finished.connect(partial(self._on_save_finished, task))
+            task.signals.failed.connect(partial(self._on_save_failed, task))
+            self.save_tasks.append(task)
+            self.save_pool.start(task)
+            self.statusBar().showMessage("正在保存...")
+    
+    def _on_save_progress(self, progress):
+        self.statusBar().showMessage(f"正在保存 {progress:.0%} | 选项数量: {len(self.options)}")
+    
+    def _on_save_finished(self, task, filename):
+        self.save_tasks.remove(task)
+        self.statusBar().showMessage(f"已保存 | 选项数量: {len(task.options)}")
+        self._start_waiting_load()
+    
+    def _on_save_failed(self, task, error):
+        self.save_tasks.remove(task)
+        self.update_status()
+        QMessageBox.critical(self, "错误", f"保存文件时出错: {str(error)}")
+        self._start_waiting_load()
+    
+    def _saving(self, filename):
+        filename = os.path.abspath(filename)
+        return any(os.path.abspath(task.filename) == filename for task in self.save_tasks)
+    
+    def _start_waiting_load(self):
+        if self.waiting_load is not None and not self._saving(self.waiting_load):
+            filename, self.waiting_load = self.waiting_load, None
+            self.start_loading(filename)
     
     def load_options(self):
         filename, _ = QFileDialog.getOpenFileName(
             self,
             "加载选项列表",
             self.save_path,
-            "JSON文件 (*.json)"
+            "选项文件 (*.json *.rcb *.ndjson *.jsonl *.txt);;JSON文件 (*.json);;"
+            "二进制选项文件 (*.rcb);;NDJSON文件 (*.ndjson *.jsonl);;文本文件 (*.txt)"
         )
         
         if filename:
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                if "options" in data and isinstance(data["options"], list):
-                    self.options_list.clear()
-                    self.options.clear()
-                    
-                    for option in data["options"]:
-                        self.options.append(option)
-                        self.options_list.addItem(option)
-                    
-                    self.update_status()
-                    QMessageBox.information(self, "成功", f"已加载 {len(self.options)} 个选项")
-                else:
+            self.start_loading(filename)
+    
+    def search_saved_sets(self):
+        if self.catalog is None:
+            from chooser_catalog import Catalog
+            self.catalog = Catalog(self.save_path)
+        dialog = CatalogSearchDialog(self.catalog, self)
+        if dialog.exec_() == QDialog.Accepted and dialog.selected_name:
+            self.start_loading(os.path.join(self.save_path, dialog.selected_name))
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        # 窗口第一次画出来之后再在事件循环中准备自动保存，启动时尽快显示窗口
+        if not self.session_started:
+            self.session_started = True
+            QTimer.singleShot(0, self.start_session)
+    
+    def start_session(self):
+        from chooser_journal import Journal
+        self.journal = Journal(self.save_path)
+        # 存在自动保存文件说明上次开启了自动保存，恢复上次的选项
+        if self.journal.exists():
+            self.restore_autosave()
+        else:
+            self.autosave_check.setEnabled(True)
+    
+    def restore_autosave(self):
+        # 在线程池中读取快照和重放日志，窗口在恢复期间照常响应
+        task = RecoverTask(self.journal)
+        task.signals.result.connect(self._on_autosave_recovered)
+        task.signals.failed.connect(self._on_autosave_failed)
+        self.recover_task = task
+        self.load_pool.start(task)
+        self.statusBar().showMessage("正在恢复上次的选项...")
+    
+    def _on_autosave_recovered(self, state):
+        self.recover_task = None
+        self.autosave_check.setEnabled(True)
+        # 恢复期间开始加载了文件时不再恢复，自动保存从加载的选项开始记录
+        if state and self.loader is None:
+            options, weights, drawn, tags = state
+            # 恢复期间添加的选项保留在前面，恢复出来的标签和轮换进度跟着选项后移
+            offset = len(self.options)
+            if offset:
+                self.options_model.append_options(options, weights)
+                for name, bits in tags.items():
+                    self.tags.update([offset + i for i in bits_to_indices(bits)], add=[name])
+                drawn = self.rotation.drawn_indices() + [offset + i for i in drawn]
+            else:
+                self.options_model.reset_options(options, weights)
+                self.tags.load(tags)
+            if drawn:
+                self.rotation.restore(drawn)
+                self.rotation_check.setChecked(True)
+            self.options_model.refresh_rows()
+            # 恢复出来的选项不能撤销，之前的撤销记录也对不上了
+            self.history.forget()
+        # 勾选复选框时开始记录
+        self.journal.on_error = self._on_autosave_failed
+        self.autosave_check.setChecked(True)
+        self.update_status()
+    
+    def _on_autosave_failed(self, error):
+        if self.recover_task is None:
+            # 写自动保存出错：已经停止记录，已有的文件保留，下次启动仍能恢复到出错之前；
+            # 取消勾选时不触发 toggle_autosave()，否则会删除这些文件
+            self.autosave_check.blockSignals(True)
+            self.autosave_check.setChecked(False)
+            self.autosave_check.blockSignals(False)
+            # 出错时正在通知选项的修改，提示留到事件循环中再弹出
+            QTimer.singleShot(0, partial(QMessageBox.critical, self, "错误", f"自动保存失败，已停止: {error}"))
+            return
+        # 自动保存文件损坏时把它们放到一边（改名为 *.damaged），从当前的选项重新开始自动保存
+        self.recover_task = None
+        self.journal.set_aside()
+        self.journal.on_error = self._on_autosave_failed
+        self.autosave_check.setEnabled(True)
+        self.autosave_check.setChecked(True)
+        self.update_status()
+    
+    def toggle_autosave(self, checked):
+        if checked:
+            self.journal.start(self.options, self.tags, self.rotation)
+        else:
+            self.journal.stop()
+    
+    def start_loading(self, filename):
+        # 在线程池中流式读取文件，分批加入列表，第一批选项马上就能显示；
+        # 正在进行的加载会被取消，它之后发出的信号也不再处理
+        self.cancel_loading()
+        if self._saving(filename):
+            self.waiting_load = filename
+            self.statusBar().showMessage("正在等待保存完成...")
+            return
+        # 加载前的选项可以撤销回来；加载的各个批次不单独记录，撤销「加载选项」一次回到加载前
+        self.options_model.batch(self.history.clear, "加载选项")
+        self.history.recording = False
+        task = LoadTask(filename)
+        self.loader = task.loader
+        self._update_history_buttons()
+        task.signals.ready.connect(partial(self._on_loader_ready, task))
+        # 线程结束之前一直保留任务对象
+        task.signals.finished.connect(partial(self._on_load_task_finished, task))
+        self.load_tasks.append(task)
+        self.load_pool.start(task)
+    
+    def _on_load_task_finished(self, task, filename):
+        self.load_tasks.remove(task)
+        # 读取线程已经结束，不会再有 ready 信号，取回剩下的事件
+        self._on_loader_ready(task)
+    
+    @timed()
+    def _on_loader_ready(self, task):
+        loader = task.loader
+        if loader is not self.loader:
+            return
+        task.notified = False
+        for event in loader.poll():
+            if event[0] == "options":
+                self.options_model.append_options(event[1], event[2])
+            elif event[0] == "weights":
+                self.options_model.set_weights(event[1], event[2])
+            elif event[0] == "drawn":
+                # 文件中保存了轮换进度，接着上次的轮换继续抽取
+                self.rotation.restore(event[1])
+                self.rotation_check.setChecked(True)
+            elif event[0] == "tags":
+                self.tags.load(event[1])
+                self.options_model.refresh_rows()
+            elif event[0] == "done":
+                self.loader = None
+                self.history.recording = True
+                self.update_status()
+                QMessageBox.information(self, "成功", f"已加载 {len(self.options)} 个选项")
+                return
+            else:
+                # 文件有问题时不保留加载了一半的选项
+                self.loader = None
+                self.options_model.reset_options([])
+                self.history.recording = True
+                self.update_status()
+                if isinstance(event[1], OptionFormatError):
                     QMessageBox.critical(self, "错误", "文件格式不正确!")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"加载文件时出错: {str(e)}")
+                else:
+                    QMessageBox.critical(self, "错误", f"加载文件时出错: {str(event[1])}")
+                return
+        
+        self.statusBar().showMessage(
+            f"正在加载 {loader.progress:.0%} (按 Esc 取消) | 选项数量: {len(self.options)}")
+        # 一次只取回一部分事件；读取线程还在运行时放入新事件会再发出 ready，
+        # 已经结束时剩下的事件等界面处理完其他事件之后再取
+        if task.done and not loader.events.empty():
+            QTimer.singleShot(0, partial(self._on_loader_ready, task))
+    
+    def cancel_loading(self):
+        self.waiting_load = None
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+            self.history.recording = True
+            self.update_status()
     
+    def closeEvent(self, event):
+        # 等待还没写完的保存，取消正在进行的加载
+        self.cancel_loading()
+        self.save_pool.waitForDone()
+        super().closeEvent(event)
+    
+    def _rotation_status(self):
+        if not self.rotation_check.isChecked():
+            return ""
+        return f" | 本轮已抽取: {self.rotation.drawn_count}/{len(self.options)}"
+    
+    @pyqtSlot()
+    @timed()
     def update_status(self):
-        self.statusBar().showMessage(f"就绪 | 选项数量: {len(self.options)}")
+        view = self.options_model.view
+        status = f"就绪 | 选项数量: {len(self.options)}"
+        if view.active:
+            status += f" | 筛选结果: {len(view)}"
+        tag_query = self.tag_entry.text().strip()
+        if tag_query:
+            status += f" | 符合标签条件: {len(self.tags.select(tag_query))}"
+        self.statusBar().showMessage(status + self._rotation_status())
+        self._update_history_buttons()
+
+    def show_profiler(self):
+        if self.profiler_dialog is None:
+            self.profiler_dialog = ProfilerDialog(
+                self.set_profiling,
+                lambda filename, name: self.statusBar().showMessage(f"已保存 {name} 的分析结果: {filename}"),
+                self)
+        self.profiler_dialog.show()
+        self.profiler_dialog.raise_()
+    
+    def set_profiling(self, enabled):
+        PROFILER.enabled = enabled
+        PROFILER.stop_heartbeat()
+        if enabled:
+            self.heartbeat_timer.start()
+        else:
+            self.heartbeat_timer.stop()
+    
+    def _count_widgets(self):
+        return len(QApplication.allWidgets())
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,138 @@
+# 可复现的随机流和审计日志：记录下来的每次抽取都能在同一个选项集上重放出相同的结果：python -m pytest tests
+import json
+import os
+import pickle
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_audit import AuditIndex, AuditLog, DrawAuditor, RandomStream, RotationReplay, main, rederive
+from chooser_engine import OptionStore, save_options_file
+from chooser_filter import OptionFilter
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex
+
+
+class MemoryLog:
+    def __init__(self):
+        self.items = []
+
+    def record(self, entry):
+        self.items.append(entry)
+
+
+def test_stream_positions_are_independent_of_history():
+    stream = RandomStream(7, [1])
+    values = [stream.generator().random() for _ in range(5)]
+    assert RandomStream(7, [1]).generator(3).random() == values[3]
+    copy = pickle.loads(pickle.dumps(stream))
+    assert copy.generator().random() == stream.generator().random()
+    children = stream.spawn(2) + stream.spawn(1)
+    assert len({child.path for child in children}) == 3
+    assert children[0].generator(0).random() != children[1].generator(0).random()
+
+
+def test_audit_index_matches_a_fresh_one_after_edits():
+    rng = random.Random(1)
+    store = OptionStore([f"o{i}" for i in range(300)], [rng.random() for _ in range(300)])
+    index = AuditIndex(store)
+    for step in range(200):
+        op = rng.random()
+        if op < 0.4:
+            store.set_weight(rng.randrange(len(store)), rng.random())
+        elif op < 0.7:
+            store.add(f"n{step}", rng.random())
+        elif len(store) > 10:
+            store.remove_at(rng.randrange(len(store)))
+    fresh = AuditIndex(store, subscribe=False)
+    assert index.set_hash() == fresh.set_hash()
+    assert [index.sample(random.Random(seed)) for seed in range(50)] == \
+           [fresh.sample(random.Random(seed)) for seed in range(50)]
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_plain_filtered_and_tagged_draws_are_rederived(weighted):
+    rng = random.Random(2)
+    options = [f"{rng.choice(['红', '蓝'])}{i}" for i in range(200)]
+    store = OptionStore(options, [rng.choice([0, 1, 2.5]) for _ in options] if weighted else None)
+    tags = TagIndex(store)
+    tags.update(range(0, 200, 3), add=["素食"])
+    log = MemoryLog()
+    auditor = DrawAuditor(store, RandomStream(11), log)
+    option_filter = OptionFilter(store)
+    option_filter.set_query("红")
+    for _ in range(10):
+        auditor.choose_index()
+        auditor.choose_index(option_filter.indices, query="红")
+        auditor.choose_index(tags.select("素食", option_filter.indices), query="红", tags="素食")
+    for entry in log.items:
+        assert rederive(entry, store, tags) == entry["index"]
+        assert store[entry["index"]] == entry["option"]
+    store.set_weight(0, 3)
+    with pytest.raises(ValueError):
+        rederive(log.items[0], store, tags)
+
+
+def test_rotation_draws_are_replayed_in_order():
+    store = OptionStore([f"o{i}" for i in range(6)])
+    rotation = Rotation(store)
+    log = MemoryLog()
+    auditor = DrawAuditor(store, RandomStream(5), log)
+    for _ in range(8):
+        auditor.choose_index(rotation=rotation)
+    # 加载保存的轮换进度之后这一轮不能重放，本轮抽完之后又可以
+    rotation.restore(rotation.drawn_indices())
+    for _ in range(6):
+        auditor.choose_index(rotation=rotation)
+    states = [entry["rotation"] for entry in log.items]
+    assert states[0] == {"drawn": 0, "start": True}
+    assert states[1] == {"drawn": 1, "follows": 0}
+    assert "start" not in states[8] and "follows" not in states[8]
+
+    replay = RotationReplay(store)
+    replayed = []
+    for entry in log.items:
+        if replay.can_rederive(entry):
+            assert replay.rederive(entry) == entry["index"]
+            replayed.append(entry["pos"])
+        else:
+            with pytest.raises(ValueError):
+                replay.rederive(entry)
+    assert replayed == [0, 1, 2, 3, 4, 5, 6, 7, 12, 13]
+    with pytest.raises(ValueError):
+        rederive(log.items[1], store)
+
+
+def test_log_rolls_over_and_keeps_order(tmp_path):
+    log = AuditLog(str(tmp_path / ".audit.log"), max_bytes=200)
+    for pos in range(40):
+        log.record({"pos": pos, "option": "选项" * 5})
+    positions = [entry["pos"] for entry in log.entries()]
+    assert positions == list(range(positions[0], 40)) and positions[0] > 0
+    assert os.path.getsize(tmp_path / ".audit.log.1") > 200
+    assert set(os.listdir(tmp_path)) <= {".audit.log", ".audit.log.1"}
+
+
+def test_main_checks_the_log(tmp_path, capsys):
+    filename = str(tmp_path / "options.json")
+    save_options_file(filename, [f"o{i}" for i in range(20)], [1 + i % 3 for i in range(20)])
+    log_name = str(tmp_path / ".audit.log")
+    store = OptionStore([f"o{i}" for i in range(20)], [1 + i % 3 for i in range(20)])
+    auditor = DrawAuditor(store, RandomStream(3), AuditLog(log_name))
+    rotation = Rotation(store)
+    for _ in range(5):
+        auditor.choose_index()
+        auditor.choose_index(rotation=rotation)
+    assert main([filename, log_name]) == 0
+    assert "已核对 10 条记录，不一致 0 条" in capsys.readouterr().out
+
+    with open(log_name, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    entries[0]["index"] = (entries[0]["index"] + 1) % 20
+    entries[0]["option"] = store[entries[0]["index"]]
+    with open(log_name, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    assert main([filename, log_name]) == 1
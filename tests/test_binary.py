@@ -0,0 +1,46 @@
+# 选项文件在 JSON 和二进制格式之间转换：python -m pytest tests
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionFormatError, load_options_file
+from chooser_binary import convert_options_file, load_drawn, save_binary_file
+from chooser_tags import bits_to_indices, load_tags
+
+
+def read_all(filename):
+    options, weights = load_options_file(filename)
+    tags = {name: bits_to_indices(bits) for name, bits in load_tags(filename, len(options)).items()}
+    return list(options), weights, load_drawn(filename), tags
+
+
+def test_round_trip_keeps_weights_rotation_and_tags(tmp_path):
+    source = tmp_path / "options.json"
+    source.write_text(json.dumps({"options": ["甲", "乙", "丙", "丁"], "weights": [1, 2.5, 0, 4],
+                                  "drawn": [3, 1], "tags": {"红": [0, 2], "蓝": [3]}},
+                                 ensure_ascii=False), encoding="utf-8")
+    binary = str(tmp_path / "options.rcb")
+    back = str(tmp_path / "back.json")
+
+    assert convert_options_file(str(source), binary) == 4
+    assert convert_options_file(binary, back) == 4
+    expected = (["甲", "乙", "丙", "丁"], [1.0, 2.5, 0.0, 4.0], [3, 1], {"红": [0, 2], "蓝": [3]})
+    assert read_all(binary) == expected
+    assert read_all(back) == expected
+
+
+def test_round_trip_without_rotation(tmp_path):
+    source = tmp_path / "options.json"
+    source.write_text(json.dumps({"options": ["a", "b"]}), encoding="utf-8")
+    binary = str(tmp_path / "options.rcb")
+    convert_options_file(str(source), binary)
+    assert read_all(binary) == (["a", "b"], None, [], {})
+
+
+def test_non_string_options_are_rejected(tmp_path):
+    with pytest.raises(OptionFormatError):
+        save_binary_file(str(tmp_path / "options.rcb"), ["a", 1])
@@ -0,0 +1,86 @@
+# 命令行批量抽取：指定种子时结果可重复（与进程数无关），各种输出格式和出错时的退出码：python -m pytest tests
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_cli import CHUNK_SIZE, main, parse_args
+from chooser_engine import save_options_file
+
+
+@pytest.fixture
+def sets(tmp_path):
+    first = str(tmp_path / "午饭.json")
+    second = str(tmp_path / "晚饭.json")
+    save_options_file(first, ["面", "饭", "粥"], [1, 2, 0])
+    save_options_file(second, ["火锅", "烧烤"], [1, 1])
+    return first, second
+
+
+def run(capsys, *argv):
+    code = main(list(argv))
+    captured = capsys.readouterr()
+    return code, captured.out, captured.err
+
+
+def test_seeded_draws_are_reproducible(capsys, sets):
+    count = str(CHUNK_SIZE * 2 + 5)
+    code, first, _ = run(capsys, sets[0], "-n", count, "--seed", "9")
+    assert code == 0
+    lines = first.splitlines()
+    assert len(lines) == CHUNK_SIZE * 2 + 5 and set(lines) == {"面", "饭"}
+    assert run(capsys, sets[0], "-n", count, "--seed", "9")[1] == first
+    assert run(capsys, sets[0], "-n", count, "--seed", "9", "--workers", "2")[1] == first
+    assert run(capsys, sets[0], "-n", count, "--seed", "10")[1] != first
+
+
+def test_without_replacement_and_ignoring_weights(capsys, sets):
+    code, out, _ = run(capsys, sets[0], "-n", "3", "--ignore-weights", "--no-replacement", "--seed", "1")
+    assert code == 0 and sorted(out.splitlines()) == ["粥", "面", "饭"]
+    code, _, err = run(capsys, sets[0], "-n", "3", "--no-replacement")
+    assert code == 1 and "最多只能抽取 2 次" in err
+
+
+def test_jsonl_and_csv_name_the_source_set(capsys, sets):
+    code, out, _ = run(capsys, *sets, "-n", "50", "--format", "jsonl", "--seed", "2")
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert code == 0 and [row["draw"] for row in rows] == list(range(1, 51))
+    source = {"面": "午饭.json", "饭": "午饭.json", "火锅": "晚饭.json", "烧烤": "晚饭.json"}
+    assert all(source[row["option"]] == row["set"] for row in rows)
+
+    code, out, _ = run(capsys, *sets, "-n", "50", "--format", "csv", "--seed", "2")
+    table = list(csv.reader(io.StringIO(out)))
+    assert table[0] == ["draw", "option", "set"]
+    assert [(int(n), option, name) for n, option, name in table[1:]] == \
+           [(row["draw"], row["option"], row["set"]) for row in rows]
+
+
+@pytest.mark.parametrize("argv", [[], ["a.json", "-n"], ["a.json", "-n", "x"], ["a.json", "-n", "-1"],
+                                  ["a.json", "--format", "xml"], ["a.json", "--bogus"]])
+def test_bad_arguments(argv, capsys):
+    with pytest.raises(ValueError):
+        parse_args(argv)
+    assert run(capsys, *argv)[0] == 2
+
+
+def test_load_errors(capsys, tmp_path):
+    bad = tmp_path / "bad.json"
+    bad.write_text("{", encoding="utf-8")
+    assert run(capsys, str(bad))[0] == 1
+    assert run(capsys, str(tmp_path / "missing.json"))[0] == 1
+    empty = str(tmp_path / "empty.json")
+    save_options_file(empty, ["a"], [0])
+    code, _, err = run(capsys, empty)
+    assert code == 1 and "没有可以抽取的选项" in err
+
+
+def test_does_not_import_gui_toolkits():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import sys, chooser_cli; "
+                    "assert not {'tkinter', 'PyQt5'} & set(sys.modules)"], cwd=root, check=True)
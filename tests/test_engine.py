@@ -0,0 +1,109 @@
+# 选项存储、随机选择和选项文件的读写：python -m pytest tests
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import (Chooser, OptionFormatError, OptionStore, check_weight, load_options_file,
+                            save_options_file)
+
+
+def test_store_notifies_every_change():
+    store = OptionStore()
+    events = []
+    store.subscribe(lambda *event: events.append(event))
+    store.add("甲")
+    store.extend(["乙", "丙"], [2, 3])
+    store.set_weight(0, 0.5)
+    store.set_weights(1, [4, 5])
+    store.clear()
+    assert events == [("insert", 0, 1), ("insert", 1, 2), ("update", 0, 1), ("update", 1, 2), ("reset", 0, 0)]
+    assert store.version == len(events)
+
+
+def test_weight_counters_follow_updates():
+    store = OptionStore(["a", "b", "c"])
+    assert not store.is_weighted() and store.choosable_count() == 3
+    store.set_weight(1, 0)
+    assert store.is_weighted() and store.choosable_count() == 2
+    store.set_weight(1, 1)
+    assert not store.is_weighted() and store.choosable_count() == 3
+
+
+def test_invalid_weights_are_rejected():
+    for weight in (-1, float("nan"), float("inf"), "x"):
+        with pytest.raises(ValueError):
+            check_weight(weight)
+    with pytest.raises(ValueError):
+        OptionStore(["a", "b"], [1])
+
+
+def test_replace_and_swap_state_restore_contents():
+    store = OptionStore(["a", "b"], [1, 2])
+    old = store.replace(["x"])
+    assert list(store) == ["x"] and store.weights() == [1.0]
+    store.swap_state(old)
+    assert list(store) == ["a", "b"] and store.weights() == [1.0, 2.0]
+    old = store.clear()
+    assert len(store) == 0
+    store.swap_state(old)
+    assert list(store) == ["a", "b"]
+
+
+def test_dedup_store_skips_existing_options():
+    store = OptionStore(["a", "a", "b"], dedup=True)
+    assert list(store) == ["a", "b"]
+    assert store.add("a") is None
+    store.extend(["b", "c", "c"])
+    assert list(store) == ["a", "b", "c"]
+    assert store.unique(["c", "d", "d"]) == (["d"], None)
+
+
+def test_seeded_chooser_is_reproducible():
+    store = OptionStore([f"o{i}" for i in range(100)])
+    first = [Chooser(store, random.Random(7)).choose() for _ in range(3)]
+    second = [Chooser(store, random.Random(7)).choose() for _ in range(3)]
+    assert first == second
+
+
+def test_chooser_respects_subset_and_zero_weights():
+    store = OptionStore(["a", "b", "c", "d"], [1, 0, 1, 0])
+    chooser = Chooser(store, random.Random(1))
+    assert {chooser.choose() for _ in range(200)} == {"a", "c"}
+    assert {chooser.choose([1, 2]) for _ in range(50)} == {"c"}
+    assert not chooser.can_choose([1, 3])
+    with pytest.raises(IndexError):
+        chooser.choose_index([1, 3])
+    with pytest.raises(IndexError):
+        Chooser(OptionStore()).choose_index()
+
+
+def test_choose_many_without_replacement_has_no_repeats():
+    store = OptionStore([f"o{i}" for i in range(20)])
+    drawn = Chooser(store, random.Random(3)).choose_many(20, replace=False)
+    assert sorted(drawn) == sorted(store)
+
+
+def test_json_round_trip(tmp_path):
+    filename = str(tmp_path / "options.json")
+    save_options_file(filename, ["甲", "乙"], [1, 2.5])
+    options, weights = load_options_file(filename)
+    assert list(options) == ["甲", "乙"] and weights == [1.0, 2.5]
+    save_options_file(filename, ["甲"], [1])
+    with open(filename, encoding="utf-8") as f:
+        assert "weights" not in json.load(f)
+    assert load_options_file(filename) == (["甲"], None)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+@pytest.mark.parametrize("content", ['{"options": [1]}', '{"options": ["a"], "weights": [1, 2]}',
+                                     '{"options": ["a"], "weights": [-1]}', '["a"]', "{", ""])
+def test_malformed_files_raise_option_format_error(tmp_path, content):
+    filename = tmp_path / "bad.json"
+    filename.write_text(content, encoding="utf-8")
+    with pytest.raises(OptionFormatError):
+        load_options_file(str(filename))
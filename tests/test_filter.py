@@ -0,0 +1,87 @@
+# 实时筛选：二元组索引和存储修改后的增量更新与直接扫描的结果一致：python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionStore
+from chooser_filter import OptionFilter
+
+WORDS = ["火锅", "麻辣烫", "Pizza", "pasta", "拉面", "面包", "Ramen", "烤鸭"]
+
+
+def expected(store, query):
+    query = query.strip().casefold()
+    return [i for i, option in enumerate(store) if query in option.casefold()]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_queries_match_a_plain_scan(indexed):
+    store = OptionStore([f"{a}{b}" for a in WORDS for b in WORDS])
+    option_filter = OptionFilter(store)
+    if indexed:
+        while option_filter.build_index(7):
+            pass
+    for query in ["", "面", "拉面", "PIZ", "pizza", " ramen ", "不存在", "a"]:
+        option_filter.set_query(query)
+        if not query.strip():
+            assert not option_filter.active and len(option_filter) == len(store)
+        else:
+            assert option_filter.indices == expected(store, query)
+            assert [option_filter[row] for row in range(len(option_filter))] == \
+                   [store[i] for i in expected(store, query)]
+
+
+def test_narrowing_query_reuses_previous_results():
+    store = OptionStore(WORDS)
+    option_filter = OptionFilter(store)
+    option_filter.set_query("a")
+    option_filter.set_query("as")
+    assert option_filter.indices == expected(store, "as")
+    option_filter.set_query("p")
+    assert option_filter.indices == expected(store, "p")
+
+
+def test_results_follow_store_changes():
+    rng = random.Random(5)
+    store = OptionStore([rng.choice(WORDS) + rng.choice(WORDS) for _ in range(60)])
+    option_filter = OptionFilter(store)
+    while option_filter.build_index(16):
+        pass
+    events = []
+    option_filter.subscribe(lambda *event: events.append(event))
+    for step in range(400):
+        if step % 50 == 0:
+            option_filter.set_query(rng.choice(["面", "pa", "烤鸭", "火锅麻"]))
+        op = rng.random()
+        if op < 0.3:
+            store.add(rng.choice(WORDS) + rng.choice(WORDS))
+        elif op < 0.55 and len(store) > 3:
+            store.remove_at(rng.randrange(len(store)))
+        elif op < 0.7:
+            store.insert_swap(rng.randrange(len(store) + 1), rng.choice(WORDS))
+        elif op < 0.8 and len(store) > 3:
+            store.truncate(len(store) - 2)
+        elif op < 0.9:
+            store.set_weight(rng.randrange(len(store)), 2)
+        elif op < 0.95:
+            store.extend([rng.choice(WORDS) for _ in range(3)])
+        else:
+            option_filter.build_index()
+        assert option_filter.indices == expected(store, option_filter.query)
+        for row, index in enumerate(option_filter.indices):
+            assert option_filter.view_row(index) == row
+    assert events
+
+
+def test_replace_resets_results():
+    store = OptionStore(["拉面", "火锅"])
+    option_filter = OptionFilter(store)
+    option_filter.set_query("面")
+    store.replace(["面包", "烤鸭", "炸酱面"])
+    assert option_filter.indices == [0, 2]
+    store.clear()
+    assert option_filter.indices == [] and len(option_filter) == 0
@@ -0,0 +1,117 @@
+# 撤销 / 重做：任意一串修改全部撤销后逐步回到之前的每个状态，再全部重做回到最后的状态：python -m pytest tests
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionStore
+from chooser_history import History
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex, bits_to_indices
+
+NAMES = ["素食", "辣", "便宜"]
+
+
+def state(store, tags, ids=True):
+    options, weights = store.snapshot()
+    # 位图末尾可能多出全 0 的字节，比较置位的下标
+    result = (list(options), list(weights), {name: bits_to_indices(bits) for name, bits in tags.snapshot().items()})
+    if ids:
+        result += ([store.id_at(i) for i in range(len(store))],)
+    return result
+
+
+def edit(rng, step, history):
+    store = history.store
+    op = rng.random()
+    if op < 0.15:
+        history.add(f"n{step}", rng.choice([1, 2]))
+    elif op < 0.25:
+        history.extend([f"e{step}.{k}" for k in range(rng.randrange(1, 4))])
+    elif op < 0.4 and len(store) > 1:
+        history.remove_at(rng.randrange(-len(store), len(store)))
+    elif op < 0.5 and len(store):
+        history.set_weight(rng.randrange(len(store)), rng.choice([0, 3]))
+    elif op < 0.55 and len(store) > 2:
+        history.set_weights(1, [rng.random(), rng.random()])
+    elif op < 0.7 and len(store):
+        history.set_tags(rng.randrange(len(store)), rng.sample(NAMES, rng.randrange(3)))
+    elif op < 0.8 and len(store):
+        indices = sorted(rng.sample(range(len(store)), min(3, len(store))))
+        history.update_tags(indices, add=[rng.choice(NAMES)], remove=[rng.choice(NAMES)])
+    elif op < 0.85:
+        history.clear()
+    elif op < 0.9:
+        history.replace([f"x{step}", f"y{step}"], [1, 2])
+    else:
+        history.add(f"n{step}")
+
+
+def test_undo_all_then_redo_all():
+    rng = random.Random(1)
+    store = OptionStore([f"o{i}" for i in range(10)])
+    tags = TagIndex(store)
+    history = History(store, tags, Rotation(store))
+    states = [state(store, tags)]
+    for step in range(300):
+        edit(rng, step, history)
+        states.append(state(store, tags))
+    count = len(history._undo)
+    for expected in reversed(states[:-1]):
+        assert history.undo() is not None
+        assert state(store, tags) == expected
+    assert not history.can_undo and history.undo() is None
+    # 重做添加时选项会得到新的编号，只比较内容
+    for expected in states[1:]:
+        assert history.redo() is not None
+        assert state(store, tags, ids=False) == expected[:3]
+    assert len(history._undo) == count and not history.can_redo
+
+
+def test_undo_remove_restores_position_id_and_tags():
+    store = OptionStore(["a", "b", "c"], [1, 2, 3])
+    tags = TagIndex(store)
+    history = History(store, tags)
+    history.set_tags(0, ["辣"])
+    option_id = store.id_at(0)
+    assert history.remove_at(0) == "a"
+    assert history.undo_label() == "删除「a」"
+    assert history.undo() == "删除「a」"
+    assert list(store) == ["a", "b", "c"] and store.weight(0) == 1.0
+    assert store.id_at(0) == option_id and tags.tags_of(0) == ["辣"]
+    assert history.redo_label() == "删除「a」"
+    history.redo()
+    assert list(store) == ["c", "b"] and tags.count("辣") == 0
+
+
+def test_undo_clear_restores_tags_and_rotation():
+    store = OptionStore([f"o{i}" for i in range(8)])
+    tags = TagIndex(store)
+    rotation = Rotation(store, random.Random(2))
+    history = History(store, tags, rotation)
+    history.update_tags([1, 2], add=["辣"])
+    drawn = [rotation.choose_index() for _ in range(3)]
+    history.clear()
+    assert len(store) == 0 and tags.snapshot() == {} and rotation.drawn_indices() == []
+    history.undo()
+    assert len(store) == 8 and list(tags.select("辣")) == [1, 2]
+    assert rotation.drawn_indices() == drawn
+    history.redo()
+    assert len(store) == 0 and rotation.remaining == 0
+
+
+def test_new_edit_clears_redo_and_recording_can_be_paused():
+    store = OptionStore(["a"])
+    history = History(store)
+    history.add("b")
+    history.undo()
+    assert history.can_redo
+    history.add("c")
+    assert not history.can_redo
+    history.recording = False
+    history.extend(["d", "e"])
+    assert history.undo_label() == "添加「c」"
+    history.forget()
+    assert not history.can_undo and history.undo() is None
+    assert list(store) == ["a", "c", "d", "e"]
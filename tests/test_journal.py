@@ -0,0 +1,175 @@
+# 自动保存：程序中途退出后从快照和日志恢复出选项、权重、标签和轮换进度，写日志出错时停止记录：python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chooser_journal
+from chooser_engine import OptionFormatError, OptionStore
+from chooser_journal import Journal
+from chooser_rotation import Rotation
+from chooser_tags import TagIndex
+
+
+def live_state(store, tags, rotation):
+    options, weights = store.snapshot()
+    return list(options), weights if store.is_weighted() else None, rotation.drawn_indices(), tags.snapshot()
+
+
+def recovered(path):
+    options, weights, drawn, tags = Journal(str(path)).recover()
+    return list(options), weights, drawn, tags
+
+
+def start(path, options=()):
+    store = OptionStore(list(options))
+    tags = TagIndex(store)
+    rotation = Rotation(store, random.Random(1))
+    journal = Journal(str(path))
+    journal.start(store, tags, rotation)
+    return journal, store, tags, rotation
+
+
+def edit(rng, step, store, tags, rotation):
+    op = rng.random()
+    if op < 0.25:
+        store.add(f"n{step}", rng.choice([1, 2.5]))
+    elif op < 0.4 and len(store) > 3:
+        store.remove_at(rng.randrange(len(store)))
+    elif op < 0.5:
+        store.insert_swap(rng.randrange(len(store) + 1), f"r{step}")
+    elif op < 0.55 and len(store) > 3:
+        store.truncate(len(store) - 2)
+    elif op < 0.65 and len(store):
+        store.set_weight(rng.randrange(len(store)), rng.choice([0, 1, 3]))
+    elif op < 0.75 and len(store):
+        tags.tag(rng.randrange(len(store)), rng.choice(["红", "蓝"]))
+    elif op < 0.8 and len(store):
+        tags.update(rng.sample(range(len(store)), min(3, len(store))), add=["绿"], remove=["红"])
+    elif rotation.can_choose():
+        rotation.choose_index()
+
+
+def test_recovers_every_kind_of_edit(tmp_path):
+    rng = random.Random(2)
+    journal, store, tags, rotation = start(tmp_path, ["甲", "乙", "丙", "丁", "戊"])
+    for step in range(300):
+        edit(rng, step, store, tags, rotation)
+    # 不调用 stop()，相当于程序中途退出
+    journal.wait()
+    assert recovered(tmp_path) == live_state(store, tags, rotation)
+
+
+def test_compaction_keeps_the_same_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(chooser_journal, "COMPACT_MIN_ITEMS", 16)
+    rng = random.Random(3)
+    journal, store, tags, rotation = start(tmp_path, [f"o{i}" for i in range(10)])
+    for step in range(400):
+        edit(rng, step, store, tags, rotation)
+        if step % 97 == 0:
+            journal.wait()
+            assert recovered(tmp_path) == live_state(store, tags, rotation)
+    journal.wait()
+    assert journal.gen > 3
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".journal")]) == 1
+    assert recovered(tmp_path) == live_state(store, tags, rotation)
+
+
+def test_recovered_journal_continues_recording(tmp_path):
+    journal, store, tags, rotation = start(tmp_path, ["a", "b", "c"])
+    tags.tag(1, "红")
+    rotation.choose_index()
+    journal.wait()
+
+    journal = Journal(str(tmp_path))
+    options, weights, drawn, bitmaps = journal.recover()
+    store = OptionStore(options, weights)
+    tags = TagIndex(store)
+    tags.load(bitmaps)
+    rotation = Rotation(store)
+    rotation.restore(drawn)
+    journal.start(store, tags, rotation)
+    store.add("d")
+    journal.wait()
+    assert recovered(tmp_path) == live_state(store, tags, rotation)
+
+
+def test_undoing_a_clear_is_saved(tmp_path):
+    journal, store, tags, rotation = start(tmp_path, ["a", "b", "c"])
+    tags.tag(0, "红")
+    journal.wait()
+    # 与撤销记录一样分别换回选项和标签
+    tag_state = tags.state()
+    old = store.clear()
+    assert recovered(tmp_path)[0] == []
+    store.swap_state(old)
+    tags.set_state(tag_state)
+    journal.wait()
+    assert recovered(tmp_path) == (["a", "b", "c"], None, [], {"红": b"\x01"})
+
+
+def test_nothing_is_recovered_before_the_first_snapshot(tmp_path, monkeypatch):
+    # 第一份快照写完之前退出：从空的选项开始记录的日志可以直接重放，否则不知道开始时的选项
+    monkeypatch.setattr(Journal, "_write_snapshot", lambda self, gen, *data: None)
+    (tmp_path / "empty").mkdir()
+    (tmp_path / "loaded").mkdir()
+    journal, store, tags, rotation = start(tmp_path / "empty")
+    store.add("a")
+    tags.tag(0, "红")
+    journal.wait()
+    assert recovered(tmp_path / "empty") == live_state(store, tags, rotation)
+    journal, store, tags, rotation = start(tmp_path / "loaded", ["a", "b"])
+    store.add("c")
+    journal.wait()
+    assert Journal(str(tmp_path / "loaded")).recover() is None
+
+
+def test_stop_discards_autosave(tmp_path):
+    journal, store, tags, rotation = start(tmp_path, ["a"])
+    store.add("b")
+    journal.stop()
+    journal.wait()
+    assert not journal.recording and not Journal(str(tmp_path)).exists()
+
+
+def test_write_error_stops_recording(tmp_path):
+    journal, store, tags, rotation = start(tmp_path, ["a", "b"])
+    store.add("c")
+    journal.wait()
+    errors = []
+    journal.on_error = errors.append
+
+    class BrokenFile:
+        def write(self, data):
+            raise OSError("磁盘已满")
+
+        def close(self):
+            pass
+
+    journal._file = BrokenFile()
+    # 修改本身照常完成，不抛出异常
+    store.add("d")
+    assert list(store) == ["a", "b", "c", "d"]
+    assert len(errors) == 1 and isinstance(errors[0], OSError)
+    assert not journal.recording
+    store.add("e")
+    assert len(errors) == 1
+    # 已有的文件保留，恢复到出错之前
+    assert recovered(tmp_path)[0] == ["a", "b", "c"]
+
+
+def test_damaged_autosave_is_set_aside(tmp_path):
+    (tmp_path / ".autosave.1.rcb").write_bytes(b"not a snapshot")
+    journal = Journal(str(tmp_path))
+    assert journal.exists()
+    with pytest.raises(OptionFormatError):
+        journal.recover()
+    journal.set_aside()
+    assert not journal.exists()
+    assert os.path.exists(tmp_path / ".autosave.1.rcb.damaged")
+    journal, store, tags, rotation = start(tmp_path, ["x"])
+    journal.wait()
+    assert recovered(tmp_path)[0] == ["x"]
@@ -0,0 +1,104 @@
+# 选项编号和 O(1) 删除：与最后一项交换再弹出、放回、截断之后编号仍然对得上：python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionStore
+
+
+def test_remove_swaps_in_the_last_option():
+    store = OptionStore(["a", "b", "c", "d"])
+    events = []
+    store.subscribe(lambda *event: events.append(event))
+    assert store.remove_at(1) == "b"
+    assert list(store) == ["a", "d", "c"]
+    assert store.remove_at(-1) == "c"
+    assert list(store) == ["a", "d"]
+    assert events == [("swap_remove", 1, 1), ("swap_remove", 2, 1)]
+    with pytest.raises(IndexError):
+        store.remove_at(5)
+
+
+def test_ids_are_stable_and_never_reused():
+    store = OptionStore(["a", "b", "c"])
+    ids = [store.id_at(i) for i in range(3)]
+    store.remove_at(0)
+    assert store.index_of(ids[2]) == 0 and store.index_of(ids[1]) == 1
+    with pytest.raises(KeyError):
+        store.index_of(ids[0])
+    store.add("e")
+    assert store.id_at(2) not in ids
+    store.remove_id(ids[1])
+    assert list(store) == ["c", "e"]
+
+
+def test_insert_swap_undoes_remove_with_the_same_id():
+    store = OptionStore(["a", "b", "c"], [1, 2, 3])
+    option_id = store.id_at(0)
+    weight = store.weight(0)
+    option = store.remove_at(0)
+    store.insert_swap(0, option, weight, option_id)
+    assert list(store) == ["a", "b", "c"] and store.weights() == [1.0, 2.0, 3.0]
+    assert [store.index_of(store.id_at(i)) for i in range(3)] == [0, 1, 2]
+    assert store.index_of(option_id) == 0
+
+
+def test_truncate_and_replace_keep_ids_consistent():
+    store = OptionStore(["a"])
+    store.extend(["b", "c", "d"])
+    truncated = store.id_at(3)
+    assert store.truncate(2) == (["c", "d"], [1.0, 1.0])
+    with pytest.raises(KeyError):
+        store.index_of(truncated)
+    old_ids = [store.id_at(i) for i in range(2)]
+    old = store.replace(["x", "y"])
+    assert not set(old_ids) & {store.id_at(0), store.id_at(1)}
+    store.swap_state(old)
+    assert [store.id_at(i) for i in range(2)] == old_ids
+
+
+def test_random_edits_match_a_reference_model():
+    rng = random.Random(8)
+    store = OptionStore([f"o{i}" for i in range(30)])
+    model = [(store.id_at(i), store[i]) for i in range(len(store))]
+    removed = []
+    for step in range(2000):
+        op = rng.random()
+        if op < 0.3 and model:
+            index = rng.randrange(len(model))
+            weight = store.weight(index)
+            store.remove_at(index)
+            removed.append((index, model[index], weight))
+            model[index] = model[-1]
+            model.pop()
+        elif op < 0.5 and removed:
+            # 撤销最近的删除
+            index, (option_id, option), weight = removed.pop()
+            store.insert_swap(index, option, weight, option_id)
+            if index < len(model):
+                model.append(model[index])
+                model[index] = (option_id, option)
+            else:
+                model.append((option_id, option))
+        elif op < 0.7:
+            store.add(f"n{step}")
+            model.append((store.id_at(len(store) - 1), f"n{step}"))
+            removed.clear()
+        elif op < 0.75 and model:
+            length = rng.randrange(len(model) + 1)
+            store.truncate(length)
+            del model[length:]
+            removed.clear()
+        else:
+            store.extend([f"e{step}", f"f{step}"])
+            model.extend((store.id_at(len(store) - k), f"{p}{step}") for k, p in ((2, "e"), (1, "f")))
+            removed.clear()
+        assert list(store) == [option for _, option in model]
+        for index, (option_id, _) in enumerate(model):
+            assert store.id_at(index) == option_id
+            assert store.index_of(option_id) == index
+    assert len({option_id for option_id, _ in model}) == len(model)
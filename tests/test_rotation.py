@@ -0,0 +1,125 @@
+# 轮换抽取：一轮中不重复、跳过权重为 0 的选项，选项增删后排列仍然一致：python -m pytest tests
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chooser_rotation
+from chooser_engine import OptionStore
+from chooser_rotation import Rotation
+
+
+def check_consistent(rotation):
+    # 排列是下标的一个排列，已抽取的数量与 is_drawn 一致
+    count = len(rotation.store)
+    assert rotation._count == count
+    values = [rotation._value(pos) for pos in range(count)]
+    assert sorted(values) == list(range(count))
+    assert all(rotation._pos(index) == pos for pos, index in enumerate(values))
+    assert sum(rotation.is_drawn(i) for i in range(count)) == rotation.drawn_count
+
+
+def drawn_options(rotation):
+    return [rotation.store[i] for i in rotation.drawn_indices()]
+
+
+def test_each_option_is_drawn_once_per_round():
+    store = OptionStore([f"o{i}" for i in range(50)])
+    rotation = Rotation(store, random.Random(1))
+    for _ in range(3):
+        drawn = [rotation.choose_index() for _ in range(50)]
+        assert sorted(drawn) == list(range(50))
+        assert rotation.remaining == 0
+    rotation.choose_index()
+    assert rotation.drawn_count == 1
+
+
+def test_zero_weights_are_skipped():
+    store = OptionStore(["a", "b", "c", "d"], [1, 0, 1, 0])
+    rotation = Rotation(store, random.Random(2))
+    assert {rotation.choose() for _ in range(40)} == {"a", "c"}
+    store.set_weights(0, [0, 0, 0, 0])
+    with pytest.raises(IndexError):
+        rotation.choose_index()
+
+
+def test_subset_draws_only_from_subset():
+    store = OptionStore([f"o{i}" for i in range(20)])
+    rotation = Rotation(store, random.Random(3))
+    subset = [1, 5, 7, 11]
+    first = [rotation.choose_index(subset) for _ in range(4)]
+    assert sorted(first) == subset
+    # subset 全部抽过后开始新的一轮
+    assert rotation.choose_index(subset) in subset and rotation.drawn_count == 1
+
+
+@pytest.mark.parametrize("dense_min", [1024, 4])
+def test_store_edits_keep_the_permutation_consistent(monkeypatch, dense_min):
+    monkeypatch.setattr(chooser_rotation, "DENSE_MIN", dense_min)
+    rng = random.Random(4)
+    store = OptionStore([f"o{i}" for i in range(30)])
+    rotation = Rotation(store, random.Random(5))
+    for step in range(600):
+        op = rng.random()
+        if op < 0.4 and rotation.can_choose():
+            option = store[rotation.choose_index()]
+            assert option not in drawn_options(rotation)[:-1]
+        elif op < 0.55:
+            store.add(f"n{step}")
+        elif op < 0.7 and len(store) > 5:
+            store.remove_at(rng.randrange(len(store)))
+        elif op < 0.8:
+            store.insert_swap(rng.randrange(len(store) + 1), f"r{step}")
+        elif op < 0.85 and len(store) > 5:
+            store.truncate(len(store) - 3)
+        elif op < 0.9:
+            store.extend([f"e{step}.{k}" for k in range(3)])
+        check_consistent(rotation)
+
+
+def test_removed_options_leave_the_round():
+    store = OptionStore(["a", "b", "c", "d"])
+    rotation = Rotation(store, random.Random(6))
+    rotation.restore([0, 2])
+    store.remove_at(0)
+    # d 移到了下标 0，没有抽过
+    assert drawn_options(rotation) == ["c"] and not rotation.is_drawn(0)
+    store.insert_swap(0, "a")
+    assert drawn_options(rotation) == ["c"] and rotation.remaining == 3
+
+
+def test_restore_and_drawn_indices():
+    store = OptionStore([f"o{i}" for i in range(10)])
+    rotation = Rotation(store)
+    rotation.restore([3, 7, 3, 12, -1, "x", 0])
+    assert rotation.drawn_indices() == [3, 7, 0]
+    rng = random.Random(7)
+    rest = [rotation.choose_index(rng=rng) for _ in range(7)]
+    assert sorted(rest) == [1, 2, 4, 5, 6, 8, 9]
+    store.clear()
+    assert rotation.drawn_indices() == [] and rotation.remaining == 0
+
+
+def test_version_start_and_notifications():
+    store = OptionStore(["a", "b", "c"])
+    rotation = Rotation(store, random.Random(8))
+    events = []
+    rotation.subscribe(lambda *event: events.append(event))
+    assert rotation.at_start()
+    version = rotation.version
+    index = rotation.choose_index()
+    assert not rotation.at_start() and rotation.version > version
+    version = rotation.version
+    store.add("d")
+    assert rotation.version > version
+    rotation.mark(index)
+    rotation.mark(3)
+    rotation.new_round()
+    assert rotation.at_start()
+    state = rotation.state()
+    rotation.restore([1])
+    rotation.set_state(state)
+    assert events == [("drawn", index), ("drawn", 3), ("round", []), ("round", [1]), ("round", [])]
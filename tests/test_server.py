@@ -0,0 +1,113 @@
+# 本地 HTTP 抽取服务：各个接口、可重复的种子抽取、选项集缓存以及对请求头的检查：python -m pytest tests
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import save_options_file
+from chooser_server import ChooserService, HTTPError
+
+
+def call(service, method, target, body=None):
+    return asyncio.run(service.handle(method, target, body))
+
+
+def test_edit_current_options(tmp_path):
+    service = ChooserService(str(tmp_path))
+    ids = call(service, "POST", "/options", {"options": ["甲", " 乙 "], "weights": [1, 3]})["ids"]
+    ids += call(service, "POST", "/options", {"option": "丙"})["ids"]
+    assert call(service, "PATCH", f"/options/{ids[0]}", {"weight": 0}) == {"id": ids[0], "weight": 0.0}
+    assert call(service, "DELETE", f"/options/{ids[1]}") == {"option": "乙"}
+    # 删除后其余选项的编号不变
+    assert call(service, "GET", "/options") == {"options": [{"id": ids[0], "option": "甲", "weight": 0.0},
+                                                            {"id": ids[2], "option": "丙", "weight": 1.0}]}
+    assert call(service, "GET", "/draw?n=5")["options"] == ["丙"] * 5
+    assert call(service, "DELETE", "/options") == {"count": 0}
+
+
+@pytest.mark.parametrize("method, target, body, status", [
+    ("POST", "/options", {"option": "  "}, 400),
+    ("POST", "/options", {"options": ["a"], "weights": [-1]}, 400),
+    ("POST", "/options", ["a"], 400),
+    ("PATCH", "/options/999", {"weight": 1}, 404),
+    ("GET", "/draw", None, 400),
+    ("GET", "/nothing", None, 404),
+    ("GET", "/sets/..%2Fx.json/draw", None, 404),
+])
+def test_bad_requests(tmp_path, method, target, body, status):
+    with pytest.raises(HTTPError) as info:
+        call(ChooserService(str(tmp_path)), method, target, body)
+    assert info.value.status == status
+
+
+def test_seeded_draws_are_reproducible(tmp_path):
+    service = ChooserService(str(tmp_path))
+    call(service, "POST", "/options", {"options": [f"o{i}" for i in range(50)]})
+    first = call(service, "GET", "/draw?n=10&replace=0&seed=42")["options"]
+    assert call(service, "GET", "/draw?n=10&replace=0&seed=42")["options"] == first
+    assert len(set(first)) == 10
+    with pytest.raises(HTTPError):
+        call(service, "GET", "/draw?n=51&replace=0")
+
+
+def test_saved_sets_are_cached_until_the_file_changes(tmp_path):
+    filename = str(tmp_path / "午饭.json")
+    save_options_file(filename, ["面"], [1])
+    service = ChooserService(str(tmp_path))
+    assert call(service, "GET", "/sets") == {"sets": ["午饭.json"]}
+    assert call(service, "GET", "/sets/午饭.json/draw?n=2")["options"] == ["面", "面"]
+    cached = service.cache._entries["午饭.json"][1]
+    call(service, "GET", "/sets/%E5%8D%88%E9%A5%AD.json/draw")
+    assert service.cache._entries["午饭.json"][1] is cached
+    save_options_file(filename, ["饭", "粥"], [1, 1])
+    assert call(service, "POST", "/options/load", {"name": "午饭.json"}) == {"count": 2}
+    assert service.cache._entries["午饭.json"][1] is not cached
+
+
+def exchange(request):
+    # 通过真正的连接发送一个请求，返回 (状态码, 响应头, 响应体)
+    async def run():
+        service = ChooserService()
+        server = await asyncio.start_server(service.serve_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request.replace("{port}", str(port)).encode("utf-8"))
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            headers = dict(line.split(": ", 1) for line in lines[1:] if line)
+            body = await reader.readexactly(int(headers["Content-Length"]))
+            writer.close()
+            return int(lines[0].split(" ")[1]), headers, json.loads(body)
+    return asyncio.run(run())
+
+
+def post(body, headers):
+    data = json.dumps(body)
+    return ("POST /options HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n" + headers
+            + f"Content-Length: {len(data)}\r\n\r\n" + data)
+
+
+def test_local_json_request_is_accepted():
+    status, headers, body = exchange(post({"option": "a"}, "Content-Type: application/json; charset=utf-8\r\n"))
+    assert status == 200 and body == {"ids": [0]}
+    assert headers["Connection"] == "keep-alive"
+
+
+@pytest.mark.parametrize("request_text, status", [
+    ("GET /options HTTP/1.1\r\nHost: evil.example:{port}\r\n\r\n", 403),
+    ("GET /options HTTP/1.1\r\nHost: 127.0.0.1\r\nOrigin: http://evil.example\r\n\r\n", 403),
+    (post({"option": "a"}, "Content-Type: text/plain\r\n"), 415),
+    (post({"option": "a"}, ""), 415),
+    ("GET /options HTTP/1.1\r\nHost: localhost\r\nContent-Length: abc\r\n\r\n", 400),
+    ("GET /options HTTP/1.1\r\nHost: localhost\r\nContent-Length: 999999999999\r\n\r\n", 413),
+])
+def test_rejected_requests_close_the_connection(request_text, status):
+    got, headers, body = exchange(request_text)
+    assert got == status and "error" in body
+    assert headers["Connection"] == "close"
@@ -0,0 +1,137 @@
+# 选项标签：位图索引跟随选项存储的修改，标签条件查询与逐项检查的结果一致：python -m pytest tests
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionFormatError, OptionStore
+from chooser_tags import (BitSubset, TagIndex, bits_to_indices, check_tag, indices_to_bits, load_tags,
+                          parse_query, parse_tags)
+
+NAMES = ["素食", "辣", "便宜", "本周吃过"]
+
+
+def expected(model, all_of, none_of):
+    return [i for i, names in enumerate(model) if set(all_of) <= names and not set(none_of) & names]
+
+
+def test_query_syntax():
+    assert parse_query("素食 -本周吃过 !辣") == (["素食"], ["本周吃过", "辣"])
+    assert parse_query("素食 and NOT 本周吃过") == (["素食"], ["本周吃过"])
+    assert parse_tags("素食, 辣，素食") == ["素食", "辣"]
+    for name in ("", "-辣", "a b", "AND", 1):
+        with pytest.raises(ValueError):
+            check_tag(name)
+
+
+def test_bits_and_subsets():
+    indices = [0, 3, 8, 9, 70000, 70001]
+    bits = indices_to_bits(indices, 70005)
+    assert bits_to_indices(bits) == indices
+    subset = BitSubset(int.from_bytes(bits, "little"), 70005)
+    assert len(subset) == 6 and list(subset) == indices
+    assert [subset[r] for r in range(6)] == indices and subset[-1] == 70001
+    assert 8 in subset and 7 not in subset and -1 not in subset
+    assert subset.restrict([1, 3, 9, 69999, 70001]) == [3, 9, 70001]
+    with pytest.raises(ValueError):
+        indices_to_bits([5], 5)
+
+
+def test_tags_follow_store_edits():
+    rng = random.Random(1)
+    store = OptionStore([f"o{i}" for i in range(40)])
+    tags = TagIndex(store)
+    model = [set() for _ in store]
+    removed = []
+    for step in range(800):
+        op = rng.random()
+        if op < 0.25 and len(store):
+            index, name = rng.randrange(len(store)), rng.choice(NAMES)
+            tags.tag(index, name)
+            model[index].add(name)
+        elif op < 0.3 and len(store):
+            index, name = rng.randrange(len(store)), rng.choice(NAMES)
+            tags.untag(index, name)
+            model[index].discard(name)
+        elif op < 0.35 and len(store):
+            index, names = rng.randrange(len(store)), rng.sample(NAMES, 2)
+            tags.set_tags(index, names)
+            model[index] = set(names)
+        elif op < 0.4 and len(store):
+            indices = sorted(rng.sample(range(len(store)), min(5, len(store))))
+            tags.update(indices, add=["辣"], remove=["便宜"])
+            for i in indices:
+                model[i].add("辣")
+                model[i].discard("便宜")
+        elif op < 0.55:
+            store.add(f"n{step}")
+            model.append(set())
+        elif op < 0.7 and len(store) > 3:
+            index = rng.randrange(len(store))
+            store.remove_at(index)
+            removed.append(index)
+            model[index] = model[-1]
+            model.pop()
+        elif op < 0.8 and removed:
+            # 放回的选项没有标签，原来在这个下标的选项移到末尾
+            index = removed.pop()
+            if index <= len(store):
+                store.insert_swap(index, f"r{step}")
+                model.append(model[index] if index < len(model) else set())
+                model[index] = set()
+        elif op < 0.85 and len(store) > 3:
+            length = rng.randrange(len(store))
+            store.truncate(length)
+            del model[length:]
+        all_of = rng.sample(NAMES, rng.randrange(3))
+        none_of = rng.sample([name for name in NAMES if name not in all_of], 1)
+        assert list(tags.query(all_of, none_of)) == expected(model, all_of, none_of)
+        for name in NAMES:
+            assert tags.count(name) == sum(name in names for names in model)
+    for i, names in enumerate(model):
+        assert tags.tags_of(i) == sorted(names)
+
+
+def test_select_text_and_restrict_to_filter():
+    store = OptionStore(["a", "b", "c", "d"])
+    tags = TagIndex(store)
+    tags.update([0, 1, 2], add=["素食"])
+    tags.update([1], add=["本周吃过"])
+    assert list(tags.select("素食 -本周吃过")) == [0, 2]
+    assert tags.select("素食", [2, 3]) == [2]
+    assert list(tags.select("没有的标签")) == []
+    assert list(tags.select("")) == [0, 1, 2, 3]
+
+
+def test_listeners_see_direct_changes_only():
+    store = OptionStore(["a", "b", "c"])
+    tags = TagIndex(store)
+    events = []
+    tags.subscribe(lambda *event: events.append(event))
+    tags.tag(1, "辣")
+    tags.set_tags(2, ["素食"])
+    tags.update(None, add=["便宜"], remove=["辣"])
+    old = tags.set_bitmaps({"素食": None})
+    tags.load({"辣": b"\x07"})
+    store.remove_at(0)
+    assert events == [("option", 1), ("option", 2), ("tags", ["便宜", "辣"]), ("tags", ["素食"]), ("all", None)]
+    assert old == {"素食": b"\x04"}
+    assert tags.snapshot() == {"辣": b"\x03"}
+    with pytest.raises(IndexError):
+        tags.tag(5, "辣")
+
+
+def test_json_tags(tmp_path):
+    filename = tmp_path / "options.json"
+    filename.write_text(json.dumps({"options": ["a", "b", "c"], "tags": {"辣": [0, 2]}}, ensure_ascii=False),
+                        encoding="utf-8")
+    assert load_tags(str(filename), 3) == {"辣": b"\x05"}
+    for tags in ({"辣": 0}, {"辣": "0"}, {"辣": [3]}, {"-辣": [0]}, ["辣"]):
+        filename.write_text(json.dumps({"options": ["a", "b", "c"], "tags": tags}, ensure_ascii=False),
+                            encoding="utf-8")
+        with pytest.raises(OptionFormatError):
+            load_tags(str(filename), 3)
@@ -0,0 +1,87 @@
+# 按权重抽取：别名表、树状数组以及跟随选项存储同步的 WeightedSampler：python -m pytest tests
+import os
+import random
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chooser_engine import OptionStore
+from chooser_weights import AliasTable, FenwickTree, WeightedSampler
+
+
+def frequencies(sample, rng, draws=20000):
+    counts = Counter(sample(rng) for _ in range(draws))
+    return {index: count / draws for index, count in counts.items()}
+
+
+@pytest.mark.parametrize("table", [AliasTable, FenwickTree])
+def test_draws_follow_weights(table):
+    found = frequencies(table([1, 0, 3]).sample, random.Random(1))
+    assert 1 not in found
+    assert found[0] == pytest.approx(0.25, abs=0.02)
+    assert found[2] == pytest.approx(0.75, abs=0.02)
+
+
+@pytest.mark.parametrize("table", [AliasTable, lambda weights: FenwickTree(weights).sample(random.Random())])
+def test_all_zero_weights_are_rejected(table):
+    with pytest.raises(ValueError):
+        table([0, 0])
+
+
+def test_fenwick_updates_match_prefix_sums():
+    rng = random.Random(2)
+    weights = [rng.choice([0, 1, 2.5]) for _ in range(37)]
+    tree = FenwickTree(weights)
+    for _ in range(200):
+        if rng.random() < 0.3:
+            weights.append(rng.random())
+            tree.append(weights[-1])
+        elif rng.random() < 0.3 and weights:
+            weights.pop()
+            tree.pop()
+        elif weights:
+            i = rng.randrange(len(weights))
+            weights[i] = rng.random()
+            tree.set(i, weights[i])
+        for count in (0, len(weights) // 2, len(weights)):
+            assert tree.prefix_sum(count) == pytest.approx(sum(weights[:count]))
+
+
+def test_sampler_stays_in_sync_with_store():
+    # 逐项修改、追加、删除和放回之后，增量维护的树状数组与重新构建的一致
+    rng = random.Random(3)
+    store = OptionStore([f"o{i}" for i in range(40)], [rng.random() for _ in range(40)])
+    sampler = WeightedSampler(store)
+    sampler.sample(rng)
+    for step in range(300):
+        op = rng.random()
+        if op < 0.3:
+            store.set_weight(rng.randrange(len(store)), rng.choice([0, rng.random()]))
+        elif op < 0.5:
+            store.add(f"n{step}", rng.random())
+        elif op < 0.7 and len(store) > 5:
+            store.remove_at(rng.randrange(len(store)))
+        elif op < 0.8:
+            store.insert_swap(rng.randrange(len(store)), f"r{step}", rng.random())
+        elif op < 0.9 and len(store) > 5:
+            store.truncate(len(store) - 2)
+        if store.choosable_count():
+            assert store.weight(sampler.sample(rng)) > 0
+        if sampler._fenwick is not None:
+            assert len(sampler._fenwick) == len(store)
+            for i in range(len(store)):
+                assert sampler._fenwick.get(i) == pytest.approx(store.weight(i))
+
+
+def test_sampler_switches_to_alias_table_when_weights_are_stable():
+    store = OptionStore(["a", "b", "c", "d"], [1, 2, 3, 4])
+    sampler = WeightedSampler(store)
+    rng = random.Random(4)
+    sampler.sample(rng)
+    assert sampler._alias is not None
+    store.set_weight(0, 0)
+    assert sampler._alias is None
+    assert {store[sampler.sample(rng)] for _ in range(500)} == {"b", "c", "d"}